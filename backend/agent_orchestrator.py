@@ -1,4 +1,7 @@
+import asyncio
 import os
+import threading
+from contextvars import ContextVar
 
 try:
     from agents import Agent, Runner, function_tool
@@ -8,25 +11,151 @@ except ImportError as exc:
         "OpenAI Agents SDK is not installed. Install with: pip install openai-agents"
     ) from exc
 
-from test_search import search_listings
+from crawler import get_crawl_schedule
+from near_duplicates import NearDuplicateIndex
+from platforms import enabled_platforms, fan_out, merge_platform_results, tag
+from price_history import get_price_history
+from result_cache import get_cache
+from seen_index import get_seen_index
+from session_store import get_session_store
+
+# Set by streaming callers to receive each listing as soon as it is scraped.
+# It is called from scraper threads, so it must be thread-safe.
+listing_sink: ContextVar = ContextVar("listing_sink", default=None)
+# Set by streaming callers to hear about each platform as soon as it is done,
+# with its name, listing count, seconds taken and error if any.
+source_sink: ContextVar = ContextVar("source_sink", default=None)
+
+
+def unique_listings(sink, max_listings: int):
+    """Wrap ``sink`` so it sees each listing once, numbered, and at most ``max_listings`` of them.
+
+    Shards and platforms may report the same property and together overshoot
+    the requested count; near-duplicates are dropped as
+    ``merge_platform_results`` merges them.
+    """
+    index = NearDuplicateIndex()
+    lock = threading.Lock()
+
+    def on_listing(listing: dict) -> None:
+        with lock:
+            if len(index) >= max_listings or index.add_unique(listing) is not None:
+                return
+            listing = {**listing, "index": len(index)}
+        sink(listing)
+
+    return on_listing
+
+
+async def run_fetch_listings(
+    context: dict | None,
+    location: str,
+    min_price: int,
+    max_price: int,
+    max_listings: int,
+    only_new: bool = False,
+    refresh: bool = False,
+) -> dict:
+    """Search every enabled platform at once, serving repeated searches from the result cache.
+
+    Platforms not in the cache are scraped concurrently on the bounded
+    executor; each one's listings go to the sink as they are scraped. With
+    ``only_new``, the cache is bypassed and listings already seen for this
+    location are skipped on the device. Scraped listings are recorded in the
+    price history, which gives the result's listings their ``daysOnline`` and
+    ``priceHistory``.
+
+    Searches are counted in the crawl schedule, which keeps the frequent ones
+    warm in the cache; the crawler itself calls this with ``refresh`` to
+    scrape every platform and replace their cached results. These stores may
+    be SQLite files shared with other workers, so they are read and written
+    on a worker thread, off the event loop.
+    """
+    sink = listing_sink.get()
+    on_source = source_sink.get()
+    on_listing = unique_listings(sink, max_listings) if sink is not None else None
+    platform_results = []
+    if not refresh:
+        await asyncio.to_thread(get_crawl_schedule().requested, location, min_price, max_price, max_listings)
+
+    def finished(platform_result: dict) -> None:
+        platform_results.append(platform_result)
+        if on_source is not None:
+            on_source(
+                {
+                    "platform": platform_result["platform"],
+                    "scraped": platform_result.get("scraped", 0),
+                    **{
+                        key: platform_result[key]
+                        for key in ("error", "cached", "age_seconds", "seconds")
+                        if key in platform_result
+                    },
+                }
+            )
+
+    to_scrape = []
+    for platform in enabled_platforms():
+        cached = (
+            None
+            if only_new or refresh
+            else await asyncio.to_thread(get_cache().get, location, min_price, max_price, max_listings, platform.name)
+        )
+        if cached is None:
+            to_scrape.append(platform)
+            continue
+        cached = {
+            **{key: value for key, value in cached.items() if key != "seconds"},
+            "platform": platform.name,
+            "listings": [tag(listing, platform.name) for listing in cached["listings"]],
+        }
+        if on_listing is not None:
+            for listing in cached["listings"]:
+                on_listing(listing)
+        finished(cached)
+
+    def store(platform_result: dict) -> None:
+        get_seen_index().record(location, min_price, max_price, platform_result["listings"])
+        get_price_history().record(location, platform_result["listings"])
+        if not only_new:
+            get_cache().put(platform_result, replace=refresh)
+
+    async for platform_result in fan_out(
+        location,
+        min_price,
+        max_price,
+        max_listings,
+        to_scrape,
+        on_listing=on_listing,
+        known=get_seen_index().matcher(location, min_price, max_price) if only_new else None,
+    ):
+        await asyncio.to_thread(store, platform_result)
+        finished(platform_result)
+
+    result = merge_platform_results(location, min_price, max_price, max_listings, platform_results)
+    result["listings"] = await asyncio.to_thread(get_price_history().annotate, result["listings"])
+    if isinstance(context, dict):
+        # Stored once in the session store; the context only keeps its key.
+        context["last_result_ref"] = await asyncio.to_thread(get_session_store().put_payload, result)
+    return result
 
 
 @function_tool
-def fetch_listings(
+async def fetch_listings(
     ctx: RunContextWrapper[dict],
     location: str,
     min_price: int,
     max_price: int,
     max_listings: int,
+    only_new: bool = False,
 ) -> dict:
-    """Fetch listings from the SeLoger app using Appium."""
-    result = search_listings(location, min_price, max_price, max_listings)
+    """Fetch listings from the enabled listing apps (SeLoger by default) using Appium.
+
+    Args:
+        only_new: Only return listings not seen in earlier searches for this location.
+    """
     if ctx.context is None:
         ctx.context = {}
-    if isinstance(ctx.context, dict):
-        ctx.context["last_listings"] = result.get("listings", [])
-        ctx.context["last_result"] = result
-    return result
+    return await run_fetch_listings(ctx.context, location, min_price, max_price, max_listings, only_new)
 
 
 def build_agent() -> Agent:
@@ -37,8 +166,11 @@ def build_agent() -> Agent:
             "Ask clarifying questions when location, min price, max price, or listing count "
             "is missing. If the user asks to find listings (e.g., latest announcements in a "
             "location with a budget range and count), call fetch_listings with the "
-            "appropriate arguments. Return the main info for each listing: price, details, "
-            "and phone. Keep responses concise and professional."
+            "appropriate arguments, with only_new set when they ask for what is new since "
+            "their last search. Return the main info for each listing: price, details, "
+            "and phone, plus its platform when several were searched, and point out "
+            "listings online for long or with price drops. Keep responses "
+            "concise and professional."
         ),
         tools=[fetch_listings],
     )
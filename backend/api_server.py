@@ -1,14 +1,73 @@
+"""HTTP API of the real estate agent.
+
+``python api_server.py --workers 4`` serves it from four processes. Their
+sessions, cached results, scrape jobs and scrape checkpoints are kept in SQLite files under
+``--state-dir``, so any worker can continue any conversation or report any
+job. Under another process manager, such as
+``gunicorn -k uvicorn.workers.UvicornWorker -w 4 api_server:app``, set
+``SESSION_STORE_PATH``, ``SCRAPE_CACHE_PATH``, ``JOB_STORE_PATH``,
+``CRAWLER_STORE_PATH`` and ``SCRAPE_CHECKPOINT_PATH`` to the same effect. The device pool, the scrape
+executor and the listing store stay per worker, so ``SCRAPE_CONCURRENCY``
+and ``DEVICE_POOL_SIZE`` apply to each.
+
+With ``CRAWLER_ENABLED`` set, each worker also runs the background crawler
+(see ``crawler``) on its spare device sessions.
+"""
 import asyncio
+import json
+import os
+from contextlib import asynccontextmanager
+from functools import partial
 from uuid import uuid4
 
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, ConfigDict
+from pydantic.alias_generators import to_camel
 
 from agents import Runner
-from agent_orchestrator import build_agent
+from agent_orchestrator import build_agent, listing_sink, run_fetch_listings, source_sink
+from checkpoints import get_checkpoints
+from crawler import CRAWLER_ENABLED, Crawler, get_crawl_schedule
+from device_pool import EVICT_INTERVAL_SECONDS, get_pool
+from jobs import get_job_manager
+from listing_store import get_listing_store
+from price_history import get_price_history
+from resilience import breaker_stats
+from result_cache import get_cache
+from scoring import SIGNALS, score_listings
+from scrape_executor import get_executor
+from seen_index import get_seen_index
+from session_store import SessionConflict, get_session_store
+
+
+async def evict_idle_sessions() -> None:
+    """Quit pooled sessions idle past their limit, even when no search comes to reap them."""
+    while True:
+        await asyncio.sleep(EVICT_INTERVAL_SECONDS)
+        await asyncio.to_thread(get_pool().evict_idle)
+
 
-app = FastAPI(title="Real Estate Agent API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    crawler = None
+    if CRAWLER_ENABLED:
+        crawler = Crawler(partial(run_fetch_listings, None, refresh=True))
+        crawler.start()
+    app.state.crawler = crawler
+    eviction = asyncio.create_task(evict_idle_sessions())
+    heartbeat = asyncio.create_task(get_job_manager().keep_alive())
+    yield
+    eviction.cancel()
+    heartbeat.cancel()
+    if crawler is not None:
+        await crawler.stop()
+    get_executor().shutdown()
+    get_pool().close()
+
+
+app = FastAPI(title="Real Estate Agent API", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -18,8 +77,6 @@ app.add_middleware(
 )
 
 agent = build_agent()
-sessions = {}
-sessions_lock = asyncio.Lock()
 
 
 class ChatRequest(BaseModel):
@@ -33,36 +90,325 @@ class ChatResponse(BaseModel):
     listings: list[dict] | None = None
 
 
-async def get_session(conversation_id: str | None) -> tuple[str, dict]:
-    async with sessions_lock:
-        if conversation_id is None:
-            conversation_id = str(uuid4())
-        session = sessions.get(conversation_id)
-        if session is None:
-            session = {"previous_response_id": None, "context": {}}
-            sessions[conversation_id] = session
-        return conversation_id, session
+class JobRequest(BaseModel):
+    location: str
+    min_price: int
+    max_price: int
+    max_listings: int
 
 
-@app.post("/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest) -> ChatResponse:
-    conversation_id, session = await get_session(request.conversation_id)
-    result = await Runner.run(
-        agent,
-        request.message,
-        context=session["context"],
-        previous_response_id=session["previous_response_id"],
-        auto_previous_response_id=True,
-    )
-    session["previous_response_id"] = result.last_response_id
+class JobResponse(BaseModel):
+    job_id: str
+    status: str
+    params: dict
+    scraped: int
+    listings: list[dict]
+    error: str | None = None
+    created_at: float
+    finished_at: float | None = None
+
+
+class ScoreRequest(BaseModel):
+    listings: list[dict]
+    limit: int | None = None
+
+
+class ScoreResponse(BaseModel):
+    signals: list[str]
+    scores: list[int]
+    priorities: list[str]
+    masks: list[int]
+    order: list[int]
+
+
+class QueryFilters(BaseModel):
+    """The frontend ``QueryFilters``, with its camelCase field names."""
+
+    model_config = ConfigDict(alias_generator=to_camel, populate_by_name=True)
+
+    city: str | None = None
+    min_days_online: int | None = None
+    max_days_online: int | None = None
+    has_price_drop: bool | None = None
+    dpe_classes: list[str] | None = None
+    seller_type: str | None = None
+    min_price: int | None = None
+    max_price: int | None = None
+    property_type: str | None = None
+    sort_by: str | None = None
+    sort_order: str | None = None
+    limit: int | None = None
+
+
+class SavedSearchRequest(BaseModel):
+    location: str
+    min_price: int
+    max_price: int
+    max_listings: int
+    cadence_seconds: float | None = None
+
+
+class ListingsRequest(BaseModel):
+    listings: list[dict]
+
+
+class ListingsResponse(BaseModel):
+    total: int
+    stored: int
+    listings: list[dict]
+
+
+async def chat_response(conversation_id: str, result) -> ChatResponse:
     reply = result.final_output if isinstance(result.final_output, str) else str(result.final_output)
     listings = None
     if isinstance(result.context_wrapper.context, dict):
-        listings = result.context_wrapper.context.get("last_listings")
+        last_result = await asyncio.to_thread(
+            get_session_store().get_payload, result.context_wrapper.context.get("last_result_ref")
+        )
+        if last_result is not None:
+            listings = last_result.get("listings", [])
     return ChatResponse(conversation_id=conversation_id, reply=reply, listings=listings)
 
 
-if __name__ == "__main__":
+@app.post("/chat", response_model=ChatResponse)
+async def chat(request: ChatRequest) -> ChatResponse:
+    conversation_id = request.conversation_id or str(uuid4())
+    store = get_session_store()
+    async with store.lock(conversation_id):
+        # Session store calls may hit SQLite, so they run off the event loop.
+        session = await asyncio.to_thread(store.get, conversation_id)
+        result = await Runner.run(
+            agent,
+            request.message,
+            context=session["context"],
+            previous_response_id=session["previous_response_id"],
+            auto_previous_response_id=True,
+        )
+        session["previous_response_id"] = result.last_response_id
+        try:
+            await asyncio.to_thread(store.put, conversation_id, session)
+        except SessionConflict as e:
+            # A turn of the same conversation on another worker saved first.
+            raise HTTPException(status_code=409, detail=str(e)) from e
+    return await chat_response(conversation_id, result)
+
+
+def sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@app.post("/chat/stream")
+async def chat_stream(request: ChatRequest) -> StreamingResponse:
+    """Same turn as ``/chat``, sent as Server-Sent Events while it runs.
+
+    Events: ``start`` with the conversation id, ``delta`` for each piece of
+    reply text, ``listing`` for each listing as soon as it is scraped,
+    ``source`` as each listing platform finishes, then ``done`` with the
+    ``ChatResponse`` payload (or ``error``).
+    """
+    conversation_id = request.conversation_id or str(uuid4())
+    store = get_session_store()
+    loop = asyncio.get_running_loop()
+    events = asyncio.Queue()
+
+    def on_listing(listing: dict) -> None:
+        # Called from scraper threads.
+        loop.call_soon_threadsafe(events.put_nowait, ("listing", listing))
+
+    def on_source(source: dict) -> None:
+        events.put_nowait(("source", source))
+
+    async def run_agent() -> None:
+        # This task runs in its own context copy, so the sink is only seen by this turn's tools.
+        listing_sink.set(on_listing)
+        source_sink.set(on_source)
+        result = None
+        try:
+            async with store.lock(conversation_id):
+                session = await asyncio.to_thread(store.get, conversation_id)
+                result = Runner.run_streamed(
+                    agent,
+                    request.message,
+                    context=session["context"],
+                    previous_response_id=session["previous_response_id"],
+                    auto_previous_response_id=True,
+                )
+                async for event in result.stream_events():
+                    if event.type != "raw_response_event":
+                        continue
+                    if getattr(event.data, "type", None) == "response.output_text.delta":
+                        events.put_nowait(("delta", {"text": event.data.delta}))
+                session["previous_response_id"] = result.last_response_id
+                await asyncio.to_thread(store.put, conversation_id, session)
+            events.put_nowait(("done", (await chat_response(conversation_id, result)).model_dump()))
+        except asyncio.CancelledError:
+            if result is not None:
+                result.cancel()
+            raise
+        except Exception as e:
+            events.put_nowait(("error", {"conversation_id": conversation_id, "error": str(e)}))
+        finally:
+            events.put_nowait(None)
+
+    async def stream():
+        task = asyncio.create_task(run_agent())
+        try:
+            yield sse("start", {"conversation_id": conversation_id})
+            while (item := await events.get()) is not None:
+                yield sse(*item)
+        finally:
+            # The client went away or the turn is over; stop the agent either way.
+            task.cancel()
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.post("/jobs", response_model=JobResponse, status_code=202)
+async def create_job(request: JobRequest) -> JobResponse:
+    job = await get_job_manager().submit(
+        request.location, request.min_price, request.max_price, request.max_listings
+    )
+    return JobResponse(**job.snapshot())
+
+
+@app.get("/jobs/{job_id}", response_model=JobResponse)
+async def get_job(job_id: str, since: int = 0) -> JobResponse:
+    """Return the job status and the listings scraped so far, from index ``since`` on."""
+    snapshot = await get_job_manager().snapshot(job_id, since)
+    if snapshot is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return JobResponse(**snapshot)
+
+
+@app.delete("/jobs/{job_id}", response_model=JobResponse)
+async def cancel_job(job_id: str) -> JobResponse:
+    snapshot = await get_job_manager().cancel(job_id)
+    if snapshot is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return JobResponse(**snapshot)
+
+
+@app.post("/score", response_model=ScoreResponse)
+def score(request: ScoreRequest) -> ScoreResponse:
+    """Score a batch of listings; ``order`` ranks their indices, best first.
+
+    Bit ``i`` of each mask is the signal ``signals[i]``. Declared without
+    ``async`` so that large batches are scored off the event loop.
+    """
+    scored = score_listings(request.listings, request.limit)
+    return ScoreResponse(signals=[signal["id"] for signal in SIGNALS], **scored)
+
+
+@app.post("/listings")
+def add_listings(request: ListingsRequest) -> dict:
+    """Store listings (frontend ``Listing`` shape), replacing any with the same ``id``."""
+    store = get_listing_store()
+    store.add(request.listings)
+    return store.stats
+
+
+@app.post("/listings/query", response_model=ListingsResponse)
+def query_listings(filters: QueryFilters) -> ListingsResponse:
+    """Scored listings matching ``filters``, best first, and how many matched in all."""
+    return ListingsResponse(**get_listing_store().query(filters.model_dump(by_alias=True, exclude_none=True)))
+
+
+@app.get("/listings/history")
+def listing_history(
+    min_drops: int = 0,
+    min_days_online: int | None = None,
+    max_days_online: int | None = None,
+    location: str | None = None,
+    limit: int = 100,
+) -> list[dict]:
+    """Scraped listings by price drops and days online, from the price history."""
+    return get_price_history().query(min_drops, min_days_online, max_days_online, location, limit)
+
+
+@app.get("/crawler/searches")
+def crawler_searches() -> list[dict]:
+    """The searches the crawler keeps warm, saved and frequent, next due first."""
+    return get_crawl_schedule().hot_searches()
+
+
+@app.post("/crawler/searches", status_code=201)
+def save_search(request: SavedSearchRequest) -> dict:
+    """Have the crawler re-run a search every ``cadence_seconds`` (default ``CRAWLER_CADENCE``)."""
+    return get_crawl_schedule().save(
+        request.location, request.min_price, request.max_price, request.max_listings, request.cadence_seconds
+    )
+
+
+@app.delete("/crawler/searches")
+def unsave_search(location: str, min_price: int, max_price: int) -> dict:
+    if not get_crawl_schedule().unsave(location, min_price, max_price):
+        raise HTTPException(status_code=404, detail="Saved search not found")
+    return {"location": location, "min_price": min_price, "max_price": max_price, "saved": False}
+
+
+@app.get("/stats")
+async def stats() -> dict:
+    crawler = getattr(app.state, "crawler", None)
+    return {
+        "scrapes": get_executor().stats,
+        "devices": get_pool().stats,
+        "breakers": breaker_stats(),
+        "checkpoints": get_checkpoints().stats,
+        "cache": get_cache().stats,
+        "seen": get_seen_index().stats,
+        "price_history": get_price_history().stats,
+        "listings": get_listing_store().stats,
+        "sessions": get_session_store().stats,
+        "crawler": crawler.stats if crawler is not None else get_crawl_schedule().stats,
+    }
+
+
+# State every worker must share, and the files it goes to in multi-worker mode.
+SHARED_STATE_PATHS = {
+    "SESSION_STORE_PATH": "sessions.db",
+    "SCRAPE_CACHE_PATH": "scrape_cache.db",
+    "JOB_STORE_PATH": "jobs.db",
+    "CRAWLER_STORE_PATH": "crawler.db",
+    "SCRAPE_CHECKPOINT_PATH": "checkpoints.db",
+}
+DEFAULT_STATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "state")
+
+
+def share_state(state_dir: str) -> None:
+    """Point the stores every worker shares (sessions, cache, jobs, crawls, checkpoints) at ``state_dir``.
+
+    Variables already set are kept. Must run before the workers import this
+    module, which reads them at import time.
+    """
+    os.makedirs(state_dir, exist_ok=True)
+    for variable, filename in SHARED_STATE_PATHS.items():
+        os.environ.setdefault(variable, os.path.join(state_dir, filename))
+
+
+def main() -> None:
+    import argparse
+
     import uvicorn
 
-    uvicorn.run("api_server:app", host="0.0.0.0", port=8000)
+    parser = argparse.ArgumentParser(description="Serve the real estate agent API.")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=int(os.getenv("API_WORKERS", "1")),
+        help="Worker processes; above 1, sessions, cached results and jobs are shared through SQLite.",
+    )
+    parser.add_argument("--state-dir", default=os.getenv("API_STATE_DIR", DEFAULT_STATE_DIR))
+    args = parser.parse_args()
+    if args.workers > 1:
+        share_state(args.state_dir)
+    uvicorn.run("api_server:app", host=args.host, port=args.port, workers=args.workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+"""Record Appium wire traffic once, then replay it offline.
+
+``RecordingProxy`` sits between ``webdriver.Remote`` and a real endpoint
+(the Device Farm session, or any Appium server), forwarding every request
+and writing each exchange, page sources included, to a JSON-lines
+cassette. Session and element ids are rewritten to stable placeholders so
+the cassette does not depend on the run that produced it; the endpoint URL,
+which carries credentials, is never written.
+
+``ReplayServer`` serves a cassette back from a local HTTP server. Responses
+are matched on method, path and body and, for a repeated request such as a
+wait polling for an element, handed out in recorded order; once a request's
+recordings run out the last one is repeated. ``latency`` injects a fixed
+delay per command, otherwise each response waits its recorded time times
+``scale``. A run asking for fewer listings than were recorded replays a
+prefix of the traffic, so one recording serves several benchmark sizes.
+
+Usage:
+    python appium_replay.py record cassette.jsonl --listings 100 [--upstream URL | --fake]
+"""
+import argparse
+import contextlib
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict, deque
+
+import test_search
+from fake_appium import ELEMENT_KEY, FakeAppiumServer, WireServer, wire_error
+
+CASSETTE_VERSION = 1
+_ELEMENT_KEYS = (ELEMENT_KEY, "ELEMENT")
+
+
+def request_key(method: str, path: str, body: dict) -> str:
+    if method == "POST" and path.rstrip("/") == "/session":
+        # Capabilities differ between clients; any new session matches.
+        body = {}
+    return f"{method} {path} {json.dumps(body, sort_keys=True)}"
+
+
+class _Placeholders:
+    """Maps the ids a server hands out to ``s0``, ``s1``... and ``e0``, ``e1``..."""
+
+    def __init__(self) -> None:
+        self._ids = {}
+        self._counts = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def get(self, kind: str, real_id: str) -> str:
+        with self._lock:
+            if real_id not in self._ids:
+                self._ids[real_id] = f"{kind}{self._counts[kind]}"
+                self._counts[kind] += 1
+            return self._ids[real_id]
+
+    def path(self, path: str) -> str:
+        parts = path.split("/")
+        for i in range(1, len(parts)):
+            if parts[i - 1] == "session" and parts[i]:
+                parts[i] = self.get("s", parts[i])
+            elif parts[i - 1] == "element" and parts[i] not in ("", "active"):
+                parts[i] = self.get("e", parts[i])
+        return "/".join(parts)
+
+    def value(self, value):
+        if isinstance(value, list):
+            return [self.value(item) for item in value]
+        if isinstance(value, dict):
+            return {
+                key: self.get("e", item) if key in _ELEMENT_KEYS and isinstance(item, str) else self.value(item)
+                for key, item in value.items()
+            }
+        return value
+
+
+class RecordingProxy(WireServer):
+    """Forwards wire requests to ``upstream`` and appends each exchange to ``path``.
+
+    ``search`` describes the recorded search, so a replay can repeat it.
+    """
+
+    def __init__(
+        self,
+        upstream: str,
+        path: str,
+        search: dict | None = None,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        timeout: float = 120,
+    ) -> None:
+        super().__init__(host, port)
+        self.upstream = upstream.rstrip("/")
+        self.timeout = timeout
+        self._ids = _Placeholders()
+        self._file = open(path, "w", encoding="utf-8")
+        self._file.write(json.dumps({"cassette": CASSETTE_VERSION, "recorded_at": time.time(), "search": search or {}}) + "\n")
+        self._file_lock = threading.Lock()
+
+    def _forward(self, method: str, path: str, body: dict) -> tuple[int, dict]:
+        data = json.dumps(body).encode("utf-8") if method == "POST" else None
+        request = urllib.request.Request(
+            self.upstream + path,
+            data=data,
+            method=method,
+            headers={"Content-Type": "application/json; charset=utf-8"},
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return response.status, json.loads(response.read() or b"{}")
+        except urllib.error.HTTPError as e:
+            return e.code, json.loads(e.read() or b"{}")
+        except (urllib.error.URLError, TimeoutError) as e:
+            return wire_error(500, "unknown error", f"Upstream unreachable: {e}")
+
+    def handle(self, method: str, path: str, body: dict) -> tuple[int, dict]:
+        start = time.perf_counter()
+        status, payload = self._forward(method, path, body)
+        elapsed = time.perf_counter() - start
+        value = payload.get("value") if isinstance(payload, dict) else None
+        exchange = {
+            "method": method,
+            "path": self._ids.path(path),
+            "body": self._ids.value(body),
+            "status": status,
+            "response": self._ids.value(payload),
+            "elapsed": round(elapsed, 4),
+        }
+        if method == "POST" and path.rstrip("/") == "/session" and isinstance(value, dict) and value.get("sessionId"):
+            exchange["response"]["value"]["sessionId"] = self._ids.get("s", value["sessionId"])
+        with self._file_lock:
+            self._file.write(json.dumps(exchange, ensure_ascii=False) + "\n")
+            self._file.flush()
+        return status, payload
+
+    def stop(self) -> None:
+        super().stop()
+        with self._file_lock:
+            self._file.close()
+
+
+def load_cassette(path: str) -> tuple[dict, list[dict]]:
+    """Return the header and the exchanges of a cassette."""
+    with open(path, encoding="utf-8") as f:
+        header = json.loads(f.readline())
+        if header.get("cassette") != CASSETTE_VERSION:
+            raise ValueError(f"{path} is not a version {CASSETTE_VERSION} cassette")
+        return header, [json.loads(line) for line in f if line.strip()]
+
+
+class ReplayServer(WireServer):
+    """Answers wire requests from a recorded cassette."""
+
+    def __init__(
+        self,
+        path: str,
+        latency: float | None = None,
+        scale: float = 1.0,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ) -> None:
+        super().__init__(host, port)
+        self.latency = latency
+        self.scale = scale
+        self.misses = 0
+        header, exchanges = load_cassette(path)
+        # Replays must repeat the recorded search for the traffic to match.
+        self.search = header.get("search", {})
+        self._exchanges = defaultdict(deque)
+        for exchange in exchanges:
+            key = request_key(exchange["method"], exchange["path"], exchange["body"])
+            self._exchanges[key].append(exchange)
+        self._lock = threading.Lock()
+
+    def handle(self, method: str, path: str, body: dict) -> tuple[int, dict]:
+        with self._lock:
+            recorded = self._exchanges.get(request_key(method, path, body))
+            if not recorded:
+                self.misses += 1
+                exchange = None
+            elif len(recorded) > 1:
+                exchange = recorded.popleft()
+            else:
+                exchange = recorded[0]
+        if exchange is None:
+            return wire_error(404, "unknown command", f"Not in cassette: {method} {path}")
+        time.sleep(self.latency if self.latency is not None else exchange["elapsed"] * self.scale)
+        return exchange["status"], exchange["response"]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Record Appium traffic of one search into a cassette.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    record = subparsers.add_parser("record")
+    record.add_argument("cassette")
+    record.add_argument("--location", default="Paris")
+    record.add_argument("--min-price", type=int, default=200000)
+    record.add_argument("--max-price", type=int, default=400000)
+    record.add_argument("--listings", type=int, default=100)
+    record.add_argument("--filter", action="append", default=[], metavar="NAME=VALUE")
+    record.add_argument("--upstream", help="Appium endpoint to record (default: APPIUM_ENDPOINT).")
+    record.add_argument("--fake", action="store_true", help="Record the local fake app instead of a device.")
+    args = parser.parse_args()
+
+    with contextlib.ExitStack() as stack:
+        upstream = args.upstream or test_search.APPIUM_ENDPOINT
+        if args.fake:
+            upstream = stack.enter_context(FakeAppiumServer(latency=0.0, transition=0.05, launch=0.1)).url
+        search = {
+            "location": args.location,
+            "min_price": args.min_price,
+            "max_price": args.max_price,
+            "filters": dict(item.split("=", 1) for item in args.filter) or None,
+        }
+        proxy = stack.enter_context(RecordingProxy(upstream, args.cassette, search))
+        test_search.APPIUM_ENDPOINT = proxy.url
+        result = test_search.search_listings(max_listings=args.listings, **search)
+    print(f"Recorded {proxy.requests} requests, {result['scraped']} listings, to {args.cassette}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,1322 @@
+"""Offline benchmarks for the scraper, run against the fake Appium driver.
+
+Usage:
+    python benchmark.py search --listings 10 [--extraction elements] [--trace]
+    python benchmark.py scroll --listings 50 [--fling 0.3]
+    python benchmark.py incremental --listings 10 --new 2
+    python benchmark.py navigation --runs 5
+    python benchmark.py pool --searches 5
+    python benchmark.py parallel --listings 9 --devices 1 2 3
+    python benchmark.py platforms --listings 5 [--timeout 8]
+    python benchmark.py replay --sizes 5 20 100 [--cassette recorded.jsonl] [--latency 0.02]
+    python benchmark.py score --sizes 10000 50000
+    python benchmark.py listings --size 100000
+    python benchmark.py parse --size 100000 [--distinct 5000]
+    python benchmark.py dedup --size 100000 [--reposts 0.1]
+    python benchmark.py history --listings 20000 --days 120
+    python benchmark.py sessions --conversations 5000 --max-entries 1000
+    python benchmark.py chat --scrapes 4 --chats 20 [--blocking]
+    python benchmark.py stream --listings 5 --card-seconds 1.0
+    python benchmark.py workers --workers 1 2 4 --seconds 10
+    python benchmark.py crawler --seconds 30 --searches 8 [--ttl 6]
+    python benchmark.py faults --runs 4 --listings 10 [--faults 0.01] [--crashes 0.003]
+
+Recorded on the fake driver (20 ms per command, 300 ms per screen
+transition, 1 s app launch), 10 listings:
+
+    fixed time.sleep pacing     219.7 s wall clock, 382 remote calls
+    condition-driven waits       47.3 s wall clock, 767 remote calls
+
+Condition waits polled at a fixed 0.1 s vs backed off from 0.1 s to 0.3 s,
+on the current scraper, 10 listings:
+
+    fixed 0.1 s polling          26.5 s wall clock, 356 remote calls
+    backed-off polling           24.7 s wall clock, 298 remote calls
+
+Same run once listing pages carry ~30 labels, by extraction mode:
+
+    elements (lookup per field)  56.3 s wall clock, 1217 remote calls
+    page_source (parsed locally) 44.0 s wall clock,  605 remote calls
+
+With the results-list pre-filter (rows read from the page source, cards
+repeated by the scroll overlap never reopened):
+
+    page_source + list pre-filter 29.9 s wall clock,  414 remote calls
+
+50 listings on a 70-listing results list (pixel-scrolled, ~2.5 rows on screen):
+
+    two-slot loop, one row per swipe  127.2 s, 1684 remote calls, 65 swipes
+    ResultsScroller                   107.2 s, 1358 remote calls, 32 swipes
+
+Replayed from a cassette of the fake app, 20 ms injected per command:
+
+    5 listings     6.1 s   48.9 listings/min   22.4 calls/listing
+    20 listings   25.6 s   46.8 listings/min   22.9 calls/listing
+    100 listings 130.1 s   46.1 listings/min   23.0 calls/listing
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import random
+import re
+import socket
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from types import SimpleNamespace
+from uuid import uuid4
+
+import listing_parser
+import near_duplicates
+import platforms
+import resilience
+import scoring
+import test_search
+from appium_replay import RecordingProxy, ReplayServer
+from checkpoints import CheckpointStore
+from crawler import CrawlSchedule, Crawler
+from device_pool import DevicePool
+from fake_appium import FakeAppiumServer, FakeDriver, make_listings
+from listing_store import ListingStore
+from parallel_scrape import search_listings_parallel
+from price_history import DAY_SECONDS, PriceHistory
+from result_cache import ResultCache
+from scrape_executor import ScrapeExecutor
+from seen_index import SeenIndex
+from session_store import SessionStore
+from tracing import Tracer
+from waits import StepWaiter
+
+numpy_module = scoring.np
+
+
+def bench_search(
+    max_listings: int,
+    latency: float,
+    transition: float,
+    launch: float,
+    extraction: str = "page_source",
+    trace: bool = False,
+) -> dict:
+    drivers = []
+    tracer = Tracer() if trace else None
+
+    def factory() -> FakeDriver:
+        driver = FakeDriver(latency=latency, transition=transition, launch=launch)
+        drivers.append(driver)
+        return driver
+
+    original = test_search.create_driver
+    test_search.create_driver = factory
+    try:
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = test_search.search_listings(
+                "Paris", 200000, 400000, max_listings, extraction=extraction, trace=tracer
+            )
+        elapsed = time.perf_counter() - start
+    finally:
+        test_search.create_driver = original
+
+    commands = sum(driver.commands for driver in drivers)
+    if tracer is not None:
+        tracer.print_summary()
+    return {
+        "requested": max_listings,
+        "scraped": result["scraped"],
+        "error": result.get("error"),
+        "wall_seconds": round(elapsed, 2),
+        "remote_calls": commands,
+        "calls_per_listing": round(commands / max(result["scraped"], 1), 1),
+    }
+
+
+def bench_scroll(max_listings: int, latency: float, transition: float, launch: float, fling: float) -> dict:
+    """Swipes and card opens of one search over a long results list."""
+    driver = FakeDriver(
+        listings=make_listings(max_listings + 20), latency=latency, transition=transition, launch=launch, fling=fling
+    )
+    original = test_search.create_driver
+    test_search.create_driver = lambda: driver
+    try:
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = test_search.search_listings("Paris", 0, 10**9, max_listings)
+        elapsed = time.perf_counter() - start
+    finally:
+        test_search.create_driver = original
+    return {
+        "scraped": result["scraped"],
+        "error": result.get("error"),
+        "swipes": driver.swipes,
+        "cards_opened": driver.cards_opened,
+        "wall_seconds": round(elapsed, 2),
+        "remote_calls": driver.commands,
+    }
+
+
+def bench_incremental(max_listings: int, new_listings: int, latency: float, transition: float, launch: float) -> dict:
+    """A full search, then a repeat "only new" search after ``new_listings`` were published."""
+    listings = make_listings(40 + new_listings)
+    newest, older = listings[:new_listings], listings[new_listings:]
+    index = SeenIndex(":memory:")
+    runs = {}
+    original = test_search.create_driver
+    try:
+        for mode, available, known in (
+            ("full", older, None),
+            ("only_new", newest + older, index.matcher("Paris", 0, 10**9)),
+        ):
+            driver = FakeDriver(listings=available, latency=latency, transition=transition, launch=launch)
+            test_search.create_driver = lambda: driver
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                result = test_search.search_listings("Paris", 0, 10**9, max_listings, known=known)
+            elapsed = time.perf_counter() - start
+            index.record("Paris", 0, 10**9, result["listings"])
+            runs[mode] = {
+                "scraped": result["scraped"],
+                "known_skipped": result.get("known_skipped", 0),
+                "wall_seconds": round(elapsed, 2),
+                "remote_calls": driver.commands,
+            }
+    finally:
+        test_search.create_driver = original
+    return runs
+
+
+def bench_navigation(runs: int, latency: float, transition: float, launch: float) -> dict:
+    """Median seconds from a fresh session to the first results card, per navigation path.
+
+    "fallback" is "auto" navigation on an app that rejects the deep link.
+    """
+    timings = {}
+    for mode, navigation, deep_links in (
+        ("ui", "ui", True),
+        ("deeplink", "deeplink", True),
+        ("fallback", "auto", False),
+    ):
+        values = []
+        for _ in range(runs):
+            test_search._deep_link_failed_at = None
+            driver = FakeDriver(latency=latency, transition=transition, launch=launch, deep_links=deep_links)
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                test_search.navigate_to_results(
+                    driver, StepWaiter(driver), "Paris", 200000, 400000, navigation=navigation
+                )
+            values.append(time.perf_counter() - start)
+        timings[mode] = {"median_seconds": round(statistics.median(values), 2), "remote_calls": driver.commands}
+    return timings
+
+
+def bench_pool(searches: int, session_delay: float) -> dict:
+    """Per-search wall clock over HTTP with a fresh session each time vs a warm pool."""
+    timings = {"fresh": [], "pooled": []}
+    with FakeAppiumServer(session_delay=session_delay, latency=0.0, transition=0.05, launch=0.1) as server:
+        pool = DevicePool(partial(test_search.create_driver, server.url), size=1)
+        for mode in ("fresh", "pooled"):
+            for _ in range(searches):
+                start = time.perf_counter()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    if mode == "pooled":
+                        test_search.search_listings("Paris", 200000, 400000, 2, pool=pool)
+                    else:
+                        original = test_search.APPIUM_ENDPOINT
+                        test_search.APPIUM_ENDPOINT = server.url
+                        try:
+                            test_search.search_listings("Paris", 200000, 400000, 2)
+                        finally:
+                            test_search.APPIUM_ENDPOINT = original
+                timings[mode].append(time.perf_counter() - start)
+        pool.close()
+    return {
+        mode: {"mean_seconds": round(sum(values) / len(values), 2), "first": round(values[0], 2)}
+        for mode, values in timings.items()
+    } | {"sessions_created": server.created}
+
+
+def bench_parallel(max_listings: int, devices: list[int]) -> dict:
+    """Wall clock of one sharded search for each device count."""
+    results = {}
+    for count in devices:
+        with FakeAppiumServer(latency=0.0, transition=0.05, launch=0.1) as server:
+            pool = DevicePool(partial(test_search.create_driver, server.url), size=count)
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                result = search_listings_parallel("Paris", 200000, 400000, max_listings, pool=pool)
+            elapsed = time.perf_counter() - start
+            pool.close()
+        results[count] = {
+            "wall_seconds": round(elapsed, 2),
+            "scraped": result["scraped"],
+            "listings_per_minute": round(60 * result["scraped"] / elapsed, 1),
+        }
+    return results
+
+
+class StubPlatform(platforms.Platform):
+    """A platform whose app is not faked yet: a listing every ``card_seconds``."""
+
+    def __init__(self, name: str, card_seconds: float, timeout: float | None = None) -> None:
+        self.name = name
+        super().__init__(timeout)
+        self.card_seconds = card_seconds
+
+    def search(self, location, min_price, max_price, max_listings, on_listing=None, cancel=None, known=None):
+        listings = []
+        for listing in make_listings(max_listings, min_price=min_price):
+            if cancel is not None and cancel.is_set():
+                return {"listings": listings, "scraped": len(listings), "cancelled": True}
+            time.sleep(self.card_seconds)
+            listing = {"index": len(listings) + 1, **listing}
+            listings.append(listing)
+            if on_listing is not None:
+                on_listing(listing)
+        return {"listings": listings, "scraped": len(listings)}
+
+
+def bench_platforms(max_listings: int, timeout: float) -> dict:
+    """When each platform's results arrive with the fan-out, vs searching the platforms one by one.
+
+    SeLoger runs on the fake app; the other platforms are stubs of
+    different speeds, the slowest beyond ``timeout``.
+    """
+    with FakeAppiumServer(latency=0.0, transition=0.05, launch=0.1) as server:
+        pool = DevicePool(partial(test_search.create_driver, server.url), size=1)
+        sources = [
+            platforms.SeLoger(pool=pool, timeout=timeout),
+            StubPlatform("PAP", 0.2, timeout),
+            StubPlatform("Leboncoin", 1.0, timeout),
+            StubPlatform("Bien'ici", 3.0, timeout),
+        ]
+        platforms.get_executor = lambda: ScrapeExecutor(concurrency=len(sources))
+
+        async def run() -> list[dict]:
+            start = time.perf_counter()
+            arrivals = []
+            async for result in platforms.fan_out("Paris", 200000, 400000, max_listings, sources):
+                arrivals.append(
+                    {
+                        "platform": result["platform"],
+                        "arrived_seconds": round(time.perf_counter() - start, 2),
+                        "scraped": result["scraped"],
+                        **({"error": result["error"]} if result.get("error") else {}),
+                    }
+                )
+            return arrivals
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            arrivals = asyncio.run(run())
+            sequential = 0.0
+            for source in sources:
+                start = time.perf_counter()
+                with contextlib.suppress(Exception):
+                    source.search("Paris", 200000, 400000, max_listings)
+                sequential += min(time.perf_counter() - start, timeout)
+        pool.close()
+    return {
+        "arrivals": arrivals,
+        "fan_out_seconds": arrivals[-1]["arrived_seconds"],
+        "sequential_seconds": round(sequential, 2),
+    }
+
+
+def bench_replay(sizes: list[int], cassette: str | None, latency: float | None, scale: float) -> dict:
+    """Listings/minute, remote calls per listing and wall clock per search size, replayed.
+
+    Without ``cassette``, one search for the largest size is first recorded
+    against the fake app; a cassette recorded on a device gives the same
+    figures for the real app's traffic.
+    """
+    results = {}
+    original = test_search.APPIUM_ENDPOINT
+    with tempfile.TemporaryDirectory() as tmp:
+        if cassette is None:
+            cassette = os.path.join(tmp, "cassette.jsonl")
+            search = {"location": "Paris", "min_price": 0, "max_price": 10**9}
+            listings = make_listings(max(sizes) + 10)
+            with FakeAppiumServer(listings=listings, latency=0.0, transition=0.05, launch=0.1) as fake:
+                with RecordingProxy(fake.url, cassette, search) as proxy:
+                    test_search.APPIUM_ENDPOINT = proxy.url
+                    try:
+                        with contextlib.redirect_stdout(io.StringIO()):
+                            test_search.search_listings(max_listings=max(sizes), **search)
+                    finally:
+                        test_search.APPIUM_ENDPOINT = original
+        for size in sizes:
+            test_search._deep_link_failed_at = None
+            with ReplayServer(cassette, latency=latency, scale=scale) as server:
+                test_search.APPIUM_ENDPOINT = server.url
+                try:
+                    start = time.perf_counter()
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        result = test_search.search_listings(max_listings=size, **server.search)
+                    elapsed = time.perf_counter() - start
+                finally:
+                    test_search.APPIUM_ENDPOINT = original
+            results[size] = {
+                "scraped": result["scraped"],
+                "error": result.get("error"),
+                "wall_seconds": round(elapsed, 2),
+                "listings_per_minute": round(60 * result["scraped"] / elapsed, 1),
+                "remote_calls": server.requests,
+                "calls_per_listing": round(server.requests / max(result["scraped"], 1), 1),
+                "unmatched_calls": server.misses,
+            }
+    return results
+
+
+def synthetic_listings(count: int, seed: int = 0) -> list[dict]:
+    """Listings shaped like the frontend ``Listing`` type, spread over Lyon and Paris."""
+    rng = random.Random(seed)
+    places = [("Lyon", f"Lyon {n}ème", f"6900{n}") for n in range(1, 10)]
+    places += [("Paris", f"Paris {n}e", f"750{n:02d}") for n in range(1, 21)]
+    places += [("Villeurbanne", "Villeurbanne Centre", "69100")]
+    listings = []
+    for number in range(count):
+        city, zone, postal = rng.choice(places)
+        listings.append(
+            {
+                "id": str(number),
+                "city": city,
+                "geoZone": zone,
+                "postalCode": postal,
+                "price": rng.randrange(80000, 1500000, 1000),
+                "priceHistory": [{}] * rng.choice([0, 0, 0, 1, 2]),
+                "surface": rng.randint(15, 200),
+                "propertyType": rng.choice(["Appartement", "Maison", "Terrain"]),
+                "daysOnline": rng.randint(0, 150),
+                "dpeClass": rng.choice(list("ABCDEFG") + ["Non renseigné"]),
+                "sellerType": rng.choice(["Particulier", "Professionnel"]),
+            }
+        )
+    return listings
+
+
+def bench_score(sizes: list[int]) -> dict:
+    """Seconds to score and rank synthetic listings, per listing in Python vs on columns."""
+    results = {}
+    for size in sizes:
+        listings = synthetic_listings(size)
+        timings = {}
+        for mode in ("python", "numpy"):
+            if mode == "numpy" and numpy_module is None:
+                continue
+            scoring.np = numpy_module if mode == "numpy" else None
+            start = time.perf_counter()
+            scoring.score_listings(listings)
+            timings[f"{mode}_seconds"] = round(time.perf_counter() - start, 3)
+        scoring.np = numpy_module
+        results[size] = timings
+    return results
+
+
+def filter_linearly(listings: list[dict], filters: dict) -> list[dict]:
+    """The filter chain and sort of ``listingService.queryListings``, in Python."""
+    results = list(listings)
+    if filters.get("city"):
+        city = filters["city"].lower()
+        results = [l for l in results if city in l["city"].lower() or city in l["geoZone"].lower()]
+    if filters.get("minDaysOnline") is not None:
+        results = [l for l in results if l["daysOnline"] >= filters["minDaysOnline"]]
+    if filters.get("maxDaysOnline") is not None:
+        results = [l for l in results if l["daysOnline"] <= filters["maxDaysOnline"]]
+    if filters.get("hasPriceDrop"):
+        results = [l for l in results if l["priceHistory"]]
+    if filters.get("dpeClasses"):
+        results = [l for l in results if l["dpeClass"] in filters["dpeClasses"]]
+    if filters.get("sellerType"):
+        results = [l for l in results if l["sellerType"] == filters["sellerType"]]
+    if filters.get("minPrice") is not None:
+        results = [l for l in results if l["price"] >= filters["minPrice"]]
+    if filters.get("maxPrice") is not None:
+        results = [l for l in results if l["price"] <= filters["maxPrice"]]
+    if filters.get("propertyType"):
+        results = [l for l in results if l["propertyType"] == filters["propertyType"]]
+    scored = scoring.rank_listings(results)
+    if filters.get("sortBy", "score") != "score":
+        direction = 1 if filters.get("sortOrder") == "asc" else -1
+        scored.sort(key=lambda listing: listing[filters["sortBy"]] * direction)
+    return scored[: filters["limit"]] if filters.get("limit") else scored
+
+
+LISTING_QUERIES = [
+    {"city": "lyon", "limit": 20},
+    {"city": "paris", "dpeClasses": ["F", "G"], "hasPriceDrop": True, "limit": 10},
+    {"minPrice": 200000, "maxPrice": 210000, "limit": 10},
+    {"sellerType": "Particulier", "minDaysOnline": 90, "sortBy": "price", "sortOrder": "asc", "limit": 15},
+    {"propertyType": "Maison", "maxPrice": 300000, "minDaysOnline": 60, "maxDaysOnline": 61},
+    {"limit": 50},
+]
+
+
+def bench_listings(size: int) -> dict:
+    """Milliseconds per ``QueryFilters`` query: indexed store vs the linear filter chain."""
+    listings = synthetic_listings(size)
+    store = ListingStore()
+    store.add(listings)
+    start = time.perf_counter()
+    store.query({"limit": 1})
+    results = {"index_build_seconds": round(time.perf_counter() - start, 2)}
+    for filters in LISTING_QUERIES:
+        start = time.perf_counter()
+        indexed = store.query(filters)
+        indexed_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        linear = filter_linearly(listings, filters)
+        linear_ms = (time.perf_counter() - start) * 1000
+        results[json.dumps(filters)] = {
+            "matches": indexed["total"],
+            "same_results": [l["id"] for l in indexed["listings"]] == [l["id"] for l in linear],
+            "indexed_ms": round(indexed_ms, 1),
+            "linear_ms": round(linear_ms, 1),
+        }
+    return results
+
+
+def sample_labels(count: int, seed: int = 0) -> list[tuple[str, str, str]]:
+    """(price, details, phone) labels in the French and English forms pages use."""
+    rng = random.Random(seed)
+    labels = []
+    for _ in range(count):
+        price = rng.randrange(80000, 1500000, 500)
+        rooms, surface, floor = rng.randint(1, 7), rng.randint(15, 200) + rng.choice([0, 0, 0.5]), rng.randint(0, 12)
+        bedrooms = max(rooms - 1, 0)
+        if rng.random() < 0.5:
+            amount = f"{price:,}".replace(",", rng.choice([" ", "\u202f", "."]))
+            details = " · ".join(
+                [
+                    rng.choice([f"{rooms} pièces", f"T{rooms}", f"{rooms} p"]),
+                    f"{bedrooms} chambres",
+                    f"{surface:g} m²".replace(".", ","),
+                    "RDC" if floor == 0 else rng.choice([f"{floor}e étage", f"Étage {floor}"]),
+                ]
+            )
+            phone = rng.choice(["06 {} {} {} {}", "+33 6 {} {} {} {}", "06.{}.{}.{}.{}"])
+        else:
+            amount = f"{price:,}".replace(",", " ")
+            details = " · ".join(
+                [f"{rooms} rooms", f"{bedrooms} bedrooms", f"{surface:g} m²", "Ground floor" if floor == 0 else f"Floor {floor}"]
+            )
+            phone = "06 {} {} {} {}"
+        digits = [f"{rng.randint(0, 99):02d}" for _ in range(4)]
+        labels.append((f"{amount} €", details, phone.format(*digits)))
+    return labels
+
+
+def parse_per_field(price: str, details: str, phone: str) -> dict:
+    """What each consumer of the raw labels did: one search per field it needs."""
+    fields = {}
+    for name, pattern in [
+        ("rooms", r"(\d+)\s*(?:pièces?|rooms?)"),
+        ("bedrooms", r"(\d+)\s*(?:chambres?|bedrooms?)"),
+        ("surface", r"(\d+(?:[.,]\d+)?)\s*m²"),
+        ("floor", r"(?:étage|floor)\s*(\d+)|(\d+)\w*\s*(?:étage|floor)"),
+    ]:
+        match = re.search(pattern, details, re.IGNORECASE)
+        fields[name] = next((group for group in match.groups() if group), None) if match else None
+    fields["amount"] = re.sub(r"\D", "", price)
+    fields["phone"] = re.sub(r"\D", "", phone)
+    return fields
+
+
+def bench_parse(size: int, distinct: int) -> dict:
+    """Labels parsed per second: compiled parser, cold and warm cache, vs per-field searches."""
+    corpus = sample_labels(distinct)
+    labels = [corpus[i % distinct] for i in range(size)]
+    results = {}
+    start = time.perf_counter()
+    for labels_of_listing in labels:
+        parse_per_field(*labels_of_listing)
+    results["per_field_per_second"] = round(size / (time.perf_counter() - start))
+    for run in ("cold", "warm"):
+        if run == "cold":
+            listing_parser.parse_details.cache_clear()
+        start = time.perf_counter()
+        for labels_of_listing in labels:
+            listing_parser.parse_listing(*labels_of_listing)
+        results[f"parser_{run}_per_second"] = round(size / (time.perf_counter() - start))
+    parsed = [listing_parser.parse_listing(*labels_of_listing) for labels_of_listing in corpus]
+    results["surface_parsed"] = sum(fields.surface is not None for fields in parsed) / distinct
+    results["phone_parsed"] = sum(fields.phone_e164 is not None for fields in parsed) / distinct
+    return results
+
+
+DESCRIPTION_WORDS = (
+    "lumineux calme traversant balcon terrasse parquet moulures cheminée cave parking ascenseur gardien "
+    "rénové refait neuf vue dégagée jardin piscine proche métro écoles commerces gare double vitrage "
+    "cuisine équipée séparée salle de bains douche dressing placards exposition sud ouest est"
+).split()
+
+
+def scraped_listings(size: int, reposts: float, seed: int = 0) -> tuple[list[dict], dict[int, int]]:
+    """Scraped listings, and which ones repost which: reworded, repriced, on another platform."""
+    rng = random.Random(seed)
+    listings, reposted = [], {}
+    for (price, details, phone) in sample_labels(size, seed):
+        if listings and rng.random() < reposts:
+            original = rng.randrange(len(listings))
+            while original in reposted:
+                original = reposted[original]
+            source = listings[original]
+            words = source["description"].split()
+            for _ in range(3):
+                words[rng.randrange(len(words))] = rng.choice(DESCRIPTION_WORDS)
+            amount = listing_parser.parse_price(source["price"]) * rng.uniform(0.97, 1.03)
+            reposted[len(listings)] = original
+            listings.append(
+                {
+                    **source,
+                    "id": str(len(listings)),
+                    "platform": "Other",
+                    "price": f"{round(amount, -2):,.0f} €".replace(",", " "),
+                    "description": " ".join(words),
+                }
+            )
+            continue
+        listings.append(
+            {
+                "id": str(len(listings)),
+                "platform": "SeLoger",
+                "price": price,
+                "details": details,
+                "phone": phone,
+                "description": " ".join(rng.choices(DESCRIPTION_WORDS, k=rng.randint(25, 60))),
+            }
+        )
+    return listings, reposted
+
+
+def bench_dedup(size: int, reposts: float, scanned: int) -> dict:
+    """Near-duplicate lookups per second: LSH index vs a scan of every signature, and their accuracy."""
+    listings, reposted = scraped_listings(size, reposts)
+    index = near_duplicates.NearDuplicateIndex()
+    found = {}
+    start = time.perf_counter()
+    for item_id, listing in enumerate(listings):
+        duplicate = index.find(listing)
+        if duplicate is not None:
+            found[item_id] = duplicate
+        index.add(listing)
+    results = {"index_lookups_per_second": round(size / (time.perf_counter() - start))}
+    signatures = [index._signatures[item_id] for item_id in range(size)]
+    sample = range(size - scanned, size)
+    start = time.perf_counter()
+    for item_id in sample:
+        signature = signatures[item_id]
+        max((near_duplicates.similarity(signature, other), other) for other in signatures[:item_id])
+    results["scan_lookups_per_second"] = round(scanned / (time.perf_counter() - start))
+
+    def root(item_id: int) -> int:
+        while item_id in reposted:
+            item_id = reposted[item_id]
+        return item_id
+
+    results["reposts"] = len(reposted)
+    caught = sum(root(found.get(item_id, item_id)) == root(item_id) for item_id in reposted)
+    results["recall"] = round(caught / max(len(reposted), 1), 3)
+    results["false_merges"] = sum(root(duplicate) != root(item_id) for item_id, duplicate in found.items())
+    return results
+
+
+def bench_history(size: int, days: int, drop_chance: float) -> dict:
+    """Daily scrapes recorded in the price history; "2+ drops, over 60 days" from its index vs a replay."""
+    rng = random.Random(0)
+    labels = sample_labels(size)
+    # Listings go online over the period and each scrape sees the ones online so far.
+    online_from = sorted(rng.randrange(days) for _ in range(size))
+    amounts = [listing_parser.parse_price(price) for price, _, _ in labels]
+    start_day = int(time.time()) // DAY_SECONDS - days
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "history.db")
+        history = PriceHistory(path)
+        record_seconds = observations = 0
+        for day in range(days):
+            listings = []
+            for item_id in range(size):
+                if online_from[item_id] > day:
+                    break
+                if rng.random() < drop_chance:
+                    amounts[item_id] = int(round(amounts[item_id] * rng.uniform(0.9, 0.98), -3))
+                price, details, phone = labels[item_id]
+                listings.append(
+                    {
+                        "id": str(item_id),
+                        "platform": "SeLoger",
+                        "price": f"{amounts[item_id]:,} €".replace(",", " "),
+                        "details": details,
+                        "phone": phone,
+                    }
+                )
+            start = time.perf_counter()
+            history.record("Paris", listings, observed_at=(start_day + day) * DAY_SECONDS)
+            record_seconds += time.perf_counter() - start
+            observations += len(listings)
+        results = {
+            "observations": observations,
+            "observations_recorded_per_second": round(observations / record_seconds),
+            "bytes_per_observation": round(os.path.getsize(path) / observations, 1),
+        }
+        now = (start_day + days) * DAY_SECONDS
+        start = time.perf_counter()
+        indexed = history.query(min_drops=2, min_days_online=60, limit=size, now=now)
+        results["indexed_ms"] = round((time.perf_counter() - start) * 1000, 1)
+
+        # The same question answered from the observations alone.
+        start = time.perf_counter()
+        db = sqlite3.connect(path)
+        first_seen, last_amount, drops = {}, {}, Counter()
+        for listing, day, amount in db.execute("SELECT listing, day, amount FROM observations ORDER BY listing, day"):
+            first_seen.setdefault(listing, day)
+            if amount < last_amount.get(listing, amount):
+                drops[listing] += 1
+            last_amount[listing] = amount
+        replayed = [
+            listing
+            for listing, count in drops.items()
+            if count >= 2 and first_seen[listing] <= now // DAY_SECONDS - 60
+        ]
+        results["replay_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        db.close()
+        history.close()
+    results["matches"] = len(indexed)
+    results["same_matches"] = len(indexed) == len(replayed)
+    return results
+
+
+def bench_sessions(conversations: int, max_entries: int, listings: int) -> dict:
+    """Memory held after one 'find' turn per conversation: unbounded dict vs session stores.
+
+    Every conversation gets a freshly scraped result of ``listings`` listings,
+    the worst case for sharing payloads.
+    """
+    results = {}
+    for backend in ("dict", "memory", "sqlite"):
+        with tempfile.TemporaryDirectory() as directory:
+            store = None
+            if backend != "dict":
+                path = os.path.join(directory, "sessions.db") if backend == "sqlite" else None
+                store = SessionStore(max_entries=max_entries, path=path)
+            sessions = {}
+            tracemalloc.start()
+            start = time.perf_counter()
+            for number in range(conversations):
+                result = {"location": "Paris", "listings": make_listings(listings, min_price=150000 + number)}
+                if store is None:
+                    sessions[str(number)] = {"previous_response_id": None, "context": {"last_result": result}}
+                    continue
+                session = store.get(str(number))
+                session["context"]["last_result_ref"] = store.put_payload(result)
+                store.put(str(number), session)
+            elapsed = time.perf_counter() - start
+            retained = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+            results[backend] = {
+                "retained_mb": round(retained / 2**20, 1),
+                "ms_per_turn": round(elapsed * 1000 / conversations, 3),
+                "sessions": len(sessions) if store is None else store.stats["sessions"],
+            }
+    return results
+
+
+def percentiles(values: list[float]) -> dict:
+    if len(values) < 2:
+        return {"p50": round(values[0], 3) if values else None}
+    cuts = statistics.quantiles(values, n=100, method="inclusive")
+    return {"p50": round(cuts[49], 3), "p95": round(cuts[94], 3), "max": round(max(values), 3)}
+
+
+def bench_crawler(seconds: float, searches: int, card_seconds: float, ttl: float, interval: float) -> dict:
+    """fetch_listings latency for Zipf-distributed searches, without and with the background crawler.
+
+    Each search scrapes 5 listings from a stub platform at ``card_seconds``
+    a card; cached results last ``ttl`` seconds and the crawler re-runs the
+    searches requested twice every ``ttl * 2 / 3`` seconds.
+    """
+    import agent_orchestrator
+
+    weights = [1 / rank for rank in range(1, searches + 1)]
+    agent_orchestrator.enabled_platforms = lambda: [StubPlatform("SeLoger", card_seconds)]
+    agent_orchestrator.get_seen_index = lambda: SeenIndex(":memory:")
+    agent_orchestrator.get_price_history = lambda: PriceHistory(":memory:")
+
+    async def run(crawl: bool) -> dict:
+        rng = random.Random(0)
+        cache = ResultCache(ttl=ttl, max_entries=searches)
+        schedule = CrawlSchedule(":memory:", cadence=ttl * 2 / 3, min_requests=2)
+        agent_orchestrator.get_cache = lambda: cache
+        agent_orchestrator.get_crawl_schedule = lambda: schedule
+        crawler = Crawler(
+            partial(agent_orchestrator.run_fetch_listings, None, refresh=True),
+            schedule,
+            concurrency=2,
+            runs_per_hour=100000,
+            tick=0.1,
+            pool=SimpleNamespace(available=2),
+        )
+        if crawl:
+            crawler.start()
+        latencies, errors = [], 0
+
+        async def request(search: int) -> None:
+            nonlocal errors
+            start = time.perf_counter()
+            result = await agent_orchestrator.run_fetch_listings(None, f"City {search}", 100000, 500000, 5)
+            latencies.append(time.perf_counter() - start)
+            errors += bool(result.get("error"))
+
+        tasks = []
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            search = rng.choices(range(searches), weights)[0]
+            tasks.append(asyncio.ensure_future(request(search)))
+            await asyncio.sleep(interval)
+        await asyncio.gather(*tasks)
+        await crawler.stop()
+        return {
+            "requests": len(latencies),
+            "latency_seconds": {**percentiles(latencies), "mean": round(statistics.mean(latencies), 3)},
+            "served_from_cache": round(cache.stats["hits"] / max(cache.stats["hits"] + cache.stats["misses"], 1), 2),
+            "errors": errors,
+            "crawler_runs": crawler.stats["runs"],
+        }
+
+    return {"on_demand": asyncio.run(run(False)), "with_crawler": asyncio.run(run(True))}
+
+
+def _retried_search(max_listings: int, attempts: int, resume: bool, drivers) -> Counter:
+    """One search retried up to ``attempts`` times, as a job is, on the drivers ``drivers(attempt)`` makes."""
+    store = CheckpointStore(":memory:")
+    test_search.get_checkpoints = lambda: store
+    run_id = str(uuid4())
+    totals, signatures = Counter(), set()
+    for attempt in range(attempts):
+        resilience._breakers.clear()
+        driver = drivers(attempt)
+        test_search.create_driver = lambda *args: driver
+        log = io.StringIO()
+        with contextlib.redirect_stdout(log):
+            result = test_search.search_listings(
+                "Paris", 0, 10**9, max_listings, run_id=run_id if resume else None
+            )
+        signatures.update(test_search.listing_signature(listing) for listing in result["listings"])
+        totals["attempts"] += 1
+        totals["cards_opened"] += driver.cards_opened
+        totals["step_retries"] += log.getvalue().count("retrying in")
+        totals["renavigations"] += log.getvalue().count("Results list lost")
+        if "error" not in result:
+            break
+    totals["listings"] += min(len(signatures), max_listings)
+    totals["completed"] += len(signatures) >= max_listings
+    return totals
+
+
+def bench_faults(
+    runs: int, max_listings: int, faults: float, crashes: float, attempts: int, transition: float, launch: float
+) -> dict:
+    """Searches on a flaky device, each retried up to ``attempts`` times as a job is.
+
+    "flaky" fails commands at random (``faults``) and crashes the app
+    (``crashes``). "session_lost" loses the session halfway through the
+    first attempt of each search, and compares a retry from the first card
+    ("restart") with one from the checkpoint ("resume").
+    """
+    make = partial(FakeDriver, latency=0, transition=transition, launch=launch)
+    original_driver, original_checkpoints = test_search.create_driver, test_search.get_checkpoints
+    report = {}
+    try:
+        totals, start = Counter(), time.perf_counter()
+        for run in range(runs):
+            totals += _retried_search(
+                max_listings,
+                attempts,
+                True,
+                lambda attempt: make(faults=faults, crashes=crashes, seed=run * attempts + attempt),
+            )
+        report["flaky"] = {**totals, "wall_seconds": round(time.perf_counter() - start, 2)}
+
+        # Commands of a clean run, so the session is lost about halfway through.
+        probe = make()
+        test_search.create_driver = lambda *args: probe
+        with contextlib.redirect_stdout(io.StringIO()):
+            test_search.search_listings("Paris", 0, 10**9, max_listings)
+        rng = random.Random(0)
+        cut_offs = [rng.randint(probe.commands // 3, probe.commands * 2 // 3) for _ in range(runs)]
+        for mode in ("restart", "resume"):
+            totals, start = Counter(), time.perf_counter()
+            for cut_off in cut_offs:
+                totals += _retried_search(
+                    max_listings,
+                    attempts,
+                    mode == "resume",
+                    lambda attempt: make(fail_after=cut_off) if attempt == 0 else make(),
+                )
+            report[f"session_lost_{mode}"] = {**totals, "wall_seconds": round(time.perf_counter() - start, 2)}
+    finally:
+        test_search.create_driver, test_search.get_checkpoints = original_driver, original_checkpoints
+        resilience._breakers.clear()
+    return report
+
+
+def bench_chat(scrapes: int, chats: int, scrape_seconds: float, blocking: bool) -> dict:
+    """Latency of concurrent /chat calls while scrapes run, with a stub agent and scraper.
+
+    Messages starting with "find" trigger the fetch_listings path; the others
+    return immediately and show how long they were held up by the scrapes.
+    ``blocking`` runs the stub scraper on the event loop, as a synchronous
+    tool call used to.
+    """
+    import httpx
+
+    import agent_orchestrator
+    import api_server
+
+    def stub_scraper(location, min_price, max_price, max_listings, pool=None, **kwargs):
+        time.sleep(scrape_seconds)
+        return {
+            "location": location, "min_price": min_price, "max_price": max_price,
+            "requested": max_listings, "listings": [], "scraped": 0,
+        }
+
+    async def stub_run(agent, message, context=None, **kwargs):
+        if message.startswith("find"):
+            if blocking:
+                stub_scraper("Paris", 200000, 400000, 5)
+            else:
+                await agent_orchestrator.run_fetch_listings(context, "Paris", 200000, 400000, 5)
+        return SimpleNamespace(
+            final_output="ok", last_response_id=None, context_wrapper=SimpleNamespace(context=context)
+        )
+
+    platforms.search_listings_parallel = stub_scraper
+    platforms.get_pool = lambda: None
+    # Every call must reach the stub scraper, and none is recorded as seen.
+    agent_orchestrator.get_cache = lambda: ResultCache(max_entries=0)
+    agent_orchestrator.get_seen_index = lambda: SeenIndex(":memory:")
+    agent_orchestrator.get_price_history = lambda: PriceHistory(":memory:")
+    api_server.Runner = SimpleNamespace(run=stub_run)
+
+    async def timed(client, message: str, delay: float = 0.0) -> float:
+        # Latency counts from when the request was due, so time spent waiting
+        # for a blocked event loop to start it is included.
+        due = time.perf_counter() + delay
+        await asyncio.sleep(delay)
+        response = await client.post("/chat", json={"message": message})
+        response.raise_for_status()
+        return time.perf_counter() - due
+
+    async def run_load() -> tuple[list[float], list[float]]:
+        transport = httpx.ASGITransport(app=api_server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            scrape_tasks = [timed(client, "find listings") for _ in range(scrapes)]
+            chat_tasks = [timed(client, "hello", 0.05 * (i + 1)) for i in range(chats)]
+            latencies = await asyncio.gather(*scrape_tasks, *chat_tasks)
+        return list(latencies[scrapes:]), list(latencies[:scrapes])
+
+    chat_latencies, scrape_latencies = asyncio.run(run_load())
+    return {
+        "mode": "blocking" if blocking else "executor",
+        "chat_seconds": percentiles(chat_latencies),
+        "scrape_seconds": percentiles(scrape_latencies),
+    }
+
+
+async def asgi_post(app, path: str, body: dict) -> list[tuple[float, bytes]]:
+    """POST ``body`` to ``app`` and return each response body chunk with its arrival time.
+
+    Talks ASGI directly because httpx's ASGI transport buffers the whole
+    response, which would hide when the first bytes were sent.
+    """
+    payload = json.dumps(body).encode()
+    finished = asyncio.Event()
+    received = False
+    chunks = []
+
+    async def receive() -> dict:
+        nonlocal received
+        if not received:
+            received = True
+            return {"type": "http.request", "body": payload, "more_body": False}
+        await finished.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message: dict) -> None:
+        if message["type"] == "http.response.body" and message.get("body"):
+            chunks.append((time.perf_counter() - start, message["body"]))
+
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(b"content-type", b"application/json")],
+        "client": ("bench", 0),
+        "server": ("bench", 80),
+    }
+    start = time.perf_counter()
+    try:
+        await app(scope, receive, send)
+    finally:
+        finished.set()
+    return chunks
+
+
+def bench_stream(max_listings: int, card_seconds: float) -> dict:
+    """Time to first byte and first listing of /chat vs /chat/stream, with a stub agent and scraper.
+
+    The stub scraper reports a listing every ``card_seconds``; the stub agent
+    streams a few words before and after calling fetch_listings.
+    """
+    import agent_orchestrator
+    import api_server
+
+    def stub_scraper(location, min_price, max_price, max_listings, pool=None, on_listing=None, **kwargs):
+        listings = []
+        for listing in make_listings(max_listings):
+            time.sleep(card_seconds)
+            listing = {"index": len(listings) + 1, **listing}
+            listings.append(listing)
+            if on_listing is not None:
+                on_listing(listing)
+        return {
+            "location": location, "min_price": min_price, "max_price": max_price,
+            "requested": max_listings, "listings": listings, "scraped": len(listings),
+        }
+
+    def delta(text: str) -> SimpleNamespace:
+        return SimpleNamespace(
+            type="raw_response_event", data=SimpleNamespace(type="response.output_text.delta", delta=text)
+        )
+
+    class StubStream:
+        def __init__(self, message, context) -> None:
+            self.context = context
+            self.final_output = ""
+            self.last_response_id = None
+            self.context_wrapper = SimpleNamespace(context=context)
+
+        async def stream_events(self):
+            for word in ("Searching ", "Paris... "):
+                self.final_output += word
+                yield delta(word)
+            result = await agent_orchestrator.run_fetch_listings(self.context, "Paris", 200000, 400000, max_listings)
+            for word in (f"Found {result['scraped']} ", "listings."):
+                self.final_output += word
+                yield delta(word)
+
+        def cancel(self) -> None:
+            pass
+
+    async def stub_run(agent, message, context=None, **kwargs):
+        stream = StubStream(message, context)
+        async for _ in stream.stream_events():
+            pass
+        return stream
+
+    platforms.search_listings_parallel = stub_scraper
+    platforms.get_pool = lambda: None
+    # Every call must reach the stub scraper, and none is recorded as seen.
+    agent_orchestrator.get_cache = lambda: ResultCache(max_entries=0)
+    agent_orchestrator.get_seen_index = lambda: SeenIndex(":memory:")
+    agent_orchestrator.get_price_history = lambda: PriceHistory(":memory:")
+    api_server.Runner = SimpleNamespace(
+        run=stub_run, run_streamed=lambda agent, message, context=None, **kwargs: StubStream(message, context)
+    )
+
+    async def run_both() -> dict:
+        results = {}
+        for path in ("/chat", "/chat/stream"):
+            chunks = await asgi_post(api_server.app, path, {"message": "find listings"})
+            listing_times = [at for at, body in chunks if body.startswith(b"event: listing")]
+            results[path] = {
+                "first_byte_seconds": round(chunks[0][0], 3),
+                "first_listing_seconds": round(listing_times[0] if listing_times else chunks[-1][0], 3),
+                "total_seconds": round(chunks[-1][0], 3),
+            }
+        return results
+
+    return asyncio.run(run_both())
+
+
+# CPU a stub /chat turn spends, standing in for the agent SDK and model client.
+STUB_AGENT_SECONDS = float(os.getenv("BENCH_AGENT_SECONDS", "0.005"))
+
+
+def stub_chat_app():
+    """``api_server.app`` with a stub agent, for ``uvicorn --factory`` workers.
+
+    The reply is the turn number within the conversation, counted from the
+    previous response id the worker found in the session store.
+    """
+    import api_server
+
+    async def stub_run(agent, message, context=None, previous_response_id=None, **kwargs):
+        turn = int(previous_response_id or 0) + 1
+        deadline = time.perf_counter() + STUB_AGENT_SECONDS
+        while time.perf_counter() < deadline:
+            pass
+        return SimpleNamespace(
+            final_output=str(turn), last_response_id=str(turn), context_wrapper=SimpleNamespace(context=context)
+        )
+
+    api_server.Runner = SimpleNamespace(run=stub_run)
+    return api_server.app
+
+
+def chat_load(url: str, seconds: float, conversations: int) -> tuple[int, int]:
+    """Turns completed, and turns whose reply skipped a turn of their conversation, over ``seconds``."""
+    import httpx
+
+    counts = [0, 0]
+    lock = threading.Lock()
+
+    def converse() -> None:
+        conversation_id = None
+        turns = mismatches = 0
+        with httpx.Client(base_url=url, timeout=60) as client:
+            deadline = time.perf_counter() + seconds
+            while time.perf_counter() < deadline:
+                response = client.post("/chat", json={"message": "hello", "conversation_id": conversation_id})
+                response.raise_for_status()
+                body = response.json()
+                conversation_id = body["conversation_id"]
+                turns += 1
+                mismatches += body["reply"] != str(turns)
+        with lock:
+            counts[0] += turns
+            counts[1] += mismatches
+
+    threads = [threading.Thread(target=converse) for _ in range(conversations)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return counts[0], counts[1]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def bench_workers(workers: list[int], seconds: float, clients: int, conversations: int) -> dict:
+    """/chat requests per second served by 1..N uvicorn workers sharing state in SQLite.
+
+    Each client thread keeps one conversation going; ``session_errors``
+    counts replies that missed a turn, which a worker without the shared
+    session store would produce.
+    """
+    import httpx
+
+    import api_server
+
+    results = {"cpus": os.cpu_count(), "agent_seconds": STUB_AGENT_SECONDS}
+    for count in workers:
+        with tempfile.TemporaryDirectory() as state_dir:
+            port = free_port()
+            env = dict(os.environ)
+            for variable, filename in api_server.SHARED_STATE_PATHS.items():
+                env[variable] = os.path.join(state_dir, filename)
+            server = subprocess.Popen(
+                [
+                    sys.executable, "-m", "uvicorn", "benchmark:stub_chat_app", "--factory",
+                    "--port", str(port), "--workers", str(count), "--log-level", "warning",
+                ],
+                cwd=os.path.dirname(os.path.abspath(__file__)),
+                env=env,
+            )
+            url = f"http://127.0.0.1:{port}"
+            try:
+                for _ in range(600):
+                    with contextlib.suppress(httpx.HTTPError):
+                        if httpx.get(f"{url}/stats").status_code == 200:
+                            break
+                    time.sleep(0.1)
+                with ProcessPoolExecutor(clients) as executor:
+                    loads = list(executor.map(chat_load, [url] * clients, [seconds] * clients, [conversations] * clients))
+            finally:
+                server.terminate()
+                server.wait()
+        turns = sum(load[0] for load in loads)
+        results[count] = {
+            "requests_per_second": round(turns / seconds, 1),
+            "session_errors": sum(load[1] for load in loads),
+        }
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run scraper benchmarks against the fake driver.")
+    subparsers = parser.add_subparsers(dest="scenario", required=True)
+
+    search = subparsers.add_parser("search", help="Wall-clock time of one search_listings run.")
+    search.add_argument("--listings", type=int, default=10)
+    search.add_argument("--latency", type=float, default=0.02, help="Seconds per remote command.")
+    search.add_argument("--transition", type=float, default=0.3, help="Seconds per screen change.")
+    search.add_argument("--launch", type=float, default=1.0, help="Seconds for the app to start.")
+    search.add_argument("--extraction", choices=["page_source", "elements"], default="page_source")
+    search.add_argument("--trace", action="store_true", help="Print time per step, command, card and swipe.")
+
+    scroll = subparsers.add_parser("scroll", help="Swipes and card opens over a long results list.")
+    scroll.add_argument("--listings", type=int, default=50)
+    scroll.add_argument("--latency", type=float, default=0.02, help="Seconds per remote command.")
+    scroll.add_argument("--transition", type=float, default=0.3, help="Seconds per screen change.")
+    scroll.add_argument("--launch", type=float, default=1.0, help="Seconds for the app to start.")
+    scroll.add_argument("--fling", type=float, default=0.0, help="Extra scroll per swipe, as a fraction of it.")
+
+    incremental = subparsers.add_parser("incremental", help="Full search vs a repeat 'only new' search.")
+    incremental.add_argument("--listings", type=int, default=10)
+    incremental.add_argument("--new", type=int, default=2, help="Listings published between the two runs.")
+    incremental.add_argument("--latency", type=float, default=0.02, help="Seconds per remote command.")
+    incremental.add_argument("--transition", type=float, default=0.3, help="Seconds per screen change.")
+    incremental.add_argument("--launch", type=float, default=1.0, help="Seconds for the app to start.")
+
+    navigation = subparsers.add_parser("navigation", help="Time to first card: search form vs deep link.")
+    navigation.add_argument("--runs", type=int, default=5)
+    navigation.add_argument("--latency", type=float, default=0.02, help="Seconds per remote command.")
+    navigation.add_argument("--transition", type=float, default=0.3, help="Seconds per screen change.")
+    navigation.add_argument("--launch", type=float, default=1.0, help="Seconds for the app to start.")
+
+    pool = subparsers.add_parser("pool", help="Fresh session per search vs a warm device pool.")
+    pool.add_argument("--searches", type=int, default=5)
+    pool.add_argument("--session-delay", type=float, default=3.0, help="Seconds to allocate a session.")
+
+    parallel = subparsers.add_parser("parallel", help="One search sharded across N device sessions.")
+    parallel.add_argument("--listings", type=int, default=9)
+    parallel.add_argument("--devices", type=int, nargs="+", default=[1, 2, 3])
+
+    platforms_parser = subparsers.add_parser("platforms", help="Fan-out of one search over several platforms.")
+    platforms_parser.add_argument("--listings", type=int, default=5)
+    platforms_parser.add_argument("--timeout", type=float, default=8.0, help="Seconds each platform gets.")
+
+    replay = subparsers.add_parser("replay", help="Search sizes replayed from recorded Appium traffic.")
+    replay.add_argument("--sizes", type=int, nargs="+", default=[5, 20, 100])
+    replay.add_argument("--cassette", help="Cassette from appium_replay.py record (default: record the fake app).")
+    replay.add_argument("--latency", type=float, help="Seconds per command (default: recorded time).")
+    replay.add_argument("--scale", type=float, default=1.0, help="Multiplier on recorded command times.")
+
+    score = subparsers.add_parser("score", help="Batch scoring time, plain Python vs NumPy.")
+    score.add_argument("--sizes", type=int, nargs="+", default=[10000, 50000])
+
+    listings = subparsers.add_parser("listings", help="QueryFilters queries: indexed store vs linear filters.")
+    listings.add_argument("--size", type=int, default=100000)
+
+    parse = subparsers.add_parser("parse", help="Listing labels parsed per second.")
+    parse.add_argument("--size", type=int, default=100000)
+    parse.add_argument("--distinct", type=int, default=5000, help="Distinct label sets in the corpus.")
+
+    dedup = subparsers.add_parser("dedup", help="Near-duplicate lookups: LSH index vs a linear scan.")
+    dedup.add_argument("--size", type=int, default=100000)
+    dedup.add_argument("--reposts", type=float, default=0.1, help="Share of listings that repost an earlier one.")
+    dedup.add_argument("--scanned", type=int, default=200, help="Lookups timed for the linear scan.")
+
+    history = subparsers.add_parser("history", help="Price history: observations recorded, drop queries.")
+    history.add_argument("--listings", type=int, default=20000)
+    history.add_argument("--days", type=int, default=120, help="Daily scrapes recorded.")
+    history.add_argument("--drop-chance", type=float, default=0.01, help="Chance a listing drops its price on a day.")
+
+    sessions = subparsers.add_parser("sessions", help="Memory held by chat sessions: dict vs session store.")
+    sessions.add_argument("--conversations", type=int, default=5000)
+    sessions.add_argument("--max-entries", type=int, default=1000)
+    sessions.add_argument("--listings", type=int, default=20, help="Listings in each conversation's result.")
+
+    chat = subparsers.add_parser("chat", help="/chat latency percentiles under concurrent scrapes.")
+    chat.add_argument("--scrapes", type=int, default=4)
+    chat.add_argument("--chats", type=int, default=20)
+    chat.add_argument("--scrape-seconds", type=float, default=1.0)
+    chat.add_argument("--blocking", action="store_true", help="Run the stub scraper on the event loop.")
+
+    stream = subparsers.add_parser("stream", help="Time to first byte of /chat vs /chat/stream.")
+    stream.add_argument("--listings", type=int, default=5)
+    stream.add_argument("--card-seconds", type=float, default=1.0, help="Stub scraper seconds per listing.")
+
+    workers = subparsers.add_parser("workers", help="/chat requests per second by number of API workers.")
+    workers.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    workers.add_argument("--seconds", type=float, default=10.0)
+    workers.add_argument("--clients", type=int, default=4, help="Load generator processes.")
+    workers.add_argument("--conversations", type=int, default=8, help="Conversations per client process.")
+
+    crawler = subparsers.add_parser("crawler", help="fetch_listings latency without and with the crawler.")
+    crawler.add_argument("--seconds", type=float, default=30)
+    crawler.add_argument("--searches", type=int, default=8, help="Distinct searches, requested Zipf-distributed.")
+    crawler.add_argument("--card-seconds", type=float, default=0.2)
+    crawler.add_argument("--ttl", type=float, default=6, help="Cached result lifetime.")
+    crawler.add_argument("--interval", type=float, default=0.5, help="Seconds between requests.")
+
+    faults_parser = subparsers.add_parser("faults", help="Searches on a flaky device: restarted vs resumed retries.")
+    faults_parser.add_argument("--runs", type=int, default=4)
+    faults_parser.add_argument("--listings", type=int, default=10)
+    faults_parser.add_argument("--faults", type=float, default=0.01, help="Chance a command fails.")
+    faults_parser.add_argument("--crashes", type=float, default=0.003, help="Chance a command crashes the app.")
+    faults_parser.add_argument("--attempts", type=int, default=3, help="Runs per search, as JOB_ATTEMPTS.")
+    faults_parser.add_argument("--transition", type=float, default=0.02)
+    faults_parser.add_argument("--launch", type=float, default=0.05)
+
+    args = parser.parse_args()
+    if args.scenario == "search":
+        print(bench_search(args.listings, args.latency, args.transition, args.launch, args.extraction, args.trace))
+    elif args.scenario == "scroll":
+        print(bench_scroll(args.listings, args.latency, args.transition, args.launch, args.fling))
+    elif args.scenario == "incremental":
+        print(bench_incremental(args.listings, args.new, args.latency, args.transition, args.launch))
+    elif args.scenario == "navigation":
+        print(bench_navigation(args.runs, args.latency, args.transition, args.launch))
+    elif args.scenario == "pool":
+        print(bench_pool(args.searches, args.session_delay))
+    elif args.scenario == "parallel":
+        print(bench_parallel(args.listings, args.devices))
+    elif args.scenario == "platforms":
+        print(json.dumps(bench_platforms(args.listings, args.timeout), indent=2))
+    elif args.scenario == "replay":
+        print(bench_replay(args.sizes, args.cassette, args.latency, args.scale))
+    elif args.scenario == "score":
+        print(bench_score(args.sizes))
+    elif args.scenario == "listings":
+        print(json.dumps(bench_listings(args.size), indent=2))
+    elif args.scenario == "parse":
+        print(bench_parse(args.size, args.distinct))
+    elif args.scenario == "dedup":
+        print(bench_dedup(args.size, args.reposts, args.scanned))
+    elif args.scenario == "history":
+        print(bench_history(args.listings, args.days, args.drop_chance))
+    elif args.scenario == "sessions":
+        print(bench_sessions(args.conversations, args.max_entries, args.listings))
+    elif args.scenario == "chat":
+        print(bench_chat(args.scrapes, args.chats, args.scrape_seconds, args.blocking))
+    elif args.scenario == "stream":
+        print(bench_stream(args.listings, args.card_seconds))
+    elif args.scenario == "crawler":
+        print(json.dumps(bench_crawler(args.seconds, args.searches, args.card_seconds, args.ttl, args.interval), indent=2))
+    elif args.scenario == "faults":
+        print(
+            json.dumps(
+                bench_faults(
+                    args.runs, args.listings, args.faults, args.crashes, args.attempts, args.transition, args.launch
+                ),
+                indent=2,
+            )
+        )
+    elif args.scenario == "workers":
+        print(bench_workers(args.workers, args.seconds, args.clients, args.conversations))
+
+
+if __name__ == "__main__":
+    main()
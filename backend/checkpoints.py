@@ -0,0 +1,84 @@
+"""Listings of unfinished scrapes, so that a retry resumes where the last attempt failed.
+
+``search_listings`` called with a ``run_id`` appends each listing here as
+soon as it has scraped it. A run that ends without an error clears its
+checkpoint; one that fails leaves it, and the next attempt of the same run
+(same run id, location, price range and filters) starts with those listings
+and skips their cards on the results list without opening them. Keys are
+scoped to the run, so concurrent identical searches, such as two jobs for the
+same query, never share or clear each other's checkpoint, and a search that is
+not a retry never resumes anything. Checkpoints older than
+``CHECKPOINT_TTL`` seconds are ignored, since the listings may have
+changed. Set ``SCRAPE_CHECKPOINT_PATH`` to keep them in SQLite, across
+restarts and shared by every worker process.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from result_cache import search_key
+
+CHECKPOINT_PATH = os.getenv("SCRAPE_CHECKPOINT_PATH", ":memory:")
+CHECKPOINT_TTL_SECONDS = float(os.getenv("CHECKPOINT_TTL", "3600"))
+
+
+def checkpoint_key(run_id: str, location, min_price: int, max_price: int, filters: dict | None = None) -> str:
+    return f"{run_id}|{search_key(location, min_price, max_price, filters)}"
+
+
+class CheckpointStore:
+    def __init__(self, path: str = CHECKPOINT_PATH, ttl: float = CHECKPOINT_TTL_SECONDS) -> None:
+        self.ttl = ttl
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS checkpoints ("
+            "key TEXT NOT NULL, position INTEGER NOT NULL, saved_at REAL NOT NULL, listing TEXT NOT NULL, "
+            "PRIMARY KEY (key, position))"
+        )
+        self._db.commit()
+        self._lock = threading.Lock()
+
+    @property
+    def stats(self) -> dict:
+        with self._lock:
+            searches, listings = self._db.execute("SELECT COUNT(DISTINCT key), COUNT(*) FROM checkpoints").fetchone()
+        return {"searches": searches, "listings": listings}
+
+    def load(self, key: str) -> list[dict]:
+        """The listings checkpointed for ``key``, oldest first; none if the last was saved over ``ttl`` ago."""
+        with self._lock, self._db:
+            self._db.execute(
+                "DELETE FROM checkpoints WHERE key IN "
+                "(SELECT key FROM checkpoints GROUP BY key HAVING MAX(saved_at) < ?)",
+                (time.time() - self.ttl,),
+            )
+            rows = self._db.execute(
+                "SELECT listing FROM checkpoints WHERE key = ? ORDER BY position", (key,)
+            ).fetchall()
+        return [json.loads(listing) for (listing,) in rows]
+
+    def append(self, key: str, listing: dict) -> None:
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT INTO checkpoints SELECT ?, COALESCE(MAX(position) + 1, 0), ?, ? FROM checkpoints WHERE key = ?",
+                (key, time.time(), json.dumps(listing, ensure_ascii=False), key),
+            )
+
+    def clear(self, key: str) -> None:
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM checkpoints WHERE key = ?", (key,))
+
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+
+def get_checkpoints() -> CheckpointStore:
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = CheckpointStore()
+        return _default_store
@@ -0,0 +1,344 @@
+"""Background crawler that re-runs hot searches before anyone asks for them.
+
+A search is hot when it is saved (``POST /crawler/searches``) or when
+``fetch_listings`` ran it ``CRAWLER_MIN_REQUESTS`` times, the last within
+``CRAWLER_HOT_WINDOW`` seconds. The crawler re-runs each hot search every
+``cadence`` seconds (its own for saved searches, ``CRAWLER_CADENCE``
+otherwise) and stores the results in the result cache, so the agent's call
+gets them without touching a device; a live scrape only happens once the
+cached result has gone stale. Set the cadence below ``SCRAPE_CACHE_TTL`` to
+keep hot searches warm all the time.
+
+Due searches are taken saved first, then most requested, then most overdue.
+Runs are limited to ``CRAWLER_RUNS_PER_HOUR`` and to ``CRAWLER_CONCURRENCY``
+at once, and one only starts while a device session is idle beyond the
+``CRAWLER_RESERVED_DEVICES`` kept for live searches and no live scrape is
+waiting for the executor, so the crawler fills the device pool's spare
+sessions and gives way to users. A run that fails is retried after an
+exponentially growing delay.
+
+The schedule is kept in SQLite (``CRAWLER_STORE_PATH``). With several API
+workers sharing that file, searches are claimed in a transaction, so each
+run happens on one worker only and the hourly limit holds for all of them.
+The crawler runs inside the API when ``CRAWLER_ENABLED`` is set, or as its
+own process (``python crawler.py``) next to API workers whose result cache
+it shares through ``SCRAPE_CACHE_PATH``.
+"""
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+
+from device_pool import get_pool
+from result_cache import CACHE_TTL_SECONDS, cache_key, normalize_location
+from scrape_executor import get_executor
+
+CRAWLER_ENABLED = os.getenv("CRAWLER_ENABLED", "").lower() in ("1", "true", "yes")
+CRAWLER_STORE_PATH = os.getenv("CRAWLER_STORE_PATH", ":memory:")
+CRAWLER_CADENCE_SECONDS = float(os.getenv("CRAWLER_CADENCE", str(CACHE_TTL_SECONDS * 2 / 3)))
+CRAWLER_MIN_REQUESTS = int(os.getenv("CRAWLER_MIN_REQUESTS", "3"))
+CRAWLER_HOT_WINDOW_SECONDS = float(os.getenv("CRAWLER_HOT_WINDOW", str(7 * 86400)))
+CRAWLER_RUNS_PER_HOUR = int(os.getenv("CRAWLER_RUNS_PER_HOUR", "30"))
+CRAWLER_CONCURRENCY = int(os.getenv("CRAWLER_CONCURRENCY", os.getenv("DEVICE_POOL_SIZE", "1")))
+CRAWLER_RESERVED_DEVICES = int(os.getenv("CRAWLER_RESERVED_DEVICES", "0"))
+CRAWLER_TICK_SECONDS = float(os.getenv("CRAWLER_TICK", "5"))
+# Longest delay before retrying a search whose runs keep failing.
+MAX_BACKOFF_SECONDS = 6 * 3600
+
+_COLUMNS = (
+    "key",
+    "location",
+    "min_price",
+    "max_price",
+    "max_listings",
+    "saved",
+    "cadence",
+    "requests",
+    "last_requested",
+    "next_run",
+    "last_run",
+    "failures",
+    "last_error",
+)
+
+
+class CrawlSchedule:
+    """The searches the crawler keeps warm and when each one is due."""
+
+    def __init__(
+        self,
+        path: str = CRAWLER_STORE_PATH,
+        cadence: float = CRAWLER_CADENCE_SECONDS,
+        min_requests: int = CRAWLER_MIN_REQUESTS,
+        hot_window: float = CRAWLER_HOT_WINDOW_SECONDS,
+    ) -> None:
+        self.cadence = cadence
+        self.min_requests = min_requests
+        self.hot_window = hot_window
+        self._lock = threading.Lock()
+        # Transactions are opened explicitly, so that a claim is atomic across workers.
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=30, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS searches ("
+            "key TEXT PRIMARY KEY, location TEXT NOT NULL, min_price INTEGER NOT NULL, max_price INTEGER NOT NULL, "
+            "max_listings INTEGER NOT NULL, saved INTEGER NOT NULL DEFAULT 0, cadence REAL, "
+            "requests INTEGER NOT NULL DEFAULT 0, last_requested REAL, next_run REAL NOT NULL, last_run REAL, "
+            "failures INTEGER NOT NULL DEFAULT 0, last_error TEXT)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS searches_next_run ON searches (next_run)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS runs (started_at REAL NOT NULL)")
+
+    def _transaction(self, work):
+        # Called with the lock held.
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            result = work()
+            self._db.execute("COMMIT")
+            return result
+        except BaseException:
+            self._db.execute("ROLLBACK")
+            raise
+
+    def requested(self, location, min_price: int, max_price: int, max_listings: int) -> None:
+        """Count a search the agent ran; the crawler takes it over once it is requested often enough."""
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO searches (key, location, min_price, max_price, max_listings, requests, "
+                "last_requested, next_run) VALUES (?, ?, ?, ?, ?, 1, ?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET requests = requests + 1, last_requested = excluded.last_requested, "
+                "max_listings = MAX(max_listings, excluded.max_listings)",
+                (
+                    cache_key(location, min_price, max_price),
+                    normalize_location(location),
+                    min_price,
+                    max_price,
+                    max_listings,
+                    now,
+                    # It was just scraped live.
+                    now + self.cadence,
+                ),
+            )
+
+    def save(self, location, min_price: int, max_price: int, max_listings: int, cadence: float | None = None) -> dict:
+        """Keep a search warm whether or not it is requested; its first run is due now."""
+        key = cache_key(location, min_price, max_price)
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO searches (key, location, min_price, max_price, max_listings, saved, cadence, next_run) "
+                "VALUES (?, ?, ?, ?, ?, 1, ?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET saved = 1, cadence = excluded.cadence, "
+                "max_listings = excluded.max_listings, next_run = MIN(next_run, excluded.next_run)",
+                (key, normalize_location(location), min_price, max_price, max_listings, cadence, time.time()),
+            )
+        return self.get(key)
+
+    def unsave(self, location, min_price: int, max_price: int) -> bool:
+        """Stop keeping a saved search warm; it stays hot while it is requested often enough."""
+        with self._lock:
+            cursor = self._db.execute(
+                "UPDATE searches SET saved = 0, cadence = NULL WHERE key = ? AND saved = 1",
+                (cache_key(location, min_price, max_price),),
+            )
+        return cursor.rowcount > 0
+
+    def get(self, key: str) -> dict | None:
+        with self._lock:
+            row = self._db.execute(f"SELECT {', '.join(_COLUMNS)} FROM searches WHERE key = ?", (key,)).fetchone()
+        return dict(zip(_COLUMNS, row)) if row is not None else None
+
+    def _hot(self) -> tuple[str, tuple]:
+        return "(saved = 1 OR (requests >= ? AND last_requested >= ?))", (
+            self.min_requests,
+            time.time() - self.hot_window,
+        )
+
+    def hot_searches(self) -> list[dict]:
+        condition, params = self._hot()
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM searches WHERE {condition} ORDER BY next_run", params
+            ).fetchall()
+        return [dict(zip(_COLUMNS, row)) for row in rows]
+
+    def claim(self, limit: int, runs_per_hour: int = CRAWLER_RUNS_PER_HOUR) -> list[dict]:
+        """Take up to ``limit`` due searches, highest priority first, within the hourly run limit."""
+        now = time.time()
+        condition, params = self._hot()
+
+        def work() -> list[dict]:
+            self._db.execute("DELETE FROM runs WHERE started_at < ?", (now - 3600,))
+            started = self._db.execute("SELECT COUNT(*) FROM runs").fetchone()[0]
+            budget = min(limit, runs_per_hour - started)
+            if budget <= 0:
+                return []
+            rows = self._db.execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM searches WHERE next_run <= ? AND {condition} "
+                "ORDER BY saved DESC, requests DESC, next_run LIMIT ?",
+                (now, *params, budget),
+            ).fetchall()
+            searches = [dict(zip(_COLUMNS, row)) for row in rows]
+            for search in searches:
+                # Claimed until it finishes, which sets its next run.
+                self._db.execute(
+                    "UPDATE searches SET next_run = ? WHERE key = ?", (now + MAX_BACKOFF_SECONDS, search["key"])
+                )
+                self._db.execute("INSERT INTO runs VALUES (?)", (now,))
+            return searches
+
+        with self._lock:
+            return self._transaction(work)
+
+    def finished(self, search: dict, error: str | None = None) -> None:
+        now = time.time()
+        cadence = search["cadence"] or self.cadence
+        with self._lock:
+            if error is None:
+                self._db.execute(
+                    "UPDATE searches SET last_run = ?, next_run = ?, failures = 0, last_error = NULL WHERE key = ?",
+                    (now, now + cadence, search["key"]),
+                )
+            else:
+                delay = min(cadence * 2 ** search["failures"], MAX_BACKOFF_SECONDS)
+                self._db.execute(
+                    "UPDATE searches SET last_run = ?, next_run = ?, failures = failures + 1, last_error = ? "
+                    "WHERE key = ?",
+                    (now, now + delay, error, search["key"]),
+                )
+
+    @property
+    def stats(self) -> dict:
+        condition, params = self._hot()
+        with self._lock:
+            total, hot = self._db.execute(
+                f"SELECT COUNT(*), COALESCE(SUM({condition}), 0) FROM searches", params
+            ).fetchone()
+            runs = self._db.execute(
+                "SELECT COUNT(*) FROM runs WHERE started_at >= ?", (time.time() - 3600,)
+            ).fetchone()[0]
+        return {"searches": total, "hot": hot, "runs_last_hour": runs}
+
+
+class Crawler:
+    """Runs the schedule's due searches with ``fetch(location, min_price, max_price, max_listings)``.
+
+    ``fetch`` is a coroutine function that scrapes and stores the result in
+    the cache, and returns it.
+    """
+
+    def __init__(
+        self,
+        fetch,
+        schedule: CrawlSchedule | None = None,
+        concurrency: int = CRAWLER_CONCURRENCY,
+        reserved_devices: int = CRAWLER_RESERVED_DEVICES,
+        runs_per_hour: int = CRAWLER_RUNS_PER_HOUR,
+        tick: float = CRAWLER_TICK_SECONDS,
+        pool=None,
+        executor=None,
+    ) -> None:
+        self.fetch = fetch
+        self.schedule = schedule or get_crawl_schedule()
+        self.concurrency = concurrency
+        self.reserved_devices = reserved_devices
+        self.runs_per_hour = runs_per_hour
+        self.tick = tick
+        self.pool = pool
+        self.executor = executor
+        self._running = set()
+        self._task = None
+        self._counters = {"runs": 0, "failed": 0}
+
+    @property
+    def stats(self) -> dict:
+        return {**self._counters, "running": len(self._running), "schedule": self.schedule.stats}
+
+    def free_slots(self) -> int:
+        if (self.executor or get_executor()).stats["queued"]:
+            # Live scrapes are waiting: leave the workers to them.
+            return 0
+        idle_devices = (self.pool or get_pool()).available - self.reserved_devices
+        return max(min(self.concurrency - len(self._running), idle_devices), 0)
+
+    async def _run(self, search: dict) -> None:
+        error = None
+        try:
+            result = await self.fetch(
+                search["location"], search["min_price"], search["max_price"], search["max_listings"]
+            )
+            error = result.get("error")
+        except asyncio.CancelledError:
+            error = "Cancelled"
+            raise
+        except Exception as e:
+            error = str(e)
+        finally:
+            self._counters["runs"] += 1
+            self._counters["failed"] += error is not None
+            self.schedule.finished(search, error)
+
+    def run_due(self) -> list[asyncio.Task]:
+        """Start the due searches there is room for; return their tasks."""
+        slots = self.free_slots()
+        if slots <= 0:
+            return []
+        tasks = []
+        for search in self.schedule.claim(slots, self.runs_per_hour):
+            task = asyncio.ensure_future(self._run(search))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+            tasks.append(task)
+        return tasks
+
+    async def run_forever(self) -> None:
+        while True:
+            try:
+                self.run_due()
+            except Exception as e:
+                print(f"Crawler error: {str(e)}")
+            await asyncio.sleep(self.tick)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.ensure_future(self.run_forever())
+
+    async def stop(self) -> None:
+        tasks = [task for task in (self._task, *self._running) if task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._task = None
+
+
+_default_schedule = None
+_default_schedule_lock = threading.Lock()
+
+
+def get_crawl_schedule() -> CrawlSchedule:
+    global _default_schedule
+    with _default_schedule_lock:
+        if _default_schedule is None:
+            _default_schedule = CrawlSchedule()
+        return _default_schedule
+
+
+def main() -> None:
+    from functools import partial
+
+    from agent_orchestrator import run_fetch_listings
+    from result_cache import CACHE_PATH
+
+    if not CACHE_PATH or CRAWLER_STORE_PATH == ":memory:":
+        raise SystemExit(
+            "Set SCRAPE_CACHE_PATH and CRAWLER_STORE_PATH to the API's files, or run the crawler "
+            "inside the API with CRAWLER_ENABLED=1."
+        )
+    crawler = Crawler(partial(run_fetch_listings, None, refresh=True))
+    print(f"Crawler ready: {crawler.schedule.stats}")
+    asyncio.run(crawler.run_forever())
+
+
+if __name__ == "__main__":
+    main()
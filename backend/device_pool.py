@@ -0,0 +1,171 @@
+"""Pool of warm Appium sessions shared across scrape requests.
+
+Creating a ``webdriver.Remote`` session on the device farm takes several
+seconds, so drivers are checked out, used and checked back in instead of
+being quit after every search. Idle sessions past ``max_idle`` seconds are
+quit, on the next checkout or by ``evict_idle``, which the API runs every
+``DEVICE_POOL_EVICT_INTERVAL`` seconds so an idle pool does not keep device
+farm sessions open. Each checkout runs a cheap health check so a session
+the farm has dropped is replaced rather than handed out.
+"""
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+POOL_SIZE = int(os.getenv("DEVICE_POOL_SIZE", "1"))
+MAX_IDLE_SECONDS = float(os.getenv("DEVICE_POOL_MAX_IDLE", "240"))
+CHECKOUT_TIMEOUT = float(os.getenv("DEVICE_POOL_CHECKOUT_TIMEOUT", "600"))
+EVICT_INTERVAL_SECONDS = float(os.getenv("DEVICE_POOL_EVICT_INTERVAL", "30"))
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+def is_healthy(driver) -> bool:
+    try:
+        driver.current_activity
+        return True
+    except Exception:
+        return False
+
+
+def _quit(driver) -> None:
+    try:
+        driver.quit()
+    except Exception as e:
+        print(f"Error closing pooled session: {str(e)}")
+
+
+class DevicePool:
+    def __init__(
+        self,
+        factory,
+        size: int = POOL_SIZE,
+        max_idle: float = MAX_IDLE_SECONDS,
+        health_check=is_healthy,
+    ) -> None:
+        self.factory = factory
+        self.size = size
+        self.max_idle = max_idle
+        self.health_check = health_check
+        self.stats = {"created": 0, "reused": 0, "evicted": 0, "unhealthy": 0}
+        # Most recently used sessions are on the right and handed out first.
+        self._idle = deque()
+        self._in_use = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+    @property
+    def available(self) -> int:
+        """Sessions a checkout would get without waiting."""
+        with self._cond:
+            return self.size - self._in_use
+
+    def checkout(self, timeout: float = CHECKOUT_TIMEOUT):
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._cond:
+                if self._closed:
+                    raise RuntimeError("Device pool is closed")
+                expired = self._take_expired()
+                driver = None
+                if self._idle:
+                    driver, _ = self._idle.pop()
+                    self._in_use += 1
+                elif self._in_use < self.size:
+                    self._in_use += 1
+                else:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise PoolTimeout(f"No device session available after {timeout}s")
+                    self._cond.wait(remaining)
+                    continue
+            for stale in expired:
+                _quit(stale)
+
+            # Remote calls happen outside the lock so other threads can check in.
+            if driver is not None:
+                healthy = self.health_check(driver)
+                with self._cond:
+                    self.stats["reused" if healthy else "unhealthy"] += 1
+                if healthy:
+                    return driver
+                _quit(driver)
+            try:
+                driver = self.factory()
+            except Exception:
+                self._release()
+                raise
+            with self._cond:
+                self.stats["created"] += 1
+            return driver
+
+    def checkin(self, driver, healthy: bool = True) -> None:
+        with self._cond:
+            if healthy and not self._closed:
+                self._in_use -= 1
+                self._idle.append((driver, time.monotonic()))
+                self._cond.notify()
+                return
+        _quit(driver)
+        self._release()
+
+    @contextmanager
+    def session(self, timeout: float = CHECKOUT_TIMEOUT):
+        driver = self.checkout(timeout)
+        healthy = True
+        try:
+            yield driver
+        except Exception:
+            healthy = self.health_check(driver)
+            raise
+        finally:
+            self.checkin(driver, healthy)
+
+    def evict_idle(self) -> int:
+        with self._cond:
+            expired = self._take_expired()
+        for driver in expired:
+            _quit(driver)
+        return len(expired)
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            drivers = [driver for driver, _ in self._idle]
+            self._idle.clear()
+            self._cond.notify_all()
+        for driver in drivers:
+            _quit(driver)
+
+    def _release(self) -> None:
+        with self._cond:
+            self._in_use -= 1
+            self._cond.notify()
+
+    def _take_expired(self) -> list:
+        # Called with the lock held; the oldest sessions sit on the left.
+        expired = []
+        now = time.monotonic()
+        while self._idle and now - self._idle[0][1] > self.max_idle:
+            expired.append(self._idle.popleft()[0])
+        self.stats["evicted"] += len(expired)
+        return expired
+
+
+_default_pool = None
+_default_pool_lock = threading.Lock()
+
+
+def get_pool() -> DevicePool:
+    """Return the process-wide pool, created on first use."""
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            from test_search import create_driver
+
+            _default_pool = DevicePool(create_driver)
+        return _default_pool
@@ -0,0 +1,632 @@
+"""In-process stand-in for an Appium session on the SeLoger app.
+
+The fake models the screens walked by ``search_listings`` as small UI
+hierarchies, answers the same selectors the scraper uses, and simulates
+per-command latency and screen transition time so that pacing changes can
+be measured without a device farm. ``FakeAppiumServer`` exposes the same
+model over HTTP for code that talks to a real ``webdriver.Remote``; its
+``WireServer`` base is shared with the record/replay servers in
+``appium_replay``.
+"""
+import json
+import random
+import threading
+import time
+import xml.etree.ElementTree as ET
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+from uuid import uuid4
+
+from selenium.common.exceptions import (
+    InvalidSessionIdException,
+    NoSuchElementException,
+    StaleElementReferenceException,
+    WebDriverException,
+)
+
+from page_parser import find_node_by, find_nodes_by
+
+APP_ROOT = (
+    "/hierarchy/android.widget.FrameLayout/android.widget.LinearLayout/android.widget.FrameLayout"
+    "/android.widget.LinearLayout/android.widget.FrameLayout/e1.r0"
+)
+FORM_ROOT = f"{APP_ROOT}/android.view.View/android.view.View/android.view.View/android.view.View/android.view.View"
+CARDS_CONTAINER = (
+    f"{APP_ROOT}/android.view.View/android.view.View/android.view.View/android.view.View[1]"
+    "/android.view.View/android.view.View[2]/android.view.View/android.view.View[1]"
+)
+DETAIL_ROOT = f"{FORM_ROOT}/android.view.View/android.view.View[1]/android.view.View[4]"
+
+# Deep links the fake app resolves, as in flows/search.json.
+DEEP_LINK_PREFIX = "seloger://search/results"
+# The results list scrolls by pixels: rows are ROW_HEIGHT apart (card plus
+# gap) and only those intersecting the viewport are in the hierarchy, with
+# bounds clipped to it, as on the device.
+LIST_TOP = 400
+LIST_BOTTOM = 2200
+CARD_HEIGHT = 650
+ROW_HEIGHT = 700
+AD_EVERY = 4
+DETAIL_FILLER = [f"Feature {n}" for n in range(1, 21)] + [
+    "Description",
+    "Bright apartment close to shops and transport.",
+    "Energy rating",
+    "Agency",
+    "Ref. 2024-118",
+]
+
+
+def make_listings(count: int, min_price: int = 150000, step: int = 7500) -> list[dict]:
+    listings = []
+    for i in range(count):
+        listings.append({
+            "amount": min_price + i * step,
+            "price": f"{min_price + i * step:,} €".replace(",", " "),
+            "details": f"{2 + i % 4} rooms · {1 + i % 3} bedrooms · {35 + (i * 7) % 90} m² · Floor {i % 6}",
+            "phone": f"06 {i % 100:02d} {(i * 7) % 100:02d} {(i * 13) % 100:02d} {(i * 31) % 100:02d}",
+        })
+    return listings
+
+
+def _node(tag: str, **attrs) -> ET.Element:
+    node = ET.Element(tag)
+    node.set("class", tag)
+    node.set("text", attrs.pop("text", ""))
+    node.set("content-desc", attrs.pop("desc", ""))
+    for key, value in attrs.items():
+        node.set(key.replace("_", "-"), str(value))
+    return node
+
+
+def _ensure(root: ET.Element, xpath: str, **attrs) -> ET.Element:
+    """Create the chain of nodes needed for an absolute XPath to resolve."""
+    node = root
+    for segment in xpath[len("/hierarchy/"):].split("/"):
+        tag, _, index = segment.partition("[")
+        position = int(index.rstrip("]")) if index else 1
+        matches = [child for child in node if child.tag == tag]
+        while len(matches) < position:
+            child = _node(tag)
+            node.append(child)
+            matches.append(child)
+        node = matches[position - 1]
+    for key, value in attrs.items():
+        node.set({"desc": "content-desc"}.get(key, key), str(value))
+    return node
+
+
+def _button(root: ET.Element, tag: str, desc: str) -> ET.Element:
+    node = _node(tag, desc=desc, clickable="true")
+    _ensure(root, APP_ROOT).append(node)
+    return node
+
+
+class FakeElement:
+    def __init__(self, driver: "FakeDriver", node: ET.Element, tree: ET.Element) -> None:
+        self._driver = driver
+        self._node = node
+        self._tree = tree
+
+    def _check(self) -> None:
+        self._driver._command()
+        if self._tree is not self._driver._tree:
+            raise StaleElementReferenceException("element is no longer attached to the DOM")
+
+    @property
+    def text(self) -> str:
+        self._check()
+        return self._node.get("text", "")
+
+    def get_attribute(self, name: str) -> str | None:
+        self._check()
+        return self._node.get(name)
+
+    def is_displayed(self) -> bool:
+        self._check()
+        return True
+
+    def is_enabled(self) -> bool:
+        self._check()
+        return True
+
+    def click(self) -> None:
+        self._check()
+        self._driver._activate(self._node)
+
+    def send_keys(self, value: str) -> None:
+        self._check()
+        self._node.set("text", str(value))
+        self._driver._activate(self._node, typed=True)
+
+    def find_element(self, by: str, value: str) -> "FakeElement":
+        self._check()
+        found = find_node_by(self._node, by, value)
+        if found is None:
+            raise NoSuchElementException(value)
+        return FakeElement(self._driver, found, self._tree)
+
+
+class FakeDriver:
+    """Duck-typed replacement for ``appium.webdriver.Remote``."""
+
+    def __init__(
+        self,
+        listings: list[dict] | None = None,
+        latency: float = 0.02,
+        transition: float = 0.3,
+        launch: float = 1.0,
+        deep_links: bool = True,
+        fling: float = 0.0,
+        faults: float = 0.0,
+        crashes: float = 0.0,
+        fail_after: int | None = None,
+        seed: int = 0,
+    ) -> None:
+        self.listings = make_listings(40) if listings is None else listings
+        # Chance that a command fails, and that it crashes the app back to nothing;
+        # past ``fail_after`` commands the session is gone and every command fails.
+        self.faults = faults
+        self.crashes = crashes
+        self.fail_after = fail_after
+        self._random = random.Random(seed)
+        self.deep_links = deep_links
+        # Extra scroll, as a fraction of the swipe, from the list's momentum.
+        self.fling = fling
+        self.latency = latency
+        self.transition = transition
+        self.launch = launch
+        self.commands = 0
+        self.swipes = 0
+        self.cards_opened = 0
+        self.session_id = "fake-session"
+        self._screen = None
+        self._history = []
+        self._offset = 0
+        self._price_bounds = {}
+        self._opened = None
+        self._tree = None
+        self._actions = {}
+        self._ready_at = 0.0
+
+    # -- simulation ------------------------------------------------------
+
+    def _command(self) -> None:
+        self.commands += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if self.fail_after is not None and self.commands > self.fail_after:
+            raise InvalidSessionIdException("Session is gone")
+        if self.crashes and self._random.random() < self.crashes:
+            self._screen = None
+            self._history = []
+            self._tree = ET.Element("hierarchy")
+            raise WebDriverException("The app crashed")
+        if self.faults and self._random.random() < self.faults:
+            raise WebDriverException("Injected fault")
+
+    def _ready(self) -> bool:
+        return time.monotonic() >= self._ready_at
+
+    def _go(self, screen: str, delay: float | None = None, push: bool = True) -> None:
+        if push and self._screen is not None:
+            self._history.append(self._screen)
+        self._screen = screen
+        self._render()
+        self._ready_at = time.monotonic() + (self.transition if delay is None else delay)
+
+    def _activate(self, node: ET.Element, typed: bool = False) -> None:
+        action = self._actions.get(id(node))
+        if action is None:
+            return
+        kind, target = action
+        if typed != (kind in ("type", "bound")):
+            return
+        if kind == "bound":
+            digits = "".join(ch for ch in node.get("text", "") if ch.isdigit())
+            self._price_bounds[target] = int(digits) if digits else None
+        elif kind == "card":
+            self.cards_opened += 1
+            self._opened = target
+            self._go("detail")
+        else:
+            self._go(target)
+
+    def _matching_listings(self) -> list[dict]:
+        low, high = self._price_bounds.get("min"), self._price_bounds.get("max")
+        return [
+            listing
+            for listing in self.listings
+            if (low is None or listing.get("amount", low) >= low) and (high is None or listing.get("amount", high) <= high)
+        ]
+
+    def _row_count(self) -> int:
+        count = len(self._matching_listings())
+        # One ad after every AD_EVERY - 1 listings, but none after the last one.
+        return count + max(count - 1, 0) // (AD_EVERY - 1)
+
+    def _max_offset(self) -> int:
+        content = self._row_count() * ROW_HEIGHT - (ROW_HEIGHT - CARD_HEIGHT)
+        return max(content - (LIST_BOTTOM - LIST_TOP), 0)
+
+    def _visible_rows(self) -> list[tuple[str, dict | None, int, int]]:
+        """Kind, listing and clipped top/bottom of each row in the viewport."""
+        listings = self._matching_listings()
+        rows = []
+        for position in range(self._offset // ROW_HEIGHT, self._row_count()):
+            top = LIST_TOP + position * ROW_HEIGHT - self._offset
+            if top >= LIST_BOTTOM:
+                break
+            bottom = top + CARD_HEIGHT
+            if bottom <= LIST_TOP:
+                continue
+            bounds = max(top, LIST_TOP), min(bottom, LIST_BOTTOM)
+            if position % AD_EVERY == AD_EVERY - 1:
+                rows.append(("ad", None, *bounds))
+            else:
+                rows.append(("card", listings[position - position // AD_EVERY], *bounds))
+        return rows
+
+    def _render(self) -> None:
+        root = ET.Element("hierarchy")
+        root.set("class", "hierarchy")
+        self._actions = {}
+        screen = self._screen
+
+        def on(node: ET.Element, kind: str, target) -> ET.Element:
+            self._actions[id(node)] = (kind, target)
+            return node
+
+        if screen == "home":
+            on(_ensure(root, f"{APP_ROOT}/android.view.View/android.view.View/android.view.View/android.view.View[2]/android.view.View/android.view.View/android.view.View[2]"), "go", "search")
+        elif screen == "search":
+            on(_ensure(root, f"{APP_ROOT}/android.view.View/android.view.View/android.view.View/android.view.View[1]/android.view.View/android.view.View[1]/android.view.View[2]/android.widget.Button"), "go", "menu")
+        elif screen == "menu":
+            on(_button(root, "android.widget.TextView", "Start a new search"), "go", "criteria")
+        elif screen == "criteria":
+            on(_button(root, "android.widget.TextView", "Select location"), "go", "location")
+        elif screen == "location":
+            on(_button(root, "android.widget.Button", "Mandatory. label is Location. text is Enter location or zip code. . ."), "go", "location_input")
+        elif screen in ("location_input", "location_results"):
+            on(_ensure(root, f"{FORM_ROOT}/android.view.View[1]/android.widget.EditText"), "type", "location_results")
+            if screen == "location_results":
+                container = _ensure(root, f"{FORM_ROOT}/android.view.View[2]")
+                for name in ("Paris (75)", "Paris 11e (75011)", "Paris 15e (75015)"):
+                    container.append(on(_node("android.view.View", text=name, clickable="true"), "go", "location_chosen"))
+        elif screen == "location_chosen":
+            on(_button(root, "android.widget.TextView", "Show Results"), "go", "filters")
+        elif screen == "filters":
+            on(_ensure(root, f"{FORM_ROOT}/android.view.View[2]/android.widget.ScrollView/android.view.View/android.widget.EditText[1]"), "bound", "min")
+            on(_ensure(root, f"{FORM_ROOT}/android.view.View[2]/android.widget.ScrollView/android.view.View/android.widget.EditText[2]"), "bound", "max")
+            on(_button(root, "android.widget.TextView", "Show Results"), "go", "results")
+        elif screen == "results":
+            container = _ensure(root, CARDS_CONTAINER)
+            container.set("bounds", f"[0,{LIST_TOP}][1080,{LIST_BOTTOM}]")
+            if not self._row_count():
+                _ensure(root, APP_ROOT).append(_node("android.widget.TextView", text="No results", desc="No results"))
+            for kind, listing, top, bottom in self._visible_rows():
+                bounds = f"[0,{top}][1080,{bottom}]"
+                if kind == "ad":
+                    container.append(_node("android.widget.FrameLayout", bounds=bounds))
+                    continue
+                card = on(_node("android.view.View", bounds=bounds, clickable="true"), "card", listing)
+                card.append(_node("android.widget.TextView", text=listing["price"]))
+                card.append(_node("android.widget.TextView", text=listing["details"]))
+                container.append(card)
+        elif screen in ("detail", "call"):
+            listing = self._opened
+            _ensure(root, f"{DETAIL_ROOT}/android.view.View[1]/android.widget.TextView[1]", text=listing["price"])
+            _ensure(root, f"{DETAIL_ROOT}/android.widget.TextView[2]", text=listing["details"])
+            # Listing pages carry a few dozen other labels (features, description, agency).
+            section = _ensure(root, f"{DETAIL_ROOT}/android.view.View[2]")
+            for line in DETAIL_FILLER:
+                section.append(_node("android.widget.TextView", text=line))
+            if screen == "detail":
+                on(_button(root, "android.widget.TextView", "Call"), "go", "call")
+            else:
+                sheet = _ensure(root, "/hierarchy/android.view.ViewGroup/android.view.View")
+                sheet.append(_node("android.widget.TextView", text="Contact the advertiser"))
+                sheet.append(_node("android.widget.TextView", text=listing["phone"]))
+        self._tree = root
+
+    # -- WebDriver surface used by the scraper --------------------------
+
+    def is_app_installed(self, package: str) -> bool:
+        self._command()
+        return True
+
+    def terminate_app(self, package: str) -> bool:
+        self._command()
+        self._screen = None
+        self._history = []
+        self._tree = ET.Element("hierarchy")
+        return True
+
+    def activate_app(self, package: str) -> None:
+        self._command()
+        self._history = []
+        self._price_bounds = {}
+        self._offset = 0
+        self._screen = None
+        self._go("home", delay=self.launch)
+
+    def open_deep_link(self, url: str, package: str) -> None:
+        """Start the app on the results screen for a ``DEEP_LINK_PREFIX`` URL."""
+        self._command()
+        if not self.deep_links or not url.startswith(DEEP_LINK_PREFIX):
+            raise WebDriverException(f"Unable to resolve intent for {url}")
+        query = parse_qs(urlparse(url).query)
+        self._history = []
+        self._offset = 0
+        self._price_bounds = {
+            bound: int(query[key][0]) if key in query else None for bound, key in (("min", "priceMin"), ("max", "priceMax"))
+        }
+        self._screen = None
+        self._go("results", delay=self.launch)
+
+    def execute_script(self, script: str, *args):
+        if script == "mobile: deepLink":
+            return self.open_deep_link(args[0]["url"], args[0].get("package"))
+        raise WebDriverException(f"Unsupported script {script}")
+
+    def find_element(self, by: str, value: str) -> FakeElement:
+        self._command()
+        node = None
+        if self._ready() and self._tree is not None:
+            node = find_node_by(self._tree, by, value)
+        if node is None:
+            raise NoSuchElementException(value)
+        return FakeElement(self, node, self._tree)
+
+    def find_elements(self, by: str, value: str) -> list[FakeElement]:
+        self._command()
+        if not self._ready() or self._tree is None:
+            return []
+        return [FakeElement(self, node, self._tree) for node in find_nodes_by(self._tree, by, value)]
+
+    @property
+    def page_source(self) -> str:
+        self._command()
+        if not self._ready():
+            # Mid-transition hierarchies keep changing until the screen settles.
+            return f'<hierarchy class="hierarchy" transition="{time.monotonic():.6f}"/>'
+        return ET.tostring(self._tree, encoding="unicode")
+
+    @property
+    def current_activity(self) -> str:
+        self._command()
+        return f".{self._screen or 'none'}"
+
+    def hide_keyboard(self) -> None:
+        self._command()
+
+    def back(self) -> None:
+        self._command()
+        if self._history:
+            self._go(self._history.pop(), push=False)
+
+    def swipe(self, start_x: int, start_y: int, end_x: int, end_y: int, duration: int = 0) -> None:
+        self._command()
+        self.swipes += 1
+        if self._screen == "results":
+            distance = (start_y - end_y) * (1 + self.fling)
+            self._offset = min(max(self._offset + round(distance), 0), self._max_offset())
+            self._go("results", push=False)
+
+    def save_screenshot(self, filename: str) -> bool:
+        self._command()
+        return False
+
+    def quit(self) -> None:
+        self._command()
+        self._tree = None
+
+
+ELEMENT_KEY = "element-6066-11e4-a52e-4f735466cecf"
+
+_EXECUTE_METHODS = {
+    "mobile: isAppInstalled": lambda driver, args: driver.is_app_installed(args.get("appId")),
+    "mobile: terminateApp": lambda driver, args: driver.terminate_app(args.get("appId")),
+    "mobile: activateApp": lambda driver, args: driver.activate_app(args.get("appId")),
+    "mobile: hideKeyboard": lambda driver, args: driver.hide_keyboard(),
+    "mobile: getCurrentActivity": lambda driver, args: driver.current_activity,
+    "mobile: deepLink": lambda driver, args: driver.open_deep_link(args.get("url"), args.get("package")),
+}
+
+
+class _Session:
+    def __init__(self, driver: FakeDriver) -> None:
+        self.driver = driver
+        self.elements = {}
+
+    def register(self, element: FakeElement) -> dict:
+        element_id = uuid4().hex
+        self.elements[element_id] = element
+        return {ELEMENT_KEY: element_id}
+
+
+class WireServer:
+    """Threaded local HTTP server answering WebDriver wire requests via ``handle``."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0) -> None:
+        self.requests = 0
+        self._requests_lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self._thread = None
+
+    def handle(self, method: str, path: str, body: dict) -> tuple[int, dict]:
+        """Return the HTTP status and JSON payload for one request."""
+        raise NotImplementedError
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "WireServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self) -> "WireServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _handle(self, method: str) -> None:
+                length = int(self.headers.get("Content-Length") or 0)
+                raw = self.rfile.read(length) if length else b""
+                body = json.loads(raw) if raw else {}
+                with server._requests_lock:
+                    server.requests += 1
+                status, payload = server.handle(method, self.path, body)
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self) -> None:
+                self._handle("GET")
+
+            def do_POST(self) -> None:
+                self._handle("POST")
+
+            def do_DELETE(self) -> None:
+                self._handle("DELETE")
+
+            def log_message(self, format: str, *args) -> None:
+                pass
+
+        return Handler
+
+
+def wire_error(status: int, error: str, message: str) -> tuple[int, dict]:
+    return status, {"value": {"error": error, "message": message, "stacktrace": ""}}
+
+
+class FakeAppiumServer(WireServer):
+    """Local HTTP stand-in speaking the W3C/Appium wire protocol.
+
+    Each new session gets its own ``FakeDriver`` so real ``webdriver.Remote``
+    clients (and anything built on them, like the device pool) can be
+    exercised end to end. ``session_delay`` simulates device allocation.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, session_delay: float = 0.0, **driver_kwargs) -> None:
+        super().__init__(host, port)
+        self.session_delay = session_delay
+        self.driver_kwargs = driver_kwargs
+        self.sessions = {}
+        self.created = 0
+        self.deleted = 0
+
+    # -- routing ---------------------------------------------------------
+
+    def _new_session(self) -> dict:
+        if self.session_delay:
+            time.sleep(self.session_delay)
+        session_id = uuid4().hex
+        driver = FakeDriver(**self.driver_kwargs)
+        driver.session_id = session_id
+        self.sessions[session_id] = _Session(driver)
+        self.created += 1
+        return {"sessionId": session_id, "capabilities": {"platformName": "Android", "automationName": "UiAutomator2"}}
+
+    def dispatch(self, method: str, path: str, body: dict):
+        parts = [part for part in path.split("/") if part]
+        if parts == ["session"] and method == "POST":
+            return self._new_session()
+        if parts == ["status"]:
+            return {"ready": True, "message": "fake appium"}
+        if len(parts) < 2 or parts[0] != "session" or parts[1] not in self.sessions:
+            raise _WireError(404, "invalid session id", path)
+        session = self.sessions[parts[1]]
+        driver = session.driver
+        command = parts[2:]
+
+        if not command and method == "DELETE":
+            driver.quit()
+            del self.sessions[parts[1]]
+            self.deleted += 1
+            return None
+        if command == ["element"]:
+            return session.register(driver.find_element(body["using"], body["value"]))
+        if command == ["elements"]:
+            return [session.register(element) for element in driver.find_elements(body["using"], body["value"])]
+        if command == ["source"]:
+            return driver.page_source
+        if command == ["back"]:
+            return driver.back()
+        if command == ["actions"]:
+            return self._swipe(driver, body)
+        if command == ["screenshot"]:
+            return ""
+        if command == ["execute", "sync"]:
+            script = _EXECUTE_METHODS.get(body.get("script"))
+            if script is None:
+                raise _WireError(404, "unknown method", body.get("script", ""))
+            args = (body.get("args") or [{}])[0] or {}
+            return script(driver, args)
+        if command[:1] == ["element"] and len(command) >= 3:
+            element = session.elements.get(command[1])
+            if element is None:
+                raise _WireError(404, "no such element", command[1])
+            action = command[2:]
+            if action == ["element"]:
+                return session.register(element.find_element(body["using"], body["value"]))
+            if action == ["click"]:
+                return element.click()
+            if action == ["value"]:
+                return element.send_keys(body.get("text", ""))
+            if action == ["text"]:
+                return element.text
+            if action == ["displayed"]:
+                return element.is_displayed()
+            if action == ["enabled"]:
+                return element.is_enabled()
+            if action[:1] == ["attribute"]:
+                return element.get_attribute(action[1])
+        raise _WireError(404, "unknown command", f"{method} {path}")
+
+    @staticmethod
+    def _swipe(driver: FakeDriver, body: dict) -> None:
+        moves = [
+            step
+            for source in body.get("actions", [])
+            for step in source.get("actions", [])
+            if step.get("type") == "pointerMove"
+        ]
+        if len(moves) >= 2:
+            driver.swipe(moves[0]["x"], moves[0]["y"], moves[-1]["x"], moves[-1]["y"])
+
+    def handle(self, method: str, path: str, body: dict) -> tuple[int, dict]:
+        try:
+            return 200, {"value": self.dispatch(method, path, body)}
+        except _WireError as exc:
+            return wire_error(exc.status, exc.error, exc.message)
+        except NoSuchElementException as exc:
+            return wire_error(404, "no such element", exc.msg or "")
+        except StaleElementReferenceException as exc:
+            return wire_error(404, "stale element reference", exc.msg or "")
+        except InvalidSessionIdException as exc:
+            return wire_error(404, "invalid session id", exc.msg or "")
+        except WebDriverException as exc:
+            return wire_error(500, "unknown error", exc.msg or "")
+
+
+class _WireError(Exception):
+    def __init__(self, status: int, error: str, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+        self.error = error
+        self.message = message
@@ -0,0 +1,368 @@
+"""Background scrape jobs that can be polled while listings come in.
+
+A job runs the same scrape as ``fetch_listings`` on the bounded scrape
+executor, but the HTTP request that created it returns right away. Each
+listing is published to the job the moment the scraper appends it, so a
+client polling ``GET /jobs/{id}`` sees partial results long before the
+run finishes, and ``DELETE /jobs/{id}`` stops it before the next card.
+
+Set ``JOB_STORE_PATH`` to journal jobs in SQLite, so that with several API
+workers any of them can report or cancel a job another one is running. The
+running worker checks for a cancellation requested elsewhere at most every
+``CANCEL_POLL_SECONDS``. Journal reads and writes made on the event loop's
+behalf run in a thread. Each worker marks itself alive in the journal every
+``JOB_HEARTBEAT_SECONDS`` (see ``JobManager.keep_alive``); unfinished jobs of
+a worker that missed three beats, because its process died, are marked
+failed, with the listings they had published.
+
+A run that fails on the device or the network (the device dropped, the app
+crashed) is retried up to ``JOB_ATTEMPTS`` times in all, after a backoff,
+unless the circuit breaker of the device endpoint stopped it. Other errors,
+such as bad input or a bug, would fail again and are not retried. The scraper checkpoints every listing
+under the job's id (see ``checkpoints``), so a retry resumes with the
+listings already scraped instead of starting over; the job keeps the
+listings it published and only gains new ones.
+"""
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from uuid import uuid4
+
+from device_pool import get_pool
+from parallel_scrape import search_listings_parallel
+from price_history import get_price_history
+from resilience import TRANSIENT_ERRORS, backoff
+from scrape_executor import get_executor
+from seen_index import get_seen_index
+from test_search import listing_signature
+
+# Finished jobs kept for polling; the oldest are dropped beyond this.
+MAX_FINISHED_JOBS = int(os.getenv("MAX_FINISHED_JOBS", "200"))
+JOB_STORE_PATH = os.getenv("JOB_STORE_PATH")
+CANCEL_POLL_SECONDS = 1.0
+JOB_ATTEMPTS = int(os.getenv("JOB_ATTEMPTS", "2"))
+JOB_HEARTBEAT_SECONDS = float(os.getenv("JOB_HEARTBEAT_SECONDS", "10"))
+# Identifies this process's jobs in the journal.
+WORKER_ID = str(uuid4())
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED = {DONE, FAILED, CANCELLED}
+
+
+class JobJournal:
+    """Job states and listings in SQLite, readable by every worker."""
+
+    def __init__(self, path: str) -> None:
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, params TEXT NOT NULL, status TEXT NOT NULL, error TEXT, "
+            "created_at REAL NOT NULL, finished_at REAL, cancel_requested INTEGER NOT NULL DEFAULT 0, worker TEXT)"
+        )
+        if "worker" not in {row[1] for row in self._db.execute("PRAGMA table_info(jobs)")}:
+            # Journals created before jobs recorded their worker.
+            self._db.execute("ALTER TABLE jobs ADD COLUMN worker TEXT")
+        self._db.execute("CREATE TABLE IF NOT EXISTS workers (id TEXT PRIMARY KEY, heartbeat_at REAL NOT NULL)")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS job_listings ("
+            "job_id TEXT NOT NULL, position INTEGER NOT NULL, listing TEXT NOT NULL, PRIMARY KEY (job_id, position))"
+        )
+        self._db.commit()
+        self._lock = threading.Lock()
+
+    def create(self, job: "Job") -> None:
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT INTO jobs (id, params, status, created_at, worker) VALUES (?, ?, ?, ?, ?)",
+                (job.id, json.dumps(job.params), job.status, job.created_at, WORKER_ID),
+            )
+
+    def update(self, job: "Job") -> None:
+        with self._lock, self._db:
+            self._db.execute(
+                "UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE id = ?",
+                (job.status, job.error, job.finished_at, job.id),
+            )
+
+    def add_listing(self, job_id: str, position: int, listing: dict) -> None:
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR IGNORE INTO job_listings VALUES (?, ?, ?)",
+                (job_id, position, json.dumps(listing, ensure_ascii=False)),
+            )
+
+    def request_cancel(self, job_id: str) -> None:
+        with self._lock, self._db:
+            self._db.execute(
+                f"UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND status NOT IN ({', '.join('?' * len(FINISHED))})",
+                (job_id, *FINISHED),
+            )
+
+    def cancel_requested(self, job_id: str) -> bool:
+        with self._lock:
+            row = self._db.execute("SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return bool(row and row[0])
+
+    def snapshot(self, job_id: str, since: int = 0) -> dict | None:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT params, status, error, created_at, finished_at FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            scraped = self._db.execute("SELECT COUNT(*) FROM job_listings WHERE job_id = ?", (job_id,)).fetchone()[0]
+            listings = self._db.execute(
+                "SELECT listing FROM job_listings WHERE job_id = ? AND position >= ? ORDER BY position",
+                (job_id, since),
+            ).fetchall()
+        return {
+            "job_id": job_id,
+            "status": row[1],
+            "params": json.loads(row[0]),
+            "scraped": scraped,
+            "listings": [json.loads(listing) for (listing,) in listings],
+            "error": row[2],
+            "created_at": row[3],
+            "finished_at": row[4],
+        }
+
+    def beat(self, worker_id: str, now: float) -> None:
+        with self._lock, self._db:
+            self._db.execute("INSERT OR REPLACE INTO workers VALUES (?, ?)", (worker_id, now))
+
+    def fail_orphans(self, alive_since: float, now: float) -> int:
+        """Mark failed the unfinished jobs of workers with no heartbeat since ``alive_since``."""
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM workers WHERE heartbeat_at < ?", (alive_since,))
+            return self._db.execute(
+                f"UPDATE jobs SET status = ?, error = ?, finished_at = ? "
+                f"WHERE status NOT IN ({', '.join('?' * len(FINISHED))}) "
+                f"AND (worker IS NULL OR worker NOT IN (SELECT id FROM workers))",
+                (FAILED, "The worker running this job stopped", now, *FINISHED),
+            ).rowcount
+
+    def prune(self, max_finished: int) -> None:
+        with self._lock, self._db:
+            self._db.execute(
+                f"DELETE FROM jobs WHERE status IN ({', '.join('?' * len(FINISHED))}) AND id NOT IN "
+                f"(SELECT id FROM jobs WHERE finished_at IS NOT NULL ORDER BY finished_at DESC LIMIT ?)",
+                (*FINISHED, max_finished),
+            )
+            self._db.execute("DELETE FROM job_listings WHERE job_id NOT IN (SELECT id FROM jobs)")
+
+
+class CancelFlag:
+    """A ``threading.Event`` that also sees cancellations journaled by other workers."""
+
+    def __init__(self, job_id: str, journal: JobJournal | None) -> None:
+        self.job_id = job_id
+        self.journal = journal
+        self._event = threading.Event()
+        self._checked_at = 0.0
+
+    def set(self) -> None:
+        self._event.set()
+
+    def is_set(self) -> bool:
+        if (
+            not self._event.is_set()
+            and self.journal is not None
+            and time.monotonic() - self._checked_at >= CANCEL_POLL_SECONDS
+        ):
+            self._checked_at = time.monotonic()
+            if self.journal.cancel_requested(self.job_id):
+                self._event.set()
+        return self._event.is_set()
+
+
+class Job:
+    def __init__(self, params: dict, journal: JobJournal | None = None) -> None:
+        self.id = str(uuid4())
+        self.params = params
+        self.status = QUEUED
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+        self.journal = journal
+        self.cancel_event = CancelFlag(self.id, journal)
+        self.listings = []
+        self._seen_signatures = set()
+        self._lock = threading.Lock()
+        self._task = None
+
+    def set_status(self, status: str) -> None:
+        self.status = status
+        if self.journal is not None:
+            self.journal.update(self)
+
+    def add_listing(self, listing: dict) -> None:
+        # Called from scraper threads; shards may report the same listing and
+        # together overshoot the requested count. Listings are only ever
+        # appended so that pollers can page with ``since``.
+        with self._lock:
+            signature = listing_signature(listing)
+            if signature in self._seen_signatures or len(self.listings) >= self.params["max_listings"]:
+                return
+            self._seen_signatures.add(signature)
+            listing = {**listing, "index": len(self.listings) + 1}
+            self.listings.append(listing)
+            if self.journal is not None:
+                self.journal.add_listing(self.id, len(self.listings) - 1, listing)
+
+    def snapshot(self, since: int = 0) -> dict:
+        with self._lock:
+            listings = self.listings[since:]
+            scraped = len(self.listings)
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "params": self.params,
+            "scraped": scraped,
+            "listings": listings,
+            "error": self.error,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobManager:
+    def __init__(
+        self,
+        scraper=search_listings_parallel,
+        max_finished: int = MAX_FINISHED_JOBS,
+        path: str | None = JOB_STORE_PATH,
+    ) -> None:
+        self.scraper = scraper
+        self.max_finished = max_finished
+        self.journal = JobJournal(path) if path else None
+        self._jobs = {}
+
+    async def submit(self, location: str, min_price: int, max_price: int, max_listings: int) -> Job:
+        job = Job(
+            {"location": location, "min_price": min_price, "max_price": max_price, "max_listings": max_listings},
+            self.journal,
+        )
+        self._jobs[job.id] = job
+        if self.journal is not None:
+            await asyncio.to_thread(self.journal.create, job)
+        job._task = asyncio.get_running_loop().create_task(self._run(job))
+        await asyncio.to_thread(self._prune)
+        return job
+
+    def get(self, job_id: str) -> Job | None:
+        """A job started by this worker."""
+        return self._jobs.get(job_id)
+
+    async def snapshot(self, job_id: str, since: int = 0) -> dict | None:
+        """The state of a job started by any worker, with its listings from index ``since`` on."""
+        job = self._jobs.get(job_id)
+        if job is not None:
+            return job.snapshot(since)
+        return await asyncio.to_thread(self.journal.snapshot, job_id, since) if self.journal is not None else None
+
+    async def cancel(self, job_id: str) -> dict | None:
+        job = self._jobs.get(job_id)
+        if job is not None:
+            if job.status not in FINISHED:
+                job.cancel_event.set()
+            return job.snapshot()
+        if self.journal is None:
+            return None
+        # Running elsewhere: its worker sees the request before its next card.
+        await asyncio.to_thread(self.journal.request_cancel, job_id)
+        return await asyncio.to_thread(self.journal.snapshot, job_id)
+
+    def heartbeat(self) -> int:
+        """Mark this worker alive and fail the jobs of workers that are not; return how many failed."""
+        now = time.time()
+        self.journal.beat(WORKER_ID, now)
+        failed = self.journal.fail_orphans(now - 3 * JOB_HEARTBEAT_SECONDS, now)
+        if failed:
+            print(f"✗ Marked {failed} jobs of stopped workers as failed")
+        return failed
+
+    async def keep_alive(self) -> None:
+        """Beat every ``JOB_HEARTBEAT_SECONDS`` while the worker runs; the first beat recovers jobs left by a crash."""
+        if self.journal is None:
+            return
+        while True:
+            await asyncio.to_thread(self.heartbeat)
+            await asyncio.sleep(JOB_HEARTBEAT_SECONDS)
+
+    async def _run(self, job: Job) -> None:
+        params = job.params
+
+        def scrape(*args, **kwargs) -> dict:
+            job.set_status(RUNNING)
+            return self.scraper(*args, **kwargs)
+
+        for attempt in range(JOB_ATTEMPTS):
+            if attempt:
+                delay = backoff(attempt)
+                print(f"✗ Job {job.id} failed ({job.error}); retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+            try:
+                result = await get_executor().run(
+                    scrape,
+                    params["location"],
+                    params["min_price"],
+                    params["max_price"],
+                    params["max_listings"],
+                    pool=get_pool(),
+                    on_listing=job.add_listing,
+                    cancel=job.cancel_event,
+                    run_id=job.id,
+                )
+            except TRANSIENT_ERRORS as e:
+                job.error = str(e)
+                status = FAILED
+                continue
+            except Exception as e:
+                # Bad input or a bug: another attempt would fail the same way.
+                job.error = str(e)
+                status = FAILED
+                break
+            job.error = result.get("error")
+            await asyncio.to_thread(
+                get_seen_index().record, params["location"], params["min_price"], params["max_price"], result["listings"]
+            )
+            await asyncio.to_thread(get_price_history().record, params["location"], result["listings"])
+            if job.cancel_event.is_set():
+                status = CANCELLED
+            elif job.error and not job.listings:
+                status = FAILED
+            else:
+                status = DONE
+            # Only device and network failures may pass; retrying against an
+            # open breaker would be rejected as well.
+            if not result.get("transient") or status == CANCELLED or result.get("circuit_open"):
+                break
+        job.finished_at = time.time()
+        await asyncio.to_thread(job.set_status, status)
+
+    def _prune(self) -> None:
+        finished = sorted(
+            (job for job in self._jobs.values() if job.status in FINISHED), key=lambda job: job.finished_at
+        )
+        for job in finished[: max(len(finished) - self.max_finished, 0)]:
+            del self._jobs[job.id]
+        if self.journal is not None:
+            self.journal.prune(self.max_finished)
+
+
+_default_manager = None
+
+
+def get_job_manager() -> JobManager:
+    global _default_manager
+    if _default_manager is None:
+        _default_manager = JobManager()
+    return _default_manager
@@ -0,0 +1,193 @@
+"""Walk a virtualized results list so that each row is visited exactly once.
+
+Only the rows intersecting the viewport exist in the UI hierarchy, so the
+list has to be scrolled to reach the rest. ``ResultsScroller`` reads every
+row of the current page source, yields those it has not yielded before and
+are fully on screen, then swipes the first row it could not use yet (one
+clipped by the bottom edge, or the last row) up to the top of the list and
+reads again. Rows are identified by their texts, not their position, so the
+overlap between two screens is never revisited.
+
+The distance actually scrolled is measured on that anchor row. It calibrates
+the next swipe against the list's momentum, detects the end of the list (the
+anchor stays put), and, when a fling carried the anchor off screen and rows
+may have been skipped, swipes back until a known row shows up again.
+"""
+import re
+
+from page_parser import find_node, parse, texts
+from tracing import span
+
+_BOUNDS = re.compile(r"\[(-?\d+),(-?\d+)\]\[(-?\d+),(-?\d+)\]")
+CARD_CLASS = "android.view.View"
+# Pixels kept between the swipe and the list edges, away from headers and bars.
+SWIPE_MARGIN = 50
+SWIPE_MS = 600
+# Swipes in a row that reveal no new row before the list is considered done.
+MAX_IDLE_SWIPES = 3
+MAX_BACKTRACKS = 2
+
+
+def parse_bounds(value: str | None) -> tuple[int, int, int, int] | None:
+    match = _BOUNDS.fullmatch(value or "")
+    return tuple(int(group) for group in match.groups()) if match else None
+
+
+class Row:
+    def __init__(self, position: int, node, xpath: str) -> None:
+        self.position = position
+        self.node = node
+        self.xpath = xpath
+        self.element_class = node.get("class")
+        self.texts = texts(node)
+        self.key = "|".join(self.texts)
+        self.bounds = parse_bounds(node.get("bounds"))
+
+    @property
+    def is_card(self) -> bool:
+        return self.element_class == CARD_CLASS and bool(self.key)
+
+    @property
+    def height(self) -> int | None:
+        return self.bounds[3] - self.bounds[1] if self.bounds else None
+
+
+class ResultsScroller:
+    """Iterate the cards of a results list, scrolling as needed.
+
+    After leaving the list (to open a card), pass the page tree read on the
+    way back to ``refresh`` so the next row is taken from it without another
+    page source call.
+    """
+
+    def __init__(self, driver, waiter, container_xpath: str) -> None:
+        self.driver = driver
+        self.waiter = waiter
+        self.container_xpath = container_xpath
+        self.visited = set()
+        self.swipes = 0
+        self.backtracks = 0
+        self._root = None
+        self._row_height = 0
+        # Measured scroll per pixel of swipe, updated after every swipe.
+        self._ratio = 1.0
+
+    def refresh(self, root) -> None:
+        self._root = root
+
+    def rows(self, root=None) -> list[Row]:
+        container = find_node(root if root is not None else self._root, self.container_xpath)
+        if container is None:
+            return []
+        rows = [
+            Row(position, node, f"{self.container_xpath}/*[{position}]")
+            for position, node in enumerate(container, start=1)
+        ]
+        for row in rows:
+            if row.is_card and row.height:
+                self._row_height = max(self._row_height, row.height)
+        return rows
+
+    def _viewport(self) -> tuple[int, int] | None:
+        container = find_node(self._root, self.container_xpath)
+        bounds = parse_bounds(container.get("bounds")) if container is not None else None
+        return (bounds[1], bounds[3]) if bounds else None
+
+    def _fully_visible(self, row: Row) -> bool:
+        # Rows clipped by the viewport edge report a shorter height.
+        return row.height is None or row.height >= self._row_height * 0.95
+
+    def _next_row(self) -> Row | None:
+        for row in self.rows():
+            if row.is_card and row.key not in self.visited and self._fully_visible(row):
+                return row
+        return None
+
+    def _anchor(self, rows: list[Row]) -> Row | None:
+        """The row to bring to the top: the first card not usable yet, else the last card."""
+        cards = [row for row in rows if row.is_card and row.bounds]
+        for row in cards:
+            if row.key not in self.visited:
+                return row
+        return cards[-1] if cards else None
+
+    def _swipe(self, distance: int, viewport: tuple[int, int]) -> int:
+        """Scroll the list by about ``distance`` pixels (negative: back up); return the swipe length."""
+        top, bottom = viewport
+        reach = bottom - top - 2 * SWIPE_MARGIN
+        length = max(min(round(abs(distance) / self._ratio), reach), 1)
+        if distance >= 0:
+            start = bottom - SWIPE_MARGIN
+            self.driver.swipe(500, start, 500, start - length, SWIPE_MS)
+        else:
+            start = top + SWIPE_MARGIN
+            self.driver.swipe(500, start, 500, start + length, SWIPE_MS)
+        self.swipes += 1
+        return length
+
+    def _read(self) -> None:
+        source = self.waiter.settle("scroll")
+        if source:
+            self._root = parse(source)
+
+    def _positions(self) -> dict[str, Row]:
+        return {row.key: row for row in self.rows() if row.is_card and row.bounds}
+
+    def _scroll(self) -> bool:
+        """Scroll to rows not seen yet; False once the end of the list is reached."""
+        rows = self.rows()
+        viewport = self._viewport()
+        anchor = self._anchor(rows)
+        if viewport is None or anchor is None:
+            # Nothing to measure against: swipe about one row and compare what is shown.
+            before = {row.key for row in rows}
+            self.driver.swipe(500, 1500, 500, 800, SWIPE_MS)
+            self.swipes += 1
+            self._read()
+            return {row.key for row in self.rows()} != before
+
+        # A card clipped by the top edge extends above it by what is missing.
+        clipped_above = self._row_height - anchor.height if anchor.bounds[1] <= viewport[0] else 0
+        distance = anchor.bounds[1] - clipped_above - viewport[0]
+        if distance == 0:
+            distance = self._row_height or SWIPE_MARGIN
+        length = self._swipe(distance, viewport)
+        self._read()
+        moved = self._positions().get(anchor.key)
+        if moved is not None:
+            scrolled = anchor.bounds[1] - moved.bounds[1]
+            if scrolled == 0:
+                return False
+            if self._fully_visible(anchor) and self._fully_visible(moved):
+                self._ratio = min(max(abs(scrolled) / length, 0.25), 4.0)
+            return True
+
+        # The anchor left the screen: the list moved further than asked and
+        # rows between it and the new first card may have been skipped.
+        self._ratio = min(self._ratio * 1.25, 4.0)
+        for _ in range(MAX_BACKTRACKS):
+            if any(key in self.visited or key == anchor.key for key in self._positions()):
+                break
+            self._swipe(-(viewport[1] - viewport[0]) // 2, viewport)
+            self.backtracks += 1
+            self._read()
+        return True
+
+    def __iter__(self):
+        if self._root is None:
+            self._read()
+        idle = 0
+        while True:
+            row = self._next_row()
+            if row is not None:
+                idle = 0
+                self.visited.add(row.key)
+                yield row
+                continue
+            if idle >= MAX_IDLE_SWIPES:
+                return
+            with span("scroll", "swipe"):
+                more = self._scroll()
+            if not more:
+                return
+            idle += 1
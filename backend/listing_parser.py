@@ -0,0 +1,123 @@
+"""Typed fields parsed once from the strings a listing page shows.
+
+The scraper reads three labels: a price such as "350 000 €", a details line
+such as "3 pièces · 2 chambres · 65,5 m² · 2e étage" (or its English
+counterpart) and a phone number. ``parse_listing`` turns them into a
+``ListingFields`` record: euro amount, rooms, bedrooms, living and land
+surface in m², floor (0 for the ground floor) and the phone in E.164 form.
+Numbers are read in French or English notation alike: a comma or a dot is a
+thousands separator when it is followed by a group of exactly three digits
+("350,000", "1.250") and a decimal mark otherwise ("45,5", "82.5"); when a
+number has both, the last one is the decimal mark. Spaces and narrow no-break
+spaces always separate thousands. Prices are found with the euro sign before
+or after them. National phone numbers get the +33 prefix. Every field the
+labels do not give is None.
+
+The patterns are compiled once and details lines, which repeat across runs,
+are parsed through a cache, so the per-listing cost is a dictionary lookup
+after the first time.
+"""
+import re
+from functools import lru_cache
+from typing import NamedTuple
+
+# Country calling code assumed for numbers written in national form.
+DEFAULT_COUNTRY_CODE = "33"
+
+_SPACES = str.maketrans({"\u00a0": " ", "\u202f": " ", "\u2009": " "})
+_NUMBER = r"\d{1,3}(?:[ .,]\d{3})+(?:[.,]\d+)?|\d+(?:[.,]\d+)?"
+_PRICE = re.compile(
+    rf"(?P<after>{_NUMBER})\s*(?:€|eur(?:os?)?\b)|(?:€|\beur\b)\s*(?P<before>{_NUMBER})", re.IGNORECASE
+)
+_DETAILS = re.compile(
+    rf"terrain\s*(?:de\s*)?(?P<land>{_NUMBER})\s*m(?:²|2)"
+    rf"|(?P<surface>{_NUMBER})\s*m(?:²|2)"
+    r"|(?P<rooms>\d+)\s*(?:pièces?|pieces?|p\b|rooms?\b)"
+    r"|\b[TF](?P<type_rooms>\d+)\b"
+    r"|(?P<bedrooms>\d+)\s*(?:chambres?|ch\b|bedrooms?|beds?\b)"
+    r"|(?:étage|etage|floor)\s*(?P<floor>\d+)"
+    r"|(?P<floor_ordinal>\d+)\s*(?:er|re|e|ème|eme|st|nd|rd|th)?\s*(?:étage|etage|floor)"
+    r"|(?P<ground>rdc|rez[- ]de[- ]chauss[ée]e|ground floor)",
+    re.IGNORECASE,
+)
+
+
+class ListingFields(NamedTuple):
+    amount: int | None = None
+    rooms: int | None = None
+    bedrooms: int | None = None
+    surface: float | None = None
+    land_surface: float | None = None
+    floor: int | None = None
+    phone_e164: str | None = None
+
+
+def parse_number(text: str) -> float:
+    """Read "1 250", "1,250", "1.250", "82,5", "82.5" or "1,250.5", telling separators apart by their digit groups."""
+    text = text.translate(_SPACES).replace(" ", "")
+    marks = [char for char in text if char in ",."]
+    if not marks:
+        return float(text)
+    if len(set(marks)) == 2:
+        # "1,250.5" or "1.250,5": the last mark is the decimal one.
+        decimal = marks[-1]
+        return float(text.replace("," if decimal == "." else ".", "").replace(decimal, "."))
+    mark = marks[0]
+    whole, _, fraction = text.rpartition(mark)
+    if len(marks) > 1 or (len(fraction) == 3 and whole != "0"):
+        # "1.250.000" or "350,000": thousands.
+        return float(text.replace(mark, ""))
+    return float(f"{whole}.{fraction}")
+
+
+def _whole(value: float) -> int | float:
+    return int(value) if value.is_integer() else value
+
+
+def parse_price(text: str | None) -> int | None:
+    match = _PRICE.search((text or "").translate(_SPACES))
+    return round(parse_number(match.group("after") or match.group("before"))) if match else None
+
+
+@lru_cache(maxsize=8192)
+def parse_details(text: str | None) -> tuple:
+    """Rooms, bedrooms, surface, land surface and floor from a details line."""
+    rooms = bedrooms = surface = land = floor = None
+    for match in _DETAILS.finditer((text or "").translate(_SPACES)):
+        group = match.lastgroup
+        value = match.group(group)
+        if group == "land" and land is None:
+            land = _whole(parse_number(value))
+        elif group == "surface" and surface is None:
+            surface = _whole(parse_number(value))
+        elif group in ("rooms", "type_rooms") and rooms is None:
+            rooms = int(value)
+        elif group == "bedrooms" and bedrooms is None:
+            bedrooms = int(value)
+        elif group in ("floor", "floor_ordinal") and floor is None:
+            floor = int(value)
+        elif group == "ground" and floor is None:
+            floor = 0
+    return rooms, bedrooms, surface, land, floor
+
+
+def parse_phone(text: str | None) -> str | None:
+    """The number in E.164 form, national numbers taken as French; None if it is not one."""
+    if not text:
+        return None
+    digits = re.sub(r"\D", "", text)
+    international = text.lstrip().startswith("+")
+    if digits.startswith("00"):
+        digits, international = digits[2:], True
+    if international:
+        if digits.startswith(f"{DEFAULT_COUNTRY_CODE}0") and len(digits) == len(DEFAULT_COUNTRY_CODE) + 10:
+            # "+33 (0)6 ...": the national trunk 0 is not dialled from abroad.
+            digits = DEFAULT_COUNTRY_CODE + digits[len(DEFAULT_COUNTRY_CODE) + 1:]
+        return f"+{digits}" if 8 <= len(digits) <= 15 else None
+    if len(digits) == 10 and digits.startswith("0"):
+        return f"+{DEFAULT_COUNTRY_CODE}{digits[1:]}"
+    return None
+
+
+def parse_listing(price: str | None, details: str | None, phone: str | None) -> ListingFields:
+    return ListingFields(parse_price(price), *parse_details(details), parse_phone(phone))
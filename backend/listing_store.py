@@ -0,0 +1,311 @@
+"""In-memory listing store with secondary indexes for ``QueryFilters`` queries.
+
+Listings are dicts shaped like the frontend ``Listing`` type. Each filter of
+``listingService.queryListings`` is answered from an index instead of a pass
+over every listing:
+
+* city: a suffix trie over the distinct city and geo-zone names (the filter
+  is a substring match), plus a postal-code prefix trie ("75" is all of Paris)
+* price and age: row ids sorted by value, cut with a binary search; age is
+  ``daysOnline``, or the days since ``publicationDate`` when it is missing
+* DPE class, seller type, property type and price drop: bitmaps
+
+Bitmaps are plain ints with one bit per row, so combining filters is an AND.
+A range filter only builds its bitmap when the rows left are more numerous
+than the range; otherwise those rows are checked directly. Results are ranked
+by score (see ``scoring``) or by ``sortBy``, and with a ``limit`` only the top
+k are selected instead of sorting every match. Writes mark the indexes stale;
+they are rebuilt on the next query.
+
+A listing that is a near-duplicate of a stored one (see ``near_duplicates``),
+the same property on another platform or reposted, is not stored as a new
+row: it is added to the ``sources`` of the row it duplicates.
+"""
+import heapq
+import json
+import os
+import threading
+from bisect import bisect_left, bisect_right
+from datetime import date
+
+from near_duplicates import NearDuplicateIndex, merge, source_ref
+from scoring import columns, explanation, priority, score_columns, signals
+
+LISTINGS_PATH = os.getenv("LISTINGS_PATH")
+
+
+def _bitmap(rows, size: int) -> int:
+    bits = bytearray((size + 7) // 8)
+    for row in rows:
+        bits[row >> 3] |= 1 << (row & 7)
+    return int.from_bytes(bits, "little")
+
+
+def _rows(bitmap: int):
+    """Row ids set in ``bitmap``, ascending."""
+    digits = bin(bitmap)[:1:-1]
+    row = digits.find("1")
+    while row != -1:
+        yield row
+        row = digits.find("1", row + 1)
+
+
+def _days_online(listing: dict) -> int:
+    if listing.get("daysOnline") is not None:
+        return int(listing["daysOnline"])
+    published = listing.get("publicationDate")
+    if not published:
+        return 0
+    return max((date.today() - date.fromisoformat(published[:10])).days, 0)
+
+
+class Trie:
+    """Maps string prefixes to the ids of the values inserted under them."""
+
+    def __init__(self) -> None:
+        self._root = {}
+
+    def insert(self, key: str, value_id: int) -> None:
+        node = self._root
+        for char in key:
+            node = node.setdefault(char, {})
+            node.setdefault("", set()).add(value_id)
+
+    def prefixed(self, prefix: str) -> set[int]:
+        node = self._root
+        for char in prefix:
+            node = node.get(char)
+            if node is None:
+                return set()
+        return node.get("", set())
+
+
+class RangeIndex:
+    """Row ids sorted by one numeric column."""
+
+    def __init__(self, values: list) -> None:
+        self.rows = sorted((row for row, value in enumerate(values) if value is not None), key=values.__getitem__)
+        self.values = [values[row] for row in self.rows]
+
+    def span(self, low=None, high=None) -> tuple[int, int]:
+        start = 0 if low is None else bisect_left(self.values, low)
+        end = len(self.values) if high is None else bisect_right(self.values, high)
+        return start, max(start, end)
+
+
+class ListingStore:
+    def __init__(self) -> None:
+        self._listings = []
+        self._rows_by_id = {}
+        self._duplicates = NearDuplicateIndex()
+        self._merged = 0
+        self._lock = threading.Lock()
+        self._indexed = False
+
+    def __len__(self) -> int:
+        return len(self._listings)
+
+    @property
+    def stats(self) -> dict:
+        return {"listings": len(self._listings), "merged_duplicates": self._merged, "indexed": self._indexed}
+
+    def add(self, listings: list[dict]) -> None:
+        """Insert listings, replacing those whose ``id`` is already stored and merging near-duplicates."""
+        with self._lock:
+            for listing in listings:
+                row = self._rows_by_id.get(listing.get("id"))
+                if row is None:
+                    row = self._duplicates.find(listing)
+                    if row is None:
+                        row = self._duplicates.add(listing)
+                        self._listings.append(listing)
+                    else:
+                        self._listings[row] = merge(self._listings[row], listing)
+                        self._merged += 1
+                    if listing.get("id") is not None:
+                        self._rows_by_id[listing["id"]] = row
+                elif self._listings[row].get("id") == listing.get("id"):
+                    # The row's own listing: replaced, keeping the sources merged into it.
+                    sources = self._listings[row].get("sources")
+                    self._listings[row] = {**listing, "sources": sources} if sources else listing
+                    self._duplicates.add(listing, row)
+                else:
+                    # A listing merged into this row: refresh its source reference.
+                    sources = [
+                        source_ref(listing) if source.get("id") == listing["id"] else source
+                        for source in self._listings[row]["sources"]
+                    ]
+                    self._listings[row] = {**self._listings[row], "sources": sources}
+            self._indexed = False
+
+    def get(self, listing_id: str) -> dict | None:
+        with self._lock:
+            row = self._rows_by_id.get(listing_id)
+            return self._listings[row] if row is not None else None
+
+    def _build(self) -> None:
+        # Called with the lock held.
+        listings = self._listings
+        size = len(listings)
+        self._size = size
+        self._all = (1 << size) - 1
+        self._price = [listing.get("price") for listing in listings]
+        self._days = [_days_online(listing) for listing in listings]
+        self._surface = [listing.get("surface") for listing in listings]
+        self._score, self._mask = score_columns(**columns(listings))
+        self._sort_columns = {"price": self._price, "daysOnline": self._days, "surface": self._surface}
+        self._price_index = RangeIndex(self._price)
+        self._days_index = RangeIndex(self._days)
+
+        def bitmaps(field: str) -> dict:
+            rows = {}
+            for row, listing in enumerate(listings):
+                rows.setdefault(listing.get(field), []).append(row)
+            return {value: _bitmap(members, size) for value, members in rows.items()}
+
+        self._dpe = bitmaps("dpeClass")
+        self._seller = bitmaps("sellerType")
+        self._property = bitmaps("propertyType")
+        self._price_drop = _bitmap((row for row, listing in enumerate(listings) if listing.get("priceHistory")), size)
+
+        # Distinct place names are few; the trie holds every suffix of each.
+        place_ids, place_rows = {}, []
+        postal_ids, postal_rows = {}, []
+        self._place_trie, self._postal_trie = Trie(), Trie()
+        for row, listing in enumerate(listings):
+            for name in {str(listing.get("city") or "").lower(), str(listing.get("geoZone") or "").lower()}:
+                if not name:
+                    continue
+                if name not in place_ids:
+                    place_ids[name] = len(place_rows)
+                    place_rows.append([])
+                    for start in range(len(name)):
+                        self._place_trie.insert(name[start:], place_ids[name])
+                place_rows[place_ids[name]].append(row)
+            postal = str(listing.get("postalCode") or "")
+            if postal:
+                if postal not in postal_ids:
+                    postal_ids[postal] = len(postal_rows)
+                    postal_rows.append([])
+                    self._postal_trie.insert(postal, postal_ids[postal])
+                postal_rows[postal_ids[postal]].append(row)
+        self._place_bitmaps = [_bitmap(rows, size) for rows in place_rows]
+        self._postal_bitmaps = [_bitmap(rows, size) for rows in postal_rows]
+        self._indexed = True
+
+    def _city(self, city: str) -> int:
+        query = city.lower()
+        bitmap = 0
+        for place_id in self._place_trie.prefixed(query):
+            bitmap |= self._place_bitmaps[place_id]
+        if query.isdigit():
+            for postal_id in self._postal_trie.prefixed(query):
+                bitmap |= self._postal_bitmaps[postal_id]
+        return bitmap
+
+    def _within(self, candidates: int, index: RangeIndex, column: list, low, high) -> int:
+        start, end = index.span(low, high)
+        if candidates.bit_count() < end - start:
+            # Fewer rows left than in the range: check them one by one.
+            return _bitmap(
+                (
+                    row
+                    for row in _rows(candidates)
+                    if column[row] is not None
+                    and (low is None or column[row] >= low)
+                    and (high is None or column[row] <= high)
+                ),
+                self._size,
+            )
+        return candidates & _bitmap(index.rows[start:end], self._size)
+
+    def _match(self, filters: dict) -> int:
+        candidates = self._all
+        if filters.get("city"):
+            candidates &= self._city(filters["city"])
+        if filters.get("hasPriceDrop"):
+            candidates &= self._price_drop
+        if filters.get("dpeClasses"):
+            dpe = 0
+            for dpe_class in filters["dpeClasses"]:
+                dpe |= self._dpe.get(dpe_class, 0)
+            candidates &= dpe
+        if filters.get("sellerType"):
+            candidates &= self._seller.get(filters["sellerType"], 0)
+        if filters.get("propertyType"):
+            candidates &= self._property.get(filters["propertyType"], 0)
+        if candidates and (filters.get("minPrice") is not None or filters.get("maxPrice") is not None):
+            candidates = self._within(
+                candidates, self._price_index, self._price, filters.get("minPrice"), filters.get("maxPrice")
+            )
+        if candidates and (filters.get("minDaysOnline") is not None or filters.get("maxDaysOnline") is not None):
+            candidates = self._within(
+                candidates, self._days_index, self._days, filters.get("minDaysOnline"), filters.get("maxDaysOnline")
+            )
+        return candidates
+
+    def _rank(self, rows: list[int], sort_by: str | None, sort_order: str | None, limit: int | None) -> list[int]:
+        score = self._score
+        column = self._sort_columns.get(sort_by)
+        if column is None:
+            # By score, ties in insertion order.
+            key, descending = (lambda row: (score[row], -row)), True
+        else:
+            # Ties keep the score order, as the frontend's stable re-sort
+            # does; listings without the field come last.
+            descending = sort_order != "asc"
+            if descending:
+                key = lambda row: (column[row] is not None, column[row] or 0, score[row], -row)
+            else:
+                key = lambda row: (column[row] is None, column[row] or 0, -score[row], row)
+        if limit is not None and limit < len(rows):
+            return heapq.nlargest(limit, rows, key=key) if descending else heapq.nsmallest(limit, rows, key=key)
+        return sorted(rows, key=key, reverse=descending)
+
+    def query(self, filters: dict) -> dict:
+        """Listings matching ``filters`` (a ``QueryFilters`` dict), scored and ranked.
+
+        ``stored`` is how many listings the store holds in all, so that a
+        caller can tell an empty store from a query that matched nothing.
+        """
+        with self._lock:
+            if not self._indexed:
+                self._build()
+            matched = self._match(filters)
+            rows = list(_rows(matched))
+            ranked = self._rank(rows, filters.get("sortBy"), filters.get("sortOrder"), filters.get("limit") or None)
+            ranked = [(self._listings[row], self._score[row], self._mask[row]) for row in ranked]
+            stored = len(self._listings)
+        return {
+            "total": len(rows),
+            "stored": stored,
+            "listings": [
+                {
+                    **listing,
+                    "score": score,
+                    "priority": priority(score),
+                    "signals": signals(mask),
+                    "explanation": explanation(mask),
+                }
+                for listing, score, mask in ranked
+            ],
+        }
+
+
+def load_listings(path: str) -> list[dict]:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+
+def get_listing_store() -> ListingStore:
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = ListingStore()
+            if LISTINGS_PATH:
+                _default_store.add(load_listings(LISTINGS_PATH))
+        return _default_store
@@ -0,0 +1,240 @@
+"""Near-duplicate listings, across runs and platforms.
+
+The same property shows up reworded, repriced or on another platform, so an
+exact match on its labels misses it. Each listing is reduced to a set of
+features: word pairs of its normalized description, the typed fields
+``listing_parser`` reads from its details (which do not depend on the
+language, unlike the wording), its phone number and buckets of its price and
+surface. A MinHash signature of
+``NUM_PERM`` values estimates the Jaccard similarity of two such sets, and
+the signatures are split into ``BANDS`` bands of ``ROWS`` values hashed into
+buckets (locality-sensitive hashing). Only listings sharing a bucket with a
+new one are compared with it, so a lookup costs the same with a hundred
+stored listings as with several hundred thousand.
+
+A candidate is a duplicate when its estimated similarity reaches
+``SIMILARITY_THRESHOLD`` and its price and surface, where both listings give
+them, are within ``PRICE_TOLERANCE`` and ``SURFACE_TOLERANCE`` of each
+other. Listings are given as dicts in either shape the backend handles:
+scraped (``price`` label, ``details``, ``phone``, parsed fields) or the
+frontend ``Listing`` (numeric ``price``, ``surface``, ``description``).
+Uses NumPy when it is installed and falls back to plain Python otherwise.
+"""
+import hashlib
+import math
+import re
+import unicodedata
+from functools import lru_cache
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from listing_parser import parse_details, parse_phone, parse_price
+
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+SIMILARITY_THRESHOLD = 0.5
+# Fewer features than this (say, a bare price and surface) do not identify a property.
+MIN_FEATURES = 4
+PRICE_TOLERANCE = 0.1
+SURFACE_TOLERANCE = 0.05
+# Width of a price bucket, as a ratio between neighbouring bucket bounds.
+PRICE_BUCKET_RATIO = 1.05
+SOURCE_FIELDS = ("platform", "id", "url", "price", "phone")
+# Fields two listings must share, text for text, to be the same listing outright.
+EXACT_FIELDS = ("price", "details", "phone", "description")
+
+_MASK64 = (1 << 64) - 1
+# Fixed seeds: signatures must stay comparable between processes and runs.
+_HASH_A = [int.from_bytes(hashlib.blake2b(f"a{i}".encode(), digest_size=8).digest(), "little") | 1 for i in range(NUM_PERM)]
+_HASH_B = [int.from_bytes(hashlib.blake2b(f"b{i}".encode(), digest_size=8).digest(), "little") for i in range(NUM_PERM)]
+if np is not None:
+    _A = np.array(_HASH_A, dtype=np.uint64)
+    _B = np.array(_HASH_B, dtype=np.uint64)
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def normalize_text(text: str | None) -> list[str]:
+    """Lower-cased words without accents."""
+    text = unicodedata.normalize("NFKD", text or "").encode("ascii", "ignore").decode("ascii")
+    return _WORD.findall(text.lower())
+
+
+@lru_cache(maxsize=1 << 16)
+def _token_hash(token: str) -> int:
+    return int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def _numbers(listing: dict) -> tuple[float | None, float | None]:
+    price = listing.get("amount")
+    if price is None:
+        price = listing.get("price") if isinstance(listing.get("price"), (int, float)) else parse_price(listing.get("price"))
+    surface = listing.get("surface")
+    if surface is None and listing.get("details"):
+        surface = parse_details(listing["details"])[2]
+    return price, surface
+
+
+def _word_pairs(text: str | None) -> set[str]:
+    words = normalize_text(text)
+    return {f"{first} {second}" for first, second in zip(words, words[1:])} or set(words)
+
+
+def features(listing: dict) -> set[str]:
+    tokens = _word_pairs(listing.get("description"))
+    if listing.get("details"):
+        rooms, bedrooms, surface, land, floor = parse_details(listing["details"])
+    else:
+        rooms, bedrooms, land, floor = listing.get("rooms"), listing.get("bedrooms"), None, None
+    typed = {f"{name}:{value}" for name, value in (("rooms", rooms), ("bedrooms", bedrooms), ("land", land), ("floor", floor)) if value is not None}
+    # Parsed fields say the same in every language; the wording is only used when nothing parsed.
+    tokens |= typed or _word_pairs(listing.get("details"))
+    phone = listing.get("phone_e164") or parse_phone(listing.get("phone"))
+    if phone:
+        tokens.add(f"phone:{phone}")
+    price, surface = _numbers(listing)
+    if price:
+        tokens.add(f"price:{round(math.log(price, PRICE_BUCKET_RATIO))}")
+    if surface:
+        tokens.add(f"surface:{round(surface)}")
+    return tokens
+
+
+def minhash(tokens: set[str]) -> tuple[int, ...]:
+    """``NUM_PERM`` minimums of universal hashes over the token hashes."""
+    if not tokens:
+        return (0,) * NUM_PERM
+    hashes = [_token_hash(token) for token in tokens]
+    if np is None:
+        return tuple(
+            min(((a * value + b) & _MASK64) >> 32 for value in hashes) for a, b in zip(_HASH_A, _HASH_B)
+        )
+    values = np.array(hashes, dtype=np.uint64)
+    # uint64 arithmetic wraps, which is the "mod 2**64" of multiply-shift hashing.
+    return tuple((np.outer(values, _A) + _B >> np.uint64(32)).min(axis=0).tolist())
+
+
+def _exact_key(listing: dict) -> tuple | None:
+    key = tuple(listing.get(field) for field in EXACT_FIELDS)
+    # A bare price identifies nothing.
+    return key if any(value is not None for value in key[1:]) else None
+
+
+def similarity(first: tuple[int, ...], second: tuple[int, ...]) -> float:
+    return sum(x == y for x, y in zip(first, second)) / NUM_PERM
+
+
+def _close(first: float | None, second: float | None, tolerance: float) -> bool:
+    if not first or not second:
+        return True
+    return abs(first - second) <= tolerance * max(first, second)
+
+
+def source_ref(listing: dict) -> dict:
+    return {field: listing[field] for field in SOURCE_FIELDS if listing.get(field) is not None}
+
+
+def merge(record: dict, duplicate: dict) -> dict:
+    """``record`` with the sources of ``duplicate`` added to its ``sources``; its own fields are kept."""
+    sources = list(record.get("sources") or [source_ref(record)])
+    added = [source for source in duplicate.get("sources") or [source_ref(duplicate)] if source not in sources]
+    # The same listing reported twice (by two shards, say) adds no source.
+    return {**record, "sources": sources + added} if added else record
+
+
+class NearDuplicateIndex:
+    """Listings by MinHash signature, bucketed by band.
+
+    ``add`` returns the id given to the listing; ids are consecutive from 0.
+    """
+
+    def __init__(self, threshold: float = SIMILARITY_THRESHOLD) -> None:
+        self.threshold = threshold
+        self._bands = [{} for _ in range(BANDS)]
+        self._signatures = []
+        self._numbers = []
+        self._exact = {}
+
+    def __len__(self) -> int:
+        return len(self._signatures)
+
+    def _band_keys(self, signature: tuple[int, ...]):
+        for band in range(BANDS):
+            yield band, signature[band * ROWS : (band + 1) * ROWS]
+
+    def _match(self, signature, numbers) -> int | None:
+        candidates = set()
+        for band, key in self._band_keys(signature):
+            candidates.update(self._bands[band].get(key, ()))
+        best, best_score = None, 0.0
+        price, surface = numbers
+        # Ascending ids, so ties go to the listing indexed first.
+        for candidate in sorted(candidates):
+            other_price, other_surface = self._numbers[candidate]
+            if self._signatures[candidate] is None or not (
+                _close(price, other_price, PRICE_TOLERANCE) and _close(surface, other_surface, SURFACE_TOLERANCE)
+            ):
+                continue
+            score = similarity(signature, self._signatures[candidate])
+            if score >= self.threshold and score > best_score:
+                best, best_score = candidate, score
+        return best
+
+    def _signature(self, listing: dict) -> tuple[int, ...] | None:
+        tokens = features(listing)
+        return minhash(tokens) if len(tokens) >= MIN_FEATURES else None
+
+    def _insert(self, listing: dict, signature, numbers, item_id: int | None) -> int:
+        if item_id is None:
+            item_id = len(self._signatures)
+            self._signatures.append(signature)
+            self._numbers.append(numbers)
+        else:
+            # Buckets keep the old signature's entries; candidates are checked against the new one.
+            self._signatures[item_id] = signature
+            self._numbers[item_id] = numbers
+        exact = _exact_key(listing)
+        if exact is not None:
+            self._exact.setdefault(exact, item_id)
+        if signature is None:
+            return item_id
+        for band, key in self._band_keys(signature):
+            members = self._bands[band].setdefault(key, [])
+            if not members or members[-1] != item_id:
+                members.append(item_id)
+        return item_id
+
+    def find(self, listing: dict) -> int | None:
+        """Id of the most similar stored listing that is a near-duplicate of ``listing``."""
+        exact = self._exact.get(_exact_key(listing))
+        if exact is not None:
+            return exact
+        signature = self._signature(listing)
+        return self._match(signature, _numbers(listing)) if signature is not None else None
+
+    def add(self, listing: dict, item_id: int | None = None) -> int:
+        """Index ``listing``, or re-index the listing stored under ``item_id``."""
+        return self._insert(listing, self._signature(listing), _numbers(listing), item_id)
+
+    def add_unique(self, listing: dict) -> int | None:
+        """Index ``listing`` unless it duplicates one already here; return the id of that one."""
+        duplicate = self.find(listing)
+        if duplicate is None:
+            self.add(listing)
+        return duplicate
+
+
+def deduplicate(listings: list[dict]) -> list[dict]:
+    """``listings`` with near-duplicates merged into the first of each group, which lists every source."""
+    index = NearDuplicateIndex()
+    records = []
+    for listing in listings:
+        duplicate = index.add_unique(listing)
+        if duplicate is None:
+            records.append(listing)
+        else:
+            records[duplicate] = merge(records[duplicate], listing)
+    return records
@@ -0,0 +1,113 @@
+"""Local parsing of Appium page sources.
+
+One ``driver.page_source`` call returns the whole UI hierarchy as XML, so
+fields can be read here instead of paying a remote round-trip per element.
+Uses lxml when it is installed and falls back to ElementTree otherwise.
+"""
+import re
+
+try:
+    from lxml import etree as ET
+except ImportError:
+    import xml.etree.ElementTree as ET
+
+MIN_PHONE_DIGITS = 6
+
+# Appium locator strategies resolved here besides XPath.
+ACCESSIBILITY_ID = "accessibility id"
+UIAUTOMATOR = "-android uiautomator"
+
+_NTH_CHILD = re.compile(r"^(.*)/\*\[(\d+)\]$")
+_UISELECTOR_CALL = re.compile(r'\.(\w+)\("((?:[^"\\]|\\.)*)"\)')
+_UISELECTOR_ATTRIBUTES = {"className": "class", "description": "content-desc", "text": "text"}
+
+
+def parse(source: str):
+    if isinstance(source, str):
+        source = source.encode("utf-8")
+    return ET.fromstring(source)
+
+
+def _to_etree_path(xpath: str) -> str:
+    if xpath.startswith("/hierarchy/"):
+        return "./" + xpath[len("/hierarchy/"):]
+    if xpath.startswith("//"):
+        return "." + xpath
+    return xpath
+
+
+def find_node(root, xpath: str):
+    """Resolve the XPath subset used by the scraper against a parsed hierarchy."""
+    # ElementTree counts "*[n]" among same-tag siblings; XPath counts all children.
+    match = _NTH_CHILD.match(xpath)
+    if match is None:
+        return root.find(_to_etree_path(xpath))
+    parent = root.find(_to_etree_path(match.group(1))) if match.group(1) != "." else root
+    position = int(match.group(2))
+    if parent is None or len(parent) < position:
+        return None
+    return parent[position - 1]
+
+
+def find_nodes(root, xpath: str) -> list:
+    return root.findall(_to_etree_path(xpath))
+
+
+def _matcher(by: str, value: str):
+    if by == ACCESSIBILITY_ID:
+        return lambda node: node.get("content-desc") == value
+    # UiSelector chains such as new UiSelector().className("X").description("Y").
+    criteria = [
+        (_UISELECTOR_ATTRIBUTES[method], re.sub(r"\\(.)", r"\1", argument))
+        for method, argument in _UISELECTOR_CALL.findall(value)
+    ]
+    return lambda node: all(node.get(attribute) == expected for attribute, expected in criteria)
+
+
+def find_node_by(root, by: str, value: str):
+    """Like ``find_node``, for any strategy ``scrape_flow`` compiles selectors to."""
+    if by not in (ACCESSIBILITY_ID, UIAUTOMATOR):
+        return find_node(root, value)
+    matches = _matcher(by, value)
+    return next((node for node in root.iter() if matches(node)), None)
+
+
+def find_nodes_by(root, by: str, value: str) -> list:
+    if by not in (ACCESSIBILITY_ID, UIAUTOMATOR):
+        return find_nodes(root, value)
+    matches = _matcher(by, value)
+    return [node for node in root.iter() if matches(node)]
+
+
+def text_at(root, xpath: str) -> str | None:
+    node = find_node(root, xpath)
+    if node is None:
+        return None
+    return node.get("text") or None
+
+
+def texts(root) -> list[str]:
+    return [node.get("text").strip() for node in root.iter() if (node.get("text") or "").strip()]
+
+
+def parse_amount(text: str) -> int | None:
+    """Euro amount shown in a price label such as "250 000 €", or None."""
+    if "€" not in text:
+        return None
+    digits = re.sub(r"\D", "", text.split("€")[0])
+    return int(digits) if digits else None
+
+
+def best_phone(candidates: list[str]) -> str | None:
+    """Return the candidate with the most digits, ignoring anything with letters."""
+    best_match = None
+    best_digits = 0
+    for text in candidates:
+        text = text.strip()
+        if not text or any(ch.isalpha() for ch in text):
+            continue
+        digits_only = re.sub(r"\D", "", text)
+        if len(digits_only) >= MIN_PHONE_DIGITS and len(digits_only) > best_digits:
+            best_match = text
+            best_digits = len(digits_only)
+    return best_match
@@ -0,0 +1,135 @@
+"""Run one search on several device sessions at once.
+
+The price range is split into disjoint sub-ranges, one per worker, so each
+device scrapes listings the others cannot see. The listings a slice holds
+are not known in advance, so no worker gets a fixed share: each may scrape
+up to the whole count and they all stop once together they have it (see
+``SharedQuota``). A sparse slice leaves more to the others instead of a
+short result. Worker results are merged by position in their results list,
+which is the app's recency order within each slice, and deduplicated with
+the same signature ``search_listings`` uses within a run.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain, zip_longest
+
+from test_search import listing_signature, search_listings
+
+
+def split_price_range(min_price: int, max_price: int, shards: int) -> list[tuple[int, int]]:
+    """Split ``[min_price, max_price]`` into at most ``shards`` disjoint inclusive ranges."""
+    span = max_price - min_price + 1
+    shards = max(1, min(shards, span))
+    width = span / shards
+    bounds = [min_price + round(i * width) for i in range(shards)] + [max_price + 1]
+    return [(bounds[i], bounds[i + 1] - 1) for i in range(shards)]
+
+
+class SharedQuota:
+    """The ``cancel`` flag of every shard: set once together they have ``max_listings``.
+
+    ``add`` is their ``on_listing`` callback; it counts the listing and
+    passes it on to ``on_listing``. A cancellation of the whole search
+    (``cancel``) sets the flag as well.
+    """
+
+    def __init__(self, max_listings: int, cancel=None, on_listing=None) -> None:
+        self.max_listings = max_listings
+        self.cancel = cancel
+        self.on_listing = on_listing
+        self.scraped = 0
+        self._lock = threading.Lock()
+
+    def add(self, listing: dict) -> None:
+        with self._lock:
+            self.scraped += 1
+        if self.on_listing is not None:
+            self.on_listing(listing)
+
+    def is_set(self) -> bool:
+        return self.scraped >= self.max_listings or (self.cancel is not None and self.cancel.is_set())
+
+
+def merge_results(
+    location, min_price: int, max_price: int, max_listings: int, shard_results: list[dict]
+) -> dict:
+    listings = []
+    seen_signatures = set()
+    errors = [
+        f"[{shard['min_price']}-{shard['max_price']}] {shard['error']}" for shard in shard_results if shard.get("error")
+    ]
+    # Shards finish a card or two past the quota; taking each shard's first
+    # listings in turn keeps the most recent of every slice.
+    by_position = chain.from_iterable(zip_longest(*(shard.get("listings", []) for shard in shard_results)))
+    for listing in by_position:
+        if listing is None:
+            continue
+        signature = listing_signature(listing)
+        if signature in seen_signatures or len(listings) >= max_listings:
+            continue
+        seen_signatures.add(signature)
+        listings.append({**listing, "index": len(listings) + 1})
+
+    result = {
+        "location": location,
+        "min_price": min_price,
+        "max_price": max_price,
+        "requested": max_listings,
+        "listings": listings,
+        "shards": [
+            {
+                "min_price": shard["min_price"],
+                "max_price": shard["max_price"],
+                "scraped": shard.get("scraped", 0),
+                **({"error": shard["error"]} if shard.get("error") else {}),
+            }
+            for shard in shard_results
+        ],
+    }
+    # Same partial-failure contract as search_listings: listings scraped by
+    # healthy workers are kept and "error" reports what went wrong.
+    if errors:
+        result["error"] = "; ".join(errors)
+    if any(shard.get("circuit_open") for shard in shard_results):
+        result["circuit_open"] = True
+    if any(shard.get("transient") for shard in shard_results):
+        result["transient"] = True
+    if any(shard.get("cancelled") for shard in shard_results):
+        result["cancelled"] = True
+    # Every match is in the result only if every slice was read to its end.
+    if all(shard.get("exhausted") for shard in shard_results):
+        result["exhausted"] = True
+    if any("known_skipped" in shard for shard in shard_results):
+        result["known_skipped"] = sum(shard.get("known_skipped", 0) for shard in shard_results)
+    result["scraped"] = len(listings)
+    return result
+
+
+def search_listings_parallel(
+    location, min_price: int, max_price: int, max_listings: int, pool, workers: int | None = None, **kwargs
+) -> dict:
+    """Shard a search across up to ``workers`` sessions drawn from ``pool``."""
+    workers = workers or pool.size
+    ranges = split_price_range(min_price, max_price, workers)
+    if len(ranges) == 1:
+        return search_listings(location, min_price, max_price, max_listings, pool=pool, **kwargs)
+
+    cancel = kwargs.pop("cancel", None)
+    quota = SharedQuota(max_listings, cancel, kwargs.pop("on_listing", None))
+
+    def run(price_range: tuple[int, int]) -> dict:
+        low, high = price_range
+        try:
+            result = search_listings(
+                location, low, high, max_listings, pool=pool, on_listing=quota.add, cancel=quota, **kwargs
+            )
+        except Exception as e:
+            return {"min_price": low, "max_price": high, "listings": [], "scraped": 0, "error": str(e)}
+        if not (cancel is not None and cancel.is_set()):
+            # Stopped because the quota was met, not cancelled.
+            result.pop("cancelled", None)
+        return result
+
+    with ThreadPoolExecutor(max_workers=len(ranges), thread_name_prefix="scrape-shard") as executor:
+        shard_results = list(executor.map(run, ranges))
+    return merge_results(location, min_price, max_price, max_listings, shard_results)
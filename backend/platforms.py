@@ -0,0 +1,228 @@
+"""Listing platforms the agent searches, and the fan-out of one search to all of them.
+
+A platform adapter runs one search and returns a result with the contract
+of ``search_listings`` (``listings``, ``scraped``, and ``error`` or
+``cancelled`` when relevant). Adapters are registered under the name the
+frontend ``Listing.platform`` uses; ``ENABLED_PLATFORMS`` (comma-separated)
+picks those a search goes to and ``PLATFORM_TIMEOUT_<NAME>`` overrides the
+timeout of one, e.g. ``PLATFORM_TIMEOUT_SELOGER=300``.
+
+``fan_out`` starts the search on every platform at once, each on the scrape
+executor under its own timeout, and yields each platform's result as soon
+as that platform is done, so a slow source never holds back the others. A
+platform that runs out of time is told to stop before its next card and
+reports the listings it had scraped. Every listing is tagged with its
+``platform``. Each running platform takes a scrape executor slot, so
+``SCRAPE_CONCURRENCY`` should be at least the number of enabled platforms.
+
+An adapter is tested like SeLoger is: against a local fake of its app, by
+handing it a ``DevicePool`` of fake drivers.
+"""
+import abc
+import asyncio
+import os
+import threading
+import time
+
+from device_pool import get_pool
+from near_duplicates import deduplicate
+from parallel_scrape import search_listings_parallel
+from scrape_executor import ScrapeQueueFull, get_executor
+
+DEFAULT_PLATFORM_TIMEOUT = float(os.getenv("PLATFORM_TIMEOUT", "900"))
+ENABLED_PLATFORMS = os.getenv("ENABLED_PLATFORMS", "SeLoger")
+
+
+class Platform(abc.ABC):
+    """A listing source. Subclasses set ``name`` and implement ``search``."""
+
+    name = ""
+
+    def __init__(self, timeout: float | None = None) -> None:
+        variable = "PLATFORM_TIMEOUT_" + "".join(char for char in self.name.upper() if char.isalnum())
+        self.timeout = timeout if timeout is not None else float(os.getenv(variable, DEFAULT_PLATFORM_TIMEOUT))
+
+    @abc.abstractmethod
+    def search(
+        self,
+        location,
+        min_price: int,
+        max_price: int,
+        max_listings: int,
+        on_listing=None,
+        cancel=None,
+        known=None,
+    ) -> dict:
+        """Scrape up to ``max_listings`` listings; blocking, run on the scrape executor."""
+
+
+class SeLoger(Platform):
+    name = "SeLoger"
+
+    def __init__(self, pool=None, timeout: float | None = None) -> None:
+        super().__init__(timeout)
+        self.pool = pool
+
+    def search(self, location, min_price, max_price, max_listings, on_listing=None, cancel=None, known=None):
+        return search_listings_parallel(
+            location,
+            min_price,
+            max_price,
+            max_listings,
+            pool=self.pool or get_pool(),
+            on_listing=on_listing,
+            cancel=cancel,
+            known=known,
+        )
+
+
+_platforms = {}
+
+
+def register(platform: Platform) -> Platform:
+    _platforms[platform.name] = platform
+    return platform
+
+
+def get_platform(name: str) -> Platform | None:
+    return _platforms.get(name)
+
+
+def enabled_platforms() -> list[Platform]:
+    names = [name.strip() for name in ENABLED_PLATFORMS.split(",") if name.strip()]
+    unknown = [name for name in names if name not in _platforms]
+    if unknown:
+        raise ValueError(f"Unknown platforms in ENABLED_PLATFORMS: {', '.join(unknown)}")
+    return [_platforms[name] for name in names]
+
+
+register(SeLoger())
+
+
+def tag(listing: dict, platform: str) -> dict:
+    return listing if listing.get("platform") == platform else {**listing, "platform": platform}
+
+
+async def search_platform(
+    platform: Platform,
+    location,
+    min_price: int,
+    max_price: int,
+    max_listings: int,
+    on_listing=None,
+    known=None,
+) -> dict:
+    """One platform's result, listings tagged; on timeout, what it had scraped by then."""
+    cancel = threading.Event()
+    scraped = []
+    start = time.monotonic()
+
+    def sink(listing: dict) -> None:
+        # Called from scraper threads.
+        listing = tag(listing, platform.name)
+        scraped.append(listing)
+        if on_listing is not None:
+            on_listing(listing)
+
+    task = asyncio.ensure_future(
+        get_executor().run(
+            platform.search, location, min_price, max_price, max_listings, on_listing=sink, cancel=cancel, known=known
+        )
+    )
+    try:
+        result = await asyncio.wait_for(asyncio.shield(task), platform.timeout)
+        result = {**result, "listings": [tag(listing, platform.name) for listing in result.get("listings", [])]}
+    except asyncio.TimeoutError:
+        # The scrape stops at its next card; its slot frees up then, nobody waits for it.
+        cancel.set()
+        listings = list(scraped)
+        result = {
+            "listings": listings,
+            "scraped": len(listings),
+            "error": f"Timed out after {platform.timeout:g}s",
+        }
+    except asyncio.CancelledError:
+        cancel.set()
+        raise
+    except ScrapeQueueFull as e:
+        result = {"listings": [], "scraped": 0, "error": str(e)}
+    except Exception as e:
+        result = {"listings": list(scraped), "scraped": len(scraped), "error": str(e)}
+    return {
+        **result,
+        "platform": platform.name,
+        "location": location,
+        "min_price": min_price,
+        "max_price": max_price,
+        "requested": max_listings,
+        "seconds": round(time.monotonic() - start, 2),
+    }
+
+
+async def fan_out(
+    location,
+    min_price: int,
+    max_price: int,
+    max_listings: int,
+    platforms: list[Platform] | None = None,
+    on_listing=None,
+    known=None,
+):
+    """Yield each platform's result (see ``search_platform``) in the order they finish."""
+    platforms = enabled_platforms() if platforms is None else platforms
+    tasks = [
+        asyncio.ensure_future(
+            search_platform(platform, location, min_price, max_price, max_listings, on_listing, known)
+        )
+        for platform in platforms
+    ]
+    try:
+        for finished in asyncio.as_completed(tasks):
+            yield await finished
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+def merge_platform_results(
+    location, min_price: int, max_price: int, max_listings: int, platform_results: list[dict]
+) -> dict:
+    """One result from per-platform results, listings in the order they arrived.
+
+    A property found on several platforms, or reposted, is kept once, with
+    every listing it was found as in its ``sources``.
+    """
+    errors = [
+        f"[{platform_result['platform']}] {platform_result['error']}"
+        for platform_result in platform_results
+        if platform_result.get("error")
+    ]
+    records = deduplicate([listing for platform_result in platform_results for listing in platform_result["listings"]])
+    listings = [{**listing, "index": index} for index, listing in enumerate(records[:max_listings], start=1)]
+    result = {
+        "location": location,
+        "min_price": min_price,
+        "max_price": max_price,
+        "requested": max_listings,
+        "listings": listings,
+        "scraped": len(listings),
+        "platforms": [
+            {
+                "platform": platform_result["platform"],
+                "scraped": platform_result.get("scraped", 0),
+                **{
+                    key: platform_result[key]
+                    for key in ("error", "cached", "age_seconds", "seconds")
+                    if platform_result.get(key)
+                },
+            }
+            for platform_result in platform_results
+        ],
+    }
+    if errors:
+        result["error"] = "; ".join(errors)
+    if any(platform_result.get("cancelled") for platform_result in platform_results):
+        result["cancelled"] = True
+    if any("known_skipped" in platform_result for platform_result in platform_results):
+        result["known_skipped"] = sum(platform_result.get("known_skipped", 0) for platform_result in platform_results)
+    return result
@@ -0,0 +1,275 @@
+"""Price history and age of listings, built from repeated scrapes of them.
+
+A scrape is one snapshot, but the signals of ``scoringService`` need a
+listing's ``priceHistory`` and ``daysOnline``. Every scraped listing is
+recorded here as an observation (in SQLite, so it survives restarts and is
+shared by the API workers). Its state is kept incrementally as observations
+come in: first and last seen, current price, the price changes seen and the
+number of drops. Nothing is replayed to answer a question about it.
+
+* ``observations``: one row per listing per day, three integers, clustered by
+  listing (an append-only log; a later scrape the same day adds nothing)
+* ``price_changes``: one row per change of a listing's price
+* ``listings``: the current state, indexed on (drops, first seen), so "at
+  least 2 drops, online for more than 60 days" is a range scan of the index
+
+A listing is identified by its platform and ``id`` when it has one, and
+otherwise by its parsed fields without the price (rooms, bedrooms, surface,
+floor, phone), so a repriced listing is the same listing. ``daysOnline``
+counts from the first time a listing was seen, and ``priceHistory`` lists
+its drops, which is what the frontend's signals count.
+"""
+import os
+import sqlite3
+import threading
+import time
+from datetime import date
+
+from listing_parser import parse_price
+from result_cache import normalize_location
+
+PRICE_HISTORY_PATH = os.getenv(
+    "PRICE_HISTORY_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "price_history.db")
+)
+# Parsed fields that identify a scraped listing whatever its price.
+KEY_FIELDS = ("rooms", "bedrooms", "surface", "floor", "phone_e164")
+DAY_SECONDS = 86400
+# SQLite's default bound on the parameters of one statement is 999.
+_CHUNK = 500
+
+
+def listing_key(listing: dict) -> str | None:
+    platform = listing.get("platform") or ""
+    if listing.get("id") is not None:
+        return f"{platform}|id:{listing['id']}"
+    if listing.get("surface") is not None and listing.get("phone_e164"):
+        return f"{platform}|" + "|".join(str(listing.get(field)) for field in KEY_FIELDS)
+    if listing.get("details"):
+        return f"{platform}|{listing['details']}|{listing.get('phone')}"
+    return None
+
+
+def listing_amount(listing: dict) -> int | None:
+    if listing.get("amount") is not None:
+        return int(listing["amount"])
+    price = listing.get("price")
+    return round(price) if isinstance(price, (int, float)) else parse_price(price)
+
+
+def _chunks(values: list):
+    for start in range(0, len(values), _CHUNK):
+        yield values[start : start + _CHUNK]
+
+
+def _iso_date(timestamp: float) -> str:
+    return date.fromtimestamp(timestamp).isoformat()
+
+
+def _price_change(changed_at: int, previous: int, amount: int) -> dict:
+    """A frontend ``PriceChange``."""
+    return {
+        "date": _iso_date(changed_at),
+        "previousPrice": previous,
+        "newPrice": amount,
+        "percentChange": round((amount - previous) / previous * 100, 1) if previous else 0.0,
+    }
+
+
+class PriceHistory:
+    def __init__(self, path: str = PRICE_HISTORY_PATH) -> None:
+        self.path = path
+        self._db = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        # Called with the lock held; the file is only created once it is used.
+        if self._db is None:
+            # Transactions are opened explicitly, so that a read and the writes it decides are atomic.
+            self._db = sqlite3.connect(self.path, check_same_thread=False, timeout=30, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS listings ("
+                "id INTEGER PRIMARY KEY, key TEXT NOT NULL UNIQUE, location TEXT, "
+                "first_seen INTEGER NOT NULL, last_seen INTEGER NOT NULL, amount INTEGER NOT NULL, "
+                "drops INTEGER NOT NULL DEFAULT 0)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS listings_drops ON listings (drops, first_seen)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS listings_first_seen ON listings (first_seen)")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS observations ("
+                "listing INTEGER NOT NULL, day INTEGER NOT NULL, amount INTEGER NOT NULL, "
+                "PRIMARY KEY (listing, day)) WITHOUT ROWID"
+            )
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS price_changes ("
+                "listing INTEGER NOT NULL, changed_at INTEGER NOT NULL, "
+                "previous INTEGER NOT NULL, amount INTEGER NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS price_changes_listing ON price_changes (listing)")
+        return self._db
+
+    @property
+    def stats(self) -> dict:
+        with self._lock:
+            db = self._connect()
+            return {
+                table: db.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                for table in ("listings", "observations", "price_changes")
+            }
+
+    def record(self, location, listings: list[dict], observed_at: float | None = None) -> int:
+        """Add an observation of each of ``listings``; return how many changed price."""
+        now = int(observed_at if observed_at is not None else time.time())
+        observed = {}
+        for listing in listings:
+            key, amount = listing_key(listing), listing_amount(listing)
+            if key is not None and amount is not None:
+                observed[key] = amount
+        if not observed:
+            return 0
+        location = normalize_location(location)
+        changed = 0
+        with self._lock:
+            db = self._connect()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                known = {}
+                for keys in _chunks(list(observed)):
+                    rows = db.execute(
+                        f"SELECT key, id, amount, last_seen FROM listings WHERE key IN ({', '.join('?' * len(keys))})",
+                        keys,
+                    )
+                    known.update((key, state) for key, *state in rows)
+                for key, amount in observed.items():
+                    if key not in known:
+                        listing_id = db.execute(
+                            "INSERT INTO listings (key, location, first_seen, last_seen, amount) VALUES (?, ?, ?, ?, ?)",
+                            (key, location, now, now, amount),
+                        ).lastrowid
+                    else:
+                        listing_id, previous, last_seen = known[key]
+                        if now < last_seen:
+                            # A late observation (from another worker, say) only moves first_seen.
+                            db.execute(
+                                "UPDATE listings SET first_seen = MIN(first_seen, ?) WHERE id = ?", (now, listing_id)
+                            )
+                        else:
+                            if amount != previous:
+                                changed += 1
+                                db.execute(
+                                    "INSERT INTO price_changes VALUES (?, ?, ?, ?)", (listing_id, now, previous, amount)
+                                )
+                            db.execute(
+                                "UPDATE listings SET last_seen = ?, amount = ?, location = ?, drops = drops + ? "
+                                "WHERE id = ?",
+                                (now, amount, location, int(amount < previous), listing_id),
+                            )
+                    db.execute(
+                        "INSERT OR IGNORE INTO observations VALUES (?, ?, ?)", (listing_id, now // DAY_SECONDS, amount)
+                    )
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+        return changed
+
+    def _drops(self, db: sqlite3.Connection, listing_ids: list[int]) -> dict[int, list[dict]]:
+        drops = {}
+        for ids in _chunks(listing_ids):
+            rows = db.execute(
+                "SELECT listing, changed_at, previous, amount FROM price_changes "
+                f"WHERE amount < previous AND listing IN ({', '.join('?' * len(ids))}) ORDER BY changed_at",
+                ids,
+            )
+            for listing_id, changed_at, previous, amount in rows:
+                drops.setdefault(listing_id, []).append(_price_change(changed_at, previous, amount))
+        return drops
+
+    def annotate(self, listings: list[dict], now: float | None = None) -> list[dict]:
+        """``listings`` with ``publicationDate``, ``daysOnline`` and ``priceHistory`` where they are known."""
+        now = now if now is not None else time.time()
+        keys = {listing_key(listing) for listing in listings} - {None}
+        if not keys:
+            return listings
+        with self._lock:
+            db = self._connect()
+            states = {}
+            for chunk in _chunks(list(keys)):
+                rows = db.execute(
+                    f"SELECT key, id, first_seen FROM listings WHERE key IN ({', '.join('?' * len(chunk))})", chunk
+                )
+                states.update((key, state) for key, *state in rows)
+            drops = self._drops(db, [listing_id for listing_id, _ in states.values()])
+        annotated = []
+        for listing in listings:
+            state = states.get(listing_key(listing))
+            if state is not None:
+                listing_id, first_seen = state
+                listing = {
+                    **listing,
+                    "publicationDate": _iso_date(first_seen),
+                    "daysOnline": max(int(now - first_seen) // DAY_SECONDS, 0),
+                    "priceHistory": drops.get(listing_id, []),
+                }
+            annotated.append(listing)
+        return annotated
+
+    def query(
+        self,
+        min_drops: int = 0,
+        min_days_online: int | None = None,
+        max_days_online: int | None = None,
+        location=None,
+        limit: int = 100,
+        now: float | None = None,
+    ) -> list[dict]:
+        """Listings with at least ``min_drops`` drops, online for the given number of days; most drops first."""
+        now = int(now if now is not None else time.time())
+        conditions, params = ["drops >= ?"], [min_drops]
+        if min_days_online is not None:
+            conditions.append("first_seen <= ?")
+            params.append(now - min_days_online * DAY_SECONDS)
+        if max_days_online is not None:
+            conditions.append("first_seen > ?")
+            params.append(now - (max_days_online + 1) * DAY_SECONDS)
+        if location is not None:
+            conditions.append("location = ?")
+            params.append(normalize_location(location))
+        with self._lock:
+            db = self._connect()
+            rows = db.execute(
+                "SELECT id, key, location, first_seen, last_seen, amount, drops FROM listings "
+                f"WHERE {' AND '.join(conditions)} ORDER BY drops DESC, first_seen LIMIT ?",
+                (*params, limit),
+            ).fetchall()
+            drops = self._drops(db, [row[0] for row in rows])
+        return [
+            {
+                "key": key,
+                "location": location,
+                "price": amount,
+                "publicationDate": _iso_date(first_seen),
+                "lastSeen": _iso_date(last_seen),
+                "daysOnline": max(now - first_seen, 0) // DAY_SECONDS,
+                "priceHistory": drops.get(listing_id, []),
+            }
+            for listing_id, key, location, first_seen, last_seen, amount, _ in rows
+        ]
+
+    def close(self) -> None:
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+_default_history = None
+_default_history_lock = threading.Lock()
+
+
+def get_price_history() -> PriceHistory:
+    global _default_history
+    with _default_history_lock:
+        if _default_history is None:
+            _default_history = PriceHistory()
+        return _default_history
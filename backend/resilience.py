@@ -0,0 +1,166 @@
+"""Retries with backoff and circuit breakers for the calls a scrape makes to the device farm.
+
+A step of a scrape (opening the results, opening a card) that fails with a
+transient error (a WebDriver error, a dropped connection) is retried up to
+``STEP_RETRY_ATTEMPTS`` times. The delay before each retry grows
+exponentially with the attempt and with the failures its endpoint has had
+in a row, with full jitter, so a struggling endpoint gets more breathing
+room than a single hiccup. A screen that did not show up within its budget
+(``TimeoutException``) is not retried: the app answered, and waiting again
+would most likely end the same way, as it does for a search with no results.
+
+Each Appium endpoint has a circuit breaker. After ``BREAKER_FAILURES``
+steps in a row failed because the endpoint did (the connection dropped or
+the session is gone), it opens, and every step against that endpoint fails
+at once with ``CircuitOpen`` instead of waiting out its timeouts. Errors of
+the app itself (an element missing, a crash) are retried but say nothing
+about the endpoint. After ``BREAKER_RESET`` seconds one step is let through
+(half-open): its success closes the breaker and its failure opens it again.
+"""
+import os
+import random
+import threading
+import time
+
+from selenium.common.exceptions import InvalidSessionIdException, TimeoutException, WebDriverException
+from urllib3.exceptions import HTTPError
+
+STEP_RETRY_ATTEMPTS = int(os.getenv("STEP_RETRY_ATTEMPTS", "3"))
+STEP_RETRY_DELAY = float(os.getenv("STEP_RETRY_DELAY", "0.5"))
+STEP_RETRY_MAX_DELAY = float(os.getenv("STEP_RETRY_MAX_DELAY", "10"))
+BREAKER_FAILURES = int(os.getenv("BREAKER_FAILURES", "5"))
+BREAKER_RESET_SECONDS = float(os.getenv("BREAKER_RESET", "60"))
+
+# Errors worth retrying: the device or the connection to it, not a bug in the scraper.
+TRANSIENT_ERRORS = (WebDriverException, HTTPError, OSError)
+# Those that are the endpoint's fault, and count towards opening its breaker.
+ENDPOINT_ERRORS = (InvalidSessionIdException, HTTPError, OSError)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpen(Exception):
+    pass
+
+
+class CircuitBreaker:
+    def __init__(
+        self, endpoint: str, failures: int = BREAKER_FAILURES, reset_after: float = BREAKER_RESET_SECONDS
+    ) -> None:
+        self.endpoint = endpoint
+        self.max_failures = failures
+        self.reset_after = reset_after
+        self.state = CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+        self._trial_running = False
+        self._counters = {"opened": 0, "rejected": 0}
+        self._lock = threading.Lock()
+
+    @property
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._counters, "state": self.state, "failures": self.failures}
+
+    def allow(self) -> None:
+        """Raise ``CircuitOpen`` unless a step may run against the endpoint now."""
+        with self._lock:
+            if self.state == OPEN and time.monotonic() - self._opened_at >= self.reset_after:
+                self.state = HALF_OPEN
+            if self.state == CLOSED or (self.state == HALF_OPEN and not self._trial_running):
+                self._trial_running = self.state == HALF_OPEN
+                return
+            self._counters["rejected"] += 1
+        raise CircuitOpen(f"Device endpoint unavailable after {self.failures} failures in a row")
+
+    def success(self) -> None:
+        with self._lock:
+            self.state = CLOSED
+            self.failures = 0
+            self._trial_running = False
+
+    def release(self) -> None:
+        """End a step that failed for reasons of its own, not the endpoint's."""
+        with self._lock:
+            self._trial_running = False
+
+    def failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            self._trial_running = False
+            if self.state == HALF_OPEN or (self.state == CLOSED and self.failures >= self.max_failures):
+                self.state = OPEN
+                self._opened_at = time.monotonic()
+                self._counters["opened"] += 1
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def endpoint_of(driver) -> str:
+    """The Appium server ``driver`` talks to, without its query string (signed URLs change)."""
+    config = getattr(getattr(driver, "command_executor", None), "_client_config", None)
+    address = getattr(config, "remote_server_addr", None)
+    return str(address).split("?", 1)[0] if address else "local"
+
+
+def get_breaker(endpoint: str) -> CircuitBreaker:
+    with _breakers_lock:
+        breaker = _breakers.get(endpoint)
+        if breaker is None:
+            breaker = _breakers[endpoint] = CircuitBreaker(endpoint)
+        return breaker
+
+
+def breaker_stats() -> dict:
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return {breaker.endpoint: breaker.stats for breaker in breakers}
+
+
+def backoff(attempt: int, base: float = STEP_RETRY_DELAY, maximum: float = STEP_RETRY_MAX_DELAY) -> float:
+    return random.uniform(0, min(maximum, base * 2**attempt))
+
+
+def retry_step(
+    step: str, func, breaker: CircuitBreaker | None = None, attempts: int = STEP_RETRY_ATTEMPTS, recover=None
+):
+    """Run ``func()``, retrying transient errors; ``recover()`` runs before each retry.
+
+    The last error is raised once the attempts are used up, a
+    ``TimeoutException`` at once, and ``CircuitOpen`` as soon as the breaker
+    rejects a step.
+    """
+    for attempt in range(attempts):
+        if breaker is not None:
+            breaker.allow()
+        try:
+            value = func()
+        except TimeoutException:
+            if breaker is not None:
+                breaker.release()
+            raise
+        except TRANSIENT_ERRORS as e:
+            if breaker is not None:
+                if isinstance(e, ENDPOINT_ERRORS):
+                    breaker.failure()
+                else:
+                    breaker.release()
+            if attempt == attempts - 1:
+                raise
+            delay = backoff(attempt + (max(breaker.failures - 1, 0) if breaker is not None else 0))
+            print(f"✗ Step '{step}' failed ({str(e).strip()}); retrying in {delay:.1f}s")
+            time.sleep(delay)
+            if recover is not None:
+                recover()
+            continue
+        except Exception:
+            if breaker is not None:
+                breaker.release()
+            raise
+        if breaker is not None:
+            breaker.success()
+        return value
@@ -0,0 +1,196 @@
+"""Cache of scrape results keyed by normalized search parameters.
+
+A device run takes minutes, and agents often repeat a search within one
+conversation or across several. Results are keyed by the platform, the
+trimmed, lower-cased location and the price range; a result scraped for N
+listings serves any later request for up to N, or for any count when the
+scraper read the results list to its end (``exhausted``). A result cut short
+otherwise (a failed shard, a card that could not be read) serves only up to
+the listings it has. Entries expire after ``ttl`` seconds
+and the least recently used are dropped beyond ``max_entries``. Set
+``SCRAPE_CACHE_PATH`` to keep the cache in SQLite across restarts and share
+it between API workers.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+CACHE_TTL_SECONDS = float(os.getenv("SCRAPE_CACHE_TTL", "900"))
+CACHE_MAX_ENTRIES = int(os.getenv("SCRAPE_CACHE_MAX_ENTRIES", "256"))
+CACHE_PATH = os.getenv("SCRAPE_CACHE_PATH")
+
+
+def normalize_location(location) -> str:
+    return " ".join(str(location).split()).lower()
+
+
+def cache_key(location, min_price: int, max_price: int, platform: str | None = None) -> str:
+    key = f"{normalize_location(location)}|{int(min_price)}|{int(max_price)}"
+    return f"{platform}|{key}" if platform else key
+
+
+def search_key(location, min_price: int, max_price: int, filters: dict | None = None) -> str:
+    """What makes two searches the same search: location, price range and filters."""
+    key = cache_key(location, min_price, max_price)
+    return f"{key}|{json.dumps(filters, sort_keys=True)}" if filters else key
+
+
+def coverage(result: dict) -> int | None:
+    """Number of listings a result can serve, or None when it holds every match."""
+    if result.get("exhausted") and not result.get("error"):
+        return None
+    return min(result.get("scraped", 0), result.get("requested", 0))
+
+
+class MemoryBackend:
+    def __init__(self) -> None:
+        # Least recently used entries are on the left.
+        self._entries = OrderedDict()
+
+    def get(self, key: str) -> dict | None:
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key: str, entry: dict) -> None:
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+
+    def delete(self, key: str) -> None:
+        self._entries.pop(key, None)
+
+    def trim(self, max_entries: int) -> int:
+        evicted = 0
+        while len(self._entries) > max_entries:
+            self._entries.popitem(last=False)
+            evicted += 1
+        return evicted
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SqliteBackend:
+    def __init__(self, path: str) -> None:
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            "key TEXT PRIMARY KEY, covers INTEGER, stored_at REAL NOT NULL, "
+            "used_at REAL NOT NULL, result TEXT NOT NULL)"
+        )
+        self._db.commit()
+
+    def get(self, key: str) -> dict | None:
+        row = self._db.execute(
+            "SELECT covers, stored_at, result FROM results WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        self._db.execute("UPDATE results SET used_at = ? WHERE key = ?", (time.time(), key))
+        self._db.commit()
+        return {"covers": row[0], "stored_at": row[1], "result": json.loads(row[2])}
+
+    def put(self, key: str, entry: dict) -> None:
+        self._db.execute(
+            "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?)",
+            (key, entry["covers"], entry["stored_at"], time.time(), json.dumps(entry["result"], ensure_ascii=False)),
+        )
+        self._db.commit()
+
+    def delete(self, key: str) -> None:
+        self._db.execute("DELETE FROM results WHERE key = ?", (key,))
+        self._db.commit()
+
+    def trim(self, max_entries: int) -> int:
+        cursor = self._db.execute(
+            "DELETE FROM results WHERE key NOT IN "
+            "(SELECT key FROM results ORDER BY used_at DESC LIMIT ?)",
+            (max_entries,),
+        )
+        self._db.commit()
+        return cursor.rowcount
+
+    def __len__(self) -> int:
+        return self._db.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+
+class ResultCache:
+    def __init__(
+        self,
+        ttl: float = CACHE_TTL_SECONDS,
+        max_entries: int = CACHE_MAX_ENTRIES,
+        path: str | None = CACHE_PATH,
+    ) -> None:
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._backend = SqliteBackend(path) if path else MemoryBackend()
+        self._counters = {"hits": 0, "misses": 0, "stores": 0, "expired": 0, "evicted": 0}
+        self._lock = threading.Lock()
+
+    @property
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._counters, "entries": len(self._backend), "ttl": self.ttl, "max_entries": self.max_entries}
+
+    def get(
+        self, location, min_price: int, max_price: int, max_listings: int, platform: str | None = None
+    ) -> dict | None:
+        """Return a cached result trimmed to ``max_listings``, or None on a miss."""
+        key = cache_key(location, min_price, max_price, platform)
+        with self._lock:
+            entry = self._backend.get(key)
+            if entry is not None and time.time() - entry["stored_at"] > self.ttl:
+                self._backend.delete(key)
+                self._counters["expired"] += 1
+                entry = None
+            if entry is None or (entry["covers"] is not None and entry["covers"] < max_listings):
+                self._counters["misses"] += 1
+                return None
+            self._counters["hits"] += 1
+        result = entry["result"]
+        listings = result.get("listings", [])[:max_listings]
+        return {
+            **result,
+            "location": location,
+            "requested": max_listings,
+            "listings": listings,
+            "scraped": len(listings),
+            "cached": True,
+            "age_seconds": round(time.time() - entry["stored_at"]),
+        }
+
+    def put(self, result: dict, replace: bool = False) -> None:
+        """Store a finished search; failed, cancelled or, unless ``replace``, narrower results are ignored."""
+        if result.get("error") or result.get("cancelled") or result.get("cached"):
+            return
+        key = cache_key(result["location"], result["min_price"], result["max_price"], result.get("platform"))
+        covers = coverage(result)
+        with self._lock:
+            current = self._backend.get(key)
+            if (
+                not replace
+                and current is not None
+                and time.time() - current["stored_at"] <= self.ttl
+                and (current["covers"] is None or (covers is not None and covers < current["covers"]))
+            ):
+                return
+            self._backend.put(key, {"covers": covers, "stored_at": time.time(), "result": result})
+            self._counters["stores"] += 1
+            self._counters["evicted"] += self._backend.trim(self.max_entries)
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_cache() -> ResultCache:
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = ResultCache()
+        return _default_cache
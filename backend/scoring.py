@@ -0,0 +1,244 @@
+"""Mandate scores for batches of listings.
+
+Applies the signal table of ``src/services/scoringService.ts`` to whole
+columns at once: listing age, price drops, DPE F/G, private seller and the
+combinations of these. Each listing gets a score, a priority (High from 70,
+Medium from 40) and a bitmask of its signals, bit ``i`` standing for
+``SIGNALS[i]``, so the browser can show the signals without scoring again.
+Listings are dicts shaped like the frontend ``Listing`` type (``daysOnline``,
+``priceHistory``, ``dpeClass``, ``sellerType``). Uses NumPy when it is
+installed and falls back to plain Python otherwise.
+"""
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Keep in the order of SIGNALS in scoringService.ts: bit positions are shared with the browser.
+SIGNALS = [
+    {
+        "id": "listing_old_30",
+        "label": "Annonce > 30 jours",
+        "description": "L'annonce est en ligne depuis plus de 30 jours",
+        "weight": 15,
+        "category": "age",
+    },
+    {
+        "id": "listing_old_60",
+        "label": "Annonce > 60 jours",
+        "description": "L'annonce est en ligne depuis plus de 60 jours - vendeur potentiellement motivé",
+        "weight": 25,
+        "category": "age",
+    },
+    {
+        "id": "listing_old_90",
+        "label": "Annonce > 90 jours",
+        "description": "L'annonce est en ligne depuis plus de 90 jours - forte probabilité de motivation",
+        "weight": 35,
+        "category": "age",
+    },
+    {
+        "id": "price_drop",
+        "label": "Baisse de prix",
+        "description": "Le vendeur a déjà baissé son prix",
+        "weight": 20,
+        "category": "price",
+    },
+    {
+        "id": "multiple_price_drops",
+        "label": "Baisses multiples",
+        "description": "Plusieurs baisses de prix successives - vendeur très motivé",
+        "weight": 30,
+        "category": "price",
+    },
+    {
+        "id": "dpe_f",
+        "label": "DPE F",
+        "description": "Passoire thermique - interdiction de location à venir",
+        "weight": 20,
+        "category": "dpe",
+    },
+    {
+        "id": "dpe_g",
+        "label": "DPE G",
+        "description": "Passoire thermique critique - interdiction de location imminente",
+        "weight": 25,
+        "category": "dpe",
+    },
+    {
+        "id": "private_seller",
+        "label": "Particulier",
+        "description": "Vendeur particulier - pas d'exclusivité agence",
+        "weight": 15,
+        "category": "seller",
+    },
+    {
+        "id": "combo_old_price_drop",
+        "label": "Combo: Ancien + Baisse",
+        "description": "Annonce ancienne avec baisse de prix - excellente opportunité",
+        "weight": 15,
+        "category": "combo",
+    },
+    {
+        "id": "combo_dpe_old",
+        "label": "Combo: DPE F/G + Ancien",
+        "description": "Passoire thermique ancienne - vendeur sous pression",
+        "weight": 20,
+        "category": "combo",
+    },
+    {
+        "id": "combo_triple",
+        "label": "Combo Triple",
+        "description": "DPE F/G + Ancien + Baisse de prix - mandat prioritaire",
+        "weight": 25,
+        "category": "combo",
+    },
+]
+BIT = {signal["id"]: 1 << position for position, signal in enumerate(SIGNALS)}
+WEIGHTS = [signal["weight"] for signal in SIGNALS]
+
+HIGH_SCORE = 70
+MEDIUM_SCORE = 40
+PRIVATE_SELLER = "Particulier"
+
+
+def columns(listings: list[dict]) -> dict[str, list]:
+    """The fields scoring reads, one list per field."""
+    return {
+        "days_online": [listing.get("daysOnline") or 0 for listing in listings],
+        "price_drops": [len(listing.get("priceHistory") or ()) for listing in listings],
+        "dpe_class": [listing.get("dpeClass") or "" for listing in listings],
+        "private": [listing.get("sellerType") == PRIVATE_SELLER for listing in listings],
+    }
+
+
+def _masks_numpy(days_online, price_drops, dpe_class, private):
+    days = np.asarray(days_online, dtype=np.int64)
+    drops = np.asarray(price_drops, dtype=np.int64)
+    dpe = np.asarray(dpe_class, dtype=str)
+    is_g, is_f = dpe == "G", dpe == "F"
+    is_old, has_drop, is_dpe_fg = days > 30, drops > 0, is_g | is_f
+    triple = is_old & has_drop & is_dpe_fg
+    return (
+        # Age, price drops and DPE each keep only their strongest signal.
+        np.select(
+            [days > 90, days > 60, is_old],
+            [BIT["listing_old_90"], BIT["listing_old_60"], BIT["listing_old_30"]],
+            0,
+        )
+        | np.select([drops > 1, has_drop], [BIT["multiple_price_drops"], BIT["price_drop"]], 0)
+        | np.select([is_g, is_f], [BIT["dpe_g"], BIT["dpe_f"]], 0)
+        | np.where(np.asarray(private, dtype=bool), BIT["private_seller"], 0)
+        # The triple combo replaces the two pairwise ones.
+        | np.where(triple, BIT["combo_triple"], 0)
+        | np.where(~triple & is_old & has_drop, BIT["combo_old_price_drop"], 0)
+        | np.where(~triple & is_old & is_dpe_fg, BIT["combo_dpe_old"], 0)
+    ).astype(np.int64)
+
+
+def signal_mask(days_online: int, price_drops: int, dpe_class: str, private: bool) -> int:
+    mask = 0
+    if days_online > 90:
+        mask |= BIT["listing_old_90"]
+    elif days_online > 60:
+        mask |= BIT["listing_old_60"]
+    elif days_online > 30:
+        mask |= BIT["listing_old_30"]
+    if price_drops > 1:
+        mask |= BIT["multiple_price_drops"]
+    elif price_drops > 0:
+        mask |= BIT["price_drop"]
+    if dpe_class == "G":
+        mask |= BIT["dpe_g"]
+    elif dpe_class == "F":
+        mask |= BIT["dpe_f"]
+    if private:
+        mask |= BIT["private_seller"]
+    is_old, has_drop, is_dpe_fg = days_online > 30, price_drops > 0, dpe_class in ("F", "G")
+    if is_old and has_drop and is_dpe_fg:
+        mask |= BIT["combo_triple"]
+    else:
+        if is_old and has_drop:
+            mask |= BIT["combo_old_price_drop"]
+        if is_old and is_dpe_fg:
+            mask |= BIT["combo_dpe_old"]
+    return mask
+
+
+def mask_score(mask: int) -> int:
+    return sum(weight for position, weight in enumerate(WEIGHTS) if mask >> position & 1)
+
+
+def priority(score: int) -> str:
+    if score >= HIGH_SCORE:
+        return "High"
+    if score >= MEDIUM_SCORE:
+        return "Medium"
+    return "Low"
+
+
+def score_columns(days_online, price_drops, dpe_class, private) -> tuple[list[int], list[int]]:
+    """Scores and signal masks of listings given column-wise."""
+    if np is None:
+        masks = [signal_mask(*row) for row in zip(days_online, price_drops, dpe_class, private)]
+        return [mask_score(mask) for mask in masks], masks
+    masks = _masks_numpy(days_online, price_drops, dpe_class, private)
+    bits = (masks[:, None] >> np.arange(len(SIGNALS))) & 1
+    scores = bits @ np.asarray(WEIGHTS, dtype=np.int64)
+    return scores.tolist(), masks.tolist()
+
+
+def priorities(scores: list[int]) -> list[str]:
+    if np is None:
+        return [priority(score) for score in scores]
+    values = np.asarray(scores, dtype=np.int64)
+    return np.select([values >= HIGH_SCORE, values >= MEDIUM_SCORE], ["High", "Medium"], "Low").tolist()
+
+
+def signals(mask: int) -> list[dict]:
+    return [signal for position, signal in enumerate(SIGNALS) if mask >> position & 1]
+
+
+def explanation(mask: int) -> str:
+    found = signals(mask)
+    if not found:
+        return "Aucun signal fort détecté. Opportunité standard."
+    labels = [signal["label"] for signal in found]
+    if mask & BIT["combo_triple"]:
+        return f"🔥 Opportunité exceptionnelle: {' + '.join(labels)}. Vendeur probablement très motivé."
+    if any(signal["category"] == "combo" for signal in found):
+        return f"⚡ Combinaison de signaux: {' + '.join(labels)}. Forte probabilité de mandat."
+    return f"Signaux détectés: {', '.join(labels)}."
+
+
+def score_listings(listings: list[dict], limit: int | None = None) -> dict:
+    """Score ``listings``; ``order`` ranks their indices by score, best first.
+
+    Ties keep the input order, as the browser's stable sort does.
+    """
+    scores, masks = score_columns(**columns(listings))
+    if np is None:
+        order = sorted(range(len(scores)), key=lambda index: -scores[index])
+    else:
+        order = np.argsort(-np.asarray(scores, dtype=np.int64), kind="stable").tolist()
+    return {
+        "scores": scores,
+        "priorities": priorities(scores),
+        "masks": masks,
+        "order": order[:limit] if limit is not None else order,
+    }
+
+
+def rank_listings(listings: list[dict], limit: int | None = None) -> list[dict]:
+    """``listings`` best first, each with its score, priority, signals and explanation."""
+    scored = score_listings(listings, limit)
+    return [
+        {
+            **listings[index],
+            "score": scored["scores"][index],
+            "priority": scored["priorities"][index],
+            "signals": signals(scored["masks"][index]),
+            "explanation": explanation(scored["masks"][index]),
+        }
+        for index in scored["order"]
+    ]
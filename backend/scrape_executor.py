@@ -0,0 +1,74 @@
+"""Bounded executor that keeps blocking scrapes off the asyncio event loop.
+
+``search_listings`` is synchronous (Appium HTTP calls and waits), so the
+API runs it on a small thread pool. At most ``SCRAPE_CONCURRENCY`` scrapes
+run at once, up to ``SCRAPE_QUEUE_LIMIT`` more wait for a free worker, and
+anything beyond that is rejected straight away instead of piling up.
+"""
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+SCRAPE_CONCURRENCY = int(os.getenv("SCRAPE_CONCURRENCY", "2"))
+SCRAPE_QUEUE_LIMIT = int(os.getenv("SCRAPE_QUEUE_LIMIT", "8"))
+
+
+class ScrapeQueueFull(Exception):
+    pass
+
+
+class ScrapeExecutor:
+    def __init__(self, concurrency: int = SCRAPE_CONCURRENCY, queue_limit: int = SCRAPE_QUEUE_LIMIT) -> None:
+        self.concurrency = concurrency
+        self.queue_limit = queue_limit
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="scrape")
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    @property
+    def stats(self) -> dict:
+        with self._lock:
+            pending = self._pending
+        return {
+            "running": min(pending, self.concurrency),
+            "queued": max(pending - self.concurrency, 0),
+            "concurrency": self.concurrency,
+            "queue_limit": self.queue_limit,
+        }
+
+    async def run(self, func, *args, **kwargs):
+        with self._lock:
+            if self._pending >= self.concurrency + self.queue_limit:
+                raise ScrapeQueueFull(
+                    f"Scrape queue is full ({self.concurrency} running, {self.queue_limit} waiting)"
+                )
+            self._pending += 1
+        try:
+            future = self._executor.submit(partial(func, *args, **kwargs))
+        except Exception:
+            self._done(None)
+            raise
+        # Count the scrape until its thread finishes, even if the caller gives up waiting.
+        future.add_done_callback(self._done)
+        return await asyncio.wrap_future(future)
+
+    def _done(self, future) -> None:
+        with self._lock:
+            self._pending -= 1
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+_default_executor = None
+_default_executor_lock = threading.Lock()
+
+
+def get_executor() -> ScrapeExecutor:
+    global _default_executor
+    with _default_executor_lock:
+        if _default_executor is None:
+            _default_executor = ScrapeExecutor()
+        return _default_executor
@@ -0,0 +1,141 @@
+"""Declarative UI flows run step by step against an Appium session.
+
+A flow file in ``flows/`` holds a selector table and an ordered list of
+steps. Selectors are compiled once per flow: a bare content description
+becomes an accessibility-id lookup, class/description/text combinations
+become a UiAutomator selector, and only the rest fall back to XPath, with
+the shared parts of absolute paths written once as ``roots``. Each step
+names a selector, an action (``click``, ``type`` or ``pick``), what to wait
+for before acting (``clickable`` or ``present``), the ``StepWaiter``
+budget to wait within and how many times to retry. A step with
+``wait_gone`` also waits, after acting, until the element it acted on is
+gone, for steps whose next screen shows an element matching the same
+selector (two "Skip" screens in a row). Steps with ``when``
+only run when that parameter is given, so optional filters cost nothing
+unless they are used. A flow may also give a ``deep_link`` URL template
+that opens its end screen directly.
+"""
+import json
+import os
+from functools import lru_cache
+
+from appium.webdriver.common.appiumby import AppiumBy
+from selenium.common.exceptions import (
+    NoSuchElementException,
+    StaleElementReferenceException,
+    TimeoutException,
+)
+from selenium.webdriver.support import expected_conditions as EC
+
+from tracing import span
+
+FLOWS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "flows")
+
+RETRYABLE = (NoSuchElementException, StaleElementReferenceException, TimeoutException)
+
+
+def _quote(value: str) -> str:
+    return '"' + value.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def compile_selector(spec: dict, roots: dict) -> tuple[str, str]:
+    """Turn a selector definition into the cheapest Appium locator that expresses it."""
+    if "xpath" in spec:
+        return AppiumBy.XPATH, spec["xpath"].format(**roots)
+    if set(spec) == {"desc"}:
+        return AppiumBy.ACCESSIBILITY_ID, spec["desc"]
+    methods = {"class": "className", "desc": "description", "text": "text"}
+    chain = "".join(f".{methods[key]}({_quote(value)})" for key, value in spec.items())
+    return AppiumBy.ANDROID_UIAUTOMATOR, f"new UiSelector(){chain}"
+
+
+class Flow:
+    def __init__(self, name: str, selectors: dict, steps: list[dict], deep_link: str | None = None) -> None:
+        self.name = name
+        self.selectors = selectors
+        self.steps = steps
+        self.deep_link = deep_link
+
+    def locator(self, selector: str, params: dict | None = None) -> tuple[str, str]:
+        by, value = self.selectors[selector]
+        # Selectors may name a parameter, e.g. the project type to tap.
+        return by, value.format(**params) if params and "{" in value else value
+
+    def xpath(self, selector: str) -> str:
+        by, value = self.selectors[selector]
+        if by != AppiumBy.XPATH:
+            raise ValueError(f"Selector '{selector}' of flow '{self.name}' is not an XPath")
+        return value
+
+
+def build_flow(name: str, definition: dict) -> Flow:
+    roots = {}
+    for root, path in definition.get("roots", {}).items():
+        roots[root] = path.format(**roots)
+    selectors = {
+        selector: compile_selector(spec, roots) for selector, spec in definition["selectors"].items()
+    }
+    for step in definition["steps"]:
+        for key in ("selector", "options"):
+            if key in step and step[key] not in selectors:
+                raise ValueError(f"Step '{step['name']}' of flow '{name}' uses unknown selector '{step[key]}'")
+    return Flow(name, selectors, definition["steps"], definition.get("deep_link"))
+
+
+@lru_cache(maxsize=None)
+def load_flow(name: str) -> Flow:
+    with open(os.path.join(FLOWS_DIR, f"{name}.json"), encoding="utf-8") as f:
+        return build_flow(name, json.load(f))
+
+
+def run_step(driver, waiter, flow: Flow, step: dict, params: dict) -> None:
+    budget = step.get("budget", "navigate")
+    locator = flow.locator(step["selector"], params)
+    if step.get("wait", "clickable") == "clickable":
+        element = waiter.clickable(budget, locator)
+    else:
+        element = waiter.present(budget, locator)
+
+    action = step.get("action", "click")
+    if action == "click":
+        element.click()
+    elif action == "type":
+        if step.get("focus"):
+            element.click()
+        element.send_keys(step["value"].format(**params))
+        if step.get("hide_keyboard"):
+            driver.hide_keyboard()
+    elif action == "pick":
+        # Open a dropdown and tap its n-th option.
+        element.click()
+        options = waiter.present(budget, flow.locator(step["options"]))
+        position = int(step["option"].format(**params)) + step.get("option_offset", 0)
+        options.find_element(AppiumBy.XPATH, f"./*[{position}]").click()
+        if step.get("back"):
+            driver.back()
+    else:
+        raise ValueError(f"Unknown action '{action}' in step '{step['name']}'")
+    if step.get("wait_gone"):
+        # Until then the old screen is still up, and its element would be found again.
+        waiter.until(budget, EC.staleness_of(element))
+
+
+def run_flow(driver, waiter, flow: Flow, params: dict) -> None:
+    """Run every step of ``flow`` whose ``when`` parameter, if any, is set in ``params``."""
+    number = 0
+    for step in flow.steps:
+        if step.get("when") and params.get(step["when"]) is None:
+            continue
+        number += 1
+        print(f"Step {number}: {step['label'].format(**params)}...")
+        attempts = step.get("retries", 0) + 1
+        with span(step["name"], "step", flow=flow.name) as step_span:
+            for attempt in range(1, attempts + 1):
+                try:
+                    run_step(driver, waiter, flow, step, params)
+                    break
+                except RETRYABLE as e:
+                    if attempt == attempts:
+                        raise
+                    print(f"Retrying step '{step['name']}' ({attempt}/{attempts - 1}): {str(e).strip()}")
+            step_span.attributes["attempts"] = attempt
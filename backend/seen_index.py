@@ -0,0 +1,118 @@
+"""Persistent index of listings already scraped, per search.
+
+Every scraped listing is recorded here (in SQLite, so it survives
+restarts) under its search: location, price range and filters, as
+``result_cache.search_key`` puts them. An "only new" search hands
+``search_listings`` a matcher built from this index: a results-list card
+whose visible texts contain the price and details of a listing already seen
+by the same search is skipped without being opened, and the run stops after
+a streak of such cards, since results come newest first. Another price range
+or other filters in the same city is another search, with nothing known yet.
+
+Listings not seen again for ``SEEN_MAX_AGE`` seconds are dropped, and beyond
+``SEEN_MAX_ENTRIES`` the least recently seen are.
+"""
+import os
+import sqlite3
+import threading
+import time
+from functools import partial
+
+from result_cache import search_key
+
+SEEN_INDEX_PATH = os.getenv(
+    "SEEN_INDEX_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "seen_listings.db")
+)
+# Consecutive known cards after which an "only new" run stops.
+STOP_AFTER_KNOWN = int(os.getenv("SEEN_STOP_AFTER", "5"))
+SEEN_MAX_AGE_SECONDS = float(os.getenv("SEEN_MAX_AGE", str(90 * 86400)))
+SEEN_MAX_ENTRIES = int(os.getenv("SEEN_MAX_ENTRIES", "200000"))
+
+
+class SeenIndex:
+    def __init__(
+        self, path: str = SEEN_INDEX_PATH, max_age: float = SEEN_MAX_AGE_SECONDS, max_entries: int = SEEN_MAX_ENTRIES
+    ) -> None:
+        self.path = path
+        self.max_age = max_age
+        self.max_entries = max_entries
+        self._db = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        # Called with the lock held; the file is only created once it is used.
+        if self._db is None:
+            self._db = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            # Other API workers may write to the same file.
+            self._db.execute("PRAGMA journal_mode=WAL")
+            # Listings of the index keyed by location alone cannot be told
+            # apart by price range; those searches start over.
+            self._db.execute("DROP TABLE IF EXISTS seen")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS seen_listings ("
+                "search TEXT NOT NULL, price TEXT NOT NULL, details TEXT NOT NULL, phone TEXT, "
+                "first_seen REAL NOT NULL, last_seen REAL NOT NULL, PRIMARY KEY (search, price, details))"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS seen_listings_last_seen ON seen_listings (last_seen)")
+            self._db.commit()
+        return self._db
+
+    @property
+    def stats(self) -> dict:
+        with self._lock:
+            return {"listings": self._connect().execute("SELECT COUNT(*) FROM seen_listings").fetchone()[0]}
+
+    def record(
+        self, location, min_price: int, max_price: int, listings: list[dict], filters: dict | None = None
+    ) -> None:
+        """Record the listings a search scraped, then drop those too old or beyond ``max_entries``."""
+        now = time.time()
+        search = search_key(location, min_price, max_price, filters)
+        rows = [(search, listing["price"], listing["details"], listing.get("phone"), now, now) for listing in listings]
+        with self._lock:
+            db = self._connect()
+            db.executemany(
+                "INSERT INTO seen_listings VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (search, price, details) DO UPDATE SET last_seen = excluded.last_seen",
+                rows,
+            )
+            db.execute("DELETE FROM seen_listings WHERE last_seen < ?", (now - self.max_age,))
+            db.execute(
+                "DELETE FROM seen_listings WHERE rowid IN "
+                "(SELECT rowid FROM seen_listings ORDER BY last_seen DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            db.commit()
+
+    def known(self, search: str, card_texts: list[str]) -> bool:
+        """Whether a card showing ``card_texts`` is a listing already seen by ``search`` (a ``search_key``)."""
+        candidates = set(card_texts)
+        if not candidates:
+            return False
+        with self._lock:
+            rows = self._connect().execute(
+                f"SELECT details FROM seen_listings WHERE search = ? AND price IN ({', '.join('?' * len(candidates))})",
+                (search, *candidates),
+            ).fetchall()
+        return any(details in candidates for (details,) in rows)
+
+    def matcher(self, location, min_price: int, max_price: int, filters: dict | None = None):
+        return partial(self.known, search_key(location, min_price, max_price, filters))
+
+    def close(self) -> None:
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+_default_index = None
+_default_index_lock = threading.Lock()
+
+
+def get_seen_index() -> SeenIndex:
+    global _default_index
+    with _default_index_lock:
+        if _default_index is None:
+            _default_index = SeenIndex()
+        return _default_index
@@ -0,0 +1,303 @@
+"""Conversation sessions of the chat API, bounded and optionally persistent.
+
+A session holds the agent's ``previous_response_id`` and its run context.
+Sessions idle for more than ``ttl`` seconds expire and the least recently
+used are dropped beyond ``max_entries``. Set ``SESSION_STORE_PATH`` to keep
+them in SQLite, across restarts and shared by every worker process.
+
+Scrape results are too large to copy into each context, so tools store them
+once with ``put_payload`` and keep the returned key in the context under a
+name ending in ``_ref``. Payloads are keyed by content, so conversations
+served the same cached result share one copy, and a payload is deleted once
+no session refers to it. One stored but not referenced by a saved session
+yet is kept for ``PAYLOAD_GRACE_SECONDS``, the time its turn has to finish.
+
+Turns of one conversation are serialized with ``lock``; different
+conversations never wait for each other. That lock only holds within one
+process, so with several workers two turns of a conversation may still run
+at once. Each saved session carries a ``version``, and ``put`` only
+replaces the version its turn loaded: the turn that saves second gets
+``SessionConflict`` instead of silently overwriting the other.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import weakref
+from collections import Counter, OrderedDict
+
+SESSION_TTL_SECONDS = float(os.getenv("SESSION_TTL", "86400"))
+SESSION_MAX_ENTRIES = int(os.getenv("SESSION_MAX_ENTRIES", "1000"))
+SESSION_STORE_PATH = os.getenv("SESSION_STORE_PATH")
+PAYLOAD_GRACE_SECONDS = float(os.getenv("SESSION_PAYLOAD_GRACE", "600"))
+REF_SUFFIX = "_ref"
+
+
+class SessionConflict(Exception):
+    pass
+
+
+def new_session() -> dict:
+    return {"previous_response_id": None, "context": {}, "version": 0}
+
+
+def payload_refs(session: dict) -> set[str]:
+    context = session.get("context") or {}
+    return {value for key, value in context.items() if key.endswith(REF_SUFFIX) and isinstance(value, str)}
+
+
+class MemoryBackend:
+    def __init__(self) -> None:
+        # Sessions in the order they were saved, so by ``used_at``: least
+        # recently used on the left. Reads do not reorder them, as they do
+        # not refresh ``used_at`` either.
+        self._sessions = OrderedDict()
+        self._refs = {}
+        self._ref_counts = Counter()
+        self._payloads = {}
+
+    def get(self, conversation_id: str) -> dict | None:
+        return self._sessions.get(conversation_id)
+
+    def put(self, conversation_id: str, entry: dict, expected_version: int) -> bool:
+        current = self._sessions.get(conversation_id)
+        if current is not None and current["version"] != expected_version:
+            return False
+        refs = payload_refs(entry["session"])
+        self._ref_counts.subtract(self._refs.get(conversation_id, ()))
+        self._ref_counts.update(refs)
+        self._refs[conversation_id] = refs
+        for key in refs:
+            if key in self._payloads:
+                self._payloads[key]["pending"] = False
+        self._sessions[conversation_id] = {**entry, "version": expected_version + 1}
+        self._sessions.move_to_end(conversation_id)
+        return True
+
+    def delete(self, conversation_id: str) -> None:
+        self._sessions.pop(conversation_id, None)
+        self._ref_counts.subtract(self._refs.pop(conversation_id, ()))
+
+    def trim(self, max_entries: int) -> int:
+        evicted = 0
+        while len(self._sessions) > max_entries:
+            self.delete(next(iter(self._sessions)))
+            evicted += 1
+        return evicted
+
+    def expire(self, before: float) -> int:
+        expired = 0
+        # Oldest first, so the scan stops at the first live session.
+        while self._sessions and next(iter(self._sessions.values()))["used_at"] < before:
+            self.delete(next(iter(self._sessions)))
+            expired += 1
+        return expired
+
+    def get_payload(self, key: str):
+        entry = self._payloads.get(key)
+        return entry["payload"] if entry is not None else None
+
+    def put_payload(self, key: str, payload) -> None:
+        self._payloads[key] = {"stored_at": time.time(), "pending": True, "payload": payload}
+
+    def collect(self, before: float) -> int:
+        unused = [
+            key
+            for key, entry in self._payloads.items()
+            if self._ref_counts[key] <= 0 and (not entry["pending"] or entry["stored_at"] < before)
+        ]
+        for key in unused:
+            del self._payloads[key]
+        self._ref_counts = +self._ref_counts
+        return len(unused)
+
+    def counts(self) -> tuple[int, int]:
+        return len(self._sessions), len(self._payloads)
+
+
+class SqliteBackend:
+    def __init__(self, path: str) -> None:
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "id TEXT PRIMARY KEY, session TEXT NOT NULL, used_at REAL NOT NULL, version INTEGER NOT NULL DEFAULT 0)"
+        )
+        if "version" not in {row[1] for row in self._db.execute("PRAGMA table_info(sessions)")}:
+            # Stores created before sessions were versioned.
+            self._db.execute("ALTER TABLE sessions ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS session_refs ("
+            "session_id TEXT NOT NULL, payload_key TEXT NOT NULL, PRIMARY KEY (session_id, payload_key))"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS session_refs_payload ON session_refs (payload_key)")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS payloads ("
+            "key TEXT PRIMARY KEY, stored_at REAL NOT NULL, pending INTEGER NOT NULL, payload TEXT NOT NULL)"
+        )
+        self._db.commit()
+
+    def get(self, conversation_id: str) -> dict | None:
+        row = self._db.execute(
+            "SELECT session, used_at, version FROM sessions WHERE id = ?", (conversation_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        return {"session": json.loads(row[0]), "used_at": row[1], "version": row[2]}
+
+    def put(self, conversation_id: str, entry: dict, expected_version: int) -> bool:
+        refs = payload_refs(entry["session"])
+        session = json.dumps(entry["session"], ensure_ascii=False)
+        with self._db:
+            # Compare and swap: only the version the turn loaded is replaced; a
+            # session deleted meanwhile (expired, evicted) is written anew.
+            saved = self._db.execute(
+                "UPDATE sessions SET session = ?, used_at = ?, version = ? WHERE id = ? AND version = ?",
+                (session, entry["used_at"], expected_version + 1, conversation_id, expected_version),
+            ).rowcount or self._db.execute(
+                "INSERT OR IGNORE INTO sessions VALUES (?, ?, ?, ?)",
+                (conversation_id, session, entry["used_at"], expected_version + 1),
+            ).rowcount
+            if not saved:
+                return False
+            self._db.execute("DELETE FROM session_refs WHERE session_id = ?", (conversation_id,))
+            self._db.executemany("INSERT INTO session_refs VALUES (?, ?)", [(conversation_id, key) for key in refs])
+            self._db.executemany("UPDATE payloads SET pending = 0 WHERE key = ?", [(key,) for key in refs])
+        return True
+
+    def delete(self, conversation_id: str) -> None:
+        with self._db:
+            self._db.execute("DELETE FROM sessions WHERE id = ?", (conversation_id,))
+            self._db.execute("DELETE FROM session_refs WHERE session_id = ?", (conversation_id,))
+
+    def _delete_where(self, condition: str, params: tuple) -> int:
+        with self._db:
+            cursor = self._db.execute(f"DELETE FROM sessions WHERE {condition}", params)
+            self._db.execute("DELETE FROM session_refs WHERE session_id NOT IN (SELECT id FROM sessions)")
+        return cursor.rowcount
+
+    def trim(self, max_entries: int) -> int:
+        return self._delete_where(
+            "id NOT IN (SELECT id FROM sessions ORDER BY used_at DESC LIMIT ?)", (max_entries,)
+        )
+
+    def expire(self, before: float) -> int:
+        return self._delete_where("used_at < ?", (before,))
+
+    def get_payload(self, key: str):
+        row = self._db.execute("SELECT payload FROM payloads WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+    def put_payload(self, key: str, payload) -> None:
+        with self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO payloads VALUES (?, ?, 1, ?)",
+                (key, time.time(), json.dumps(payload, ensure_ascii=False)),
+            )
+
+    def collect(self, before: float) -> int:
+        with self._db:
+            cursor = self._db.execute(
+                "DELETE FROM payloads WHERE (pending = 0 OR stored_at < ?) "
+                "AND key NOT IN (SELECT payload_key FROM session_refs)",
+                (before,),
+            )
+        return cursor.rowcount
+
+    def counts(self) -> tuple[int, int]:
+        return (
+            self._db.execute("SELECT COUNT(*) FROM sessions").fetchone()[0],
+            self._db.execute("SELECT COUNT(*) FROM payloads").fetchone()[0],
+        )
+
+
+class SessionStore:
+    def __init__(
+        self,
+        ttl: float = SESSION_TTL_SECONDS,
+        max_entries: int = SESSION_MAX_ENTRIES,
+        path: str | None = SESSION_STORE_PATH,
+    ) -> None:
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._backend = SqliteBackend(path) if path else MemoryBackend()
+        self._counters = {"created": 0, "expired": 0, "evicted": 0, "payloads_collected": 0, "conflicts": 0}
+        self._lock = threading.Lock()
+        # Conversation locks only live while a turn holds or waits for them.
+        self._turn_locks = weakref.WeakValueDictionary()
+
+    @property
+    def stats(self) -> dict:
+        with self._lock:
+            sessions, payloads = self._backend.counts()
+            return {
+                **self._counters,
+                "sessions": sessions,
+                "payloads": payloads,
+                "ttl": self.ttl,
+                "max_entries": self.max_entries,
+            }
+
+    def lock(self, conversation_id: str) -> asyncio.Lock:
+        """The lock a turn of ``conversation_id`` holds from loading its session to saving it."""
+        with self._lock:
+            lock = self._turn_locks.get(conversation_id)
+            if lock is None:
+                lock = asyncio.Lock()
+                self._turn_locks[conversation_id] = lock
+            return lock
+
+    def get(self, conversation_id: str) -> dict:
+        """The session of ``conversation_id``; a new one if it is unknown or expired."""
+        with self._lock:
+            entry = self._backend.get(conversation_id)
+            if entry is not None and time.time() - entry["used_at"] > self.ttl:
+                self._backend.delete(conversation_id)
+                self._counters["expired"] += 1
+                entry = None
+            if entry is None:
+                self._counters["created"] += 1
+                return new_session()
+            return {**entry["session"], "version": entry["version"]}
+
+    def put(self, conversation_id: str, session: dict) -> None:
+        """Save ``session``; ``SessionConflict`` if another turn saved it since it was loaded."""
+        version = session.get("version", 0)
+        with self._lock:
+            # Taken under the lock, so saves are in ``used_at`` order.
+            now = time.time()
+            if not self._backend.put(conversation_id, {"session": session, "used_at": now}, version):
+                self._counters["conflicts"] += 1
+                raise SessionConflict(f"Conversation {conversation_id} was updated by another request")
+            session["version"] = version + 1
+            self._counters["expired"] += self._backend.expire(now - self.ttl)
+            self._counters["evicted"] += self._backend.trim(self.max_entries)
+            self._counters["payloads_collected"] += self._backend.collect(now - PAYLOAD_GRACE_SECONDS)
+
+    def put_payload(self, payload) -> str:
+        """Store ``payload`` (JSON-serializable) once and return its key."""
+        key = hashlib.sha1(json.dumps(payload, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+        with self._lock:
+            self._backend.put_payload(key, payload)
+        return key
+
+    def get_payload(self, key: str | None):
+        if key is None:
+            return None
+        with self._lock:
+            return self._backend.get_payload(key)
+
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+
+def get_session_store() -> SessionStore:
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = SessionStore()
+        return _default_store
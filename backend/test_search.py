@@ -1,18 +1,341 @@
 from appium import webdriver
 from appium.options.android import UiAutomator2Options
 from appium.webdriver.common.appiumby import AppiumBy
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-import time
+from selenium.common.exceptions import TimeoutException
 import json
-import re
-
-APPIUM_ENDPOINT = "https://devicefarm-interactive-global.us-west-2.api.aws/remote-endpoint/WC1BbXotRGF0ZT0yMDI2MDExN1QxNTE3NDdaJlgtQW16LUNyZWRlbnRpYWw9QVNJQVFJSlJTRTc0QkhKNzVRVFklMkYyMDI2MDExNyUyRnVzLXdlc3QtMiUyRmRldmljZWZhcm0lMkZhd3M0X3JlcXVlc3QmWC1BbXotQWxnb3JpdGhtPUFXUzQtSE1BQy1TSEEyNTYmYXJuPWFybiUzQWF3cyUzQWRldmljZWZhcm0lM0F1cy13ZXN0LTIlM0EwMTc4MjA2OTA0MjQlM0FzZXNzaW9uJTNBNTU3ZWJlMjgtOWIzMS00ZGMyLTlmZWEtY2VkYjc2OTBmZmFlJTJGNTcwOWQ3NjUtMjQ5MC00MTllLTlhN2UtOWViZTU2NDQ2MDRlJTJGMDAwMDAmWC1BbXotU2lnbmVkSGVhZGVycz1ob3N0JlgtQW16LVNpZ25hdHVyZT1lNjdhZGY1YzIxNDE0NDM4MjE2ODI4NjQ4ZWJhZDNhM2NlYTgyZWJkYzEzN2MyNjZjMDMxMjljMzI1ZWM2ZTViJlgtQW16LVNlY3VyaXR5LVRva2VuPUZ3b0daWEl2WVhkekVMSCUyRiUyRiUyRiUyRiUyRiUyRiUyRiUyRiUyRiUyRndFYURLVjJOanVSTm5qYWlIZU9WQ0xUQXJCMWZta29ZTVZSUFJDcWRrdVRjUlN6Tk1PQkx5WGs3MDFtQlZiSTZ2Q2gyNkdHZ2Yycm8zeDA5JTJGUSUyRlRTNyUyQkY5cGJ1bDBQYng2QkwzJTJCQXYxOTBkemZ6WTBUckZJNzJwdXpLRHV3Ylk2M3FuZjN6Qkd6RXBMWTRYUkclMkZ1WlNnbHdjSXlBelF4JTJGdzhkcmtsQllGbjczZklKQkIxRXZEZ2JOZ1NEJTJGZCUyRmxYcG4xNTN5UGlUZVZXRUUlMkIzVmtlV0daOGxsM0pHSVVraEQ4QWJHa2hKeTJYaHhJYkV0WWhGY0RFcXklMkJiYTR3QmxYZEhkNUJPZUk4Wmh4RUJFOVNacUQ1Z3N4Y3dJdWlFY25kczRTeGE2JTJCcjhUbXBWalJMU2VLd2NCTUJCMFVieGVrYTk3d2F4Y1JRUlREcUVmdURmYW1DTVZ2RzVnR1hkbUQ1Mm83dHY2ZVNKQXJkV2hYNVlZa1VUSlJvYWdpVXE0UTRLdDJzJTJCN2RXU3BaU2dKZXRFNkZGWGcwdU02NVBUZyUyRjVJUWhyZ3NZZVNDSmZWZExuelpMbWZZZ1VEalZFdlBHNTZPcjhEZkRwM2N6Y0lvTTJFWEs5JTJCRXRPWVNpR3lhM0xCaktnQVNLdHlXc05UbjhiaDgwbDBEekNkamRiZmtvN1BtZFdnYVNLUHZsUWpNbXJTajlRM1Q2WnhQN0M4MHN4SzJFMUQ5b21RJTJGeXZEa050cEVGR1h3N1BtcSUyRjJvR2hRdk5Od1JJSmJMaURKWHglMkJuRzIlMkZNSldkTVlqQXp1OFVJRWRJdm53eUlNN3VBZTZvUnRyWkpJWHRDempwSGlIWWZkcDI3azZjWmRRJTJGVEZ4YiUyRnY3VjhxTnpMT0lSTEs3aUNIdGQ5T2xJaURuMHVxcnM0SkRPRmpuTkZDZFklM0QlN0NPVEF1TVRFMUxqRXlNeTQyT0ElM0QlM0Q"
+import os
+import tempfile
+import time
+import weakref
+from urllib.parse import quote
+
+from checkpoints import checkpoint_key, get_checkpoints
+from list_scroll import ResultsScroller
+from listing_parser import parse_listing
+from page_parser import best_phone, find_node, find_node_by, parse, parse_amount, text_at, texts
+from resilience import TRANSIENT_ERRORS, CircuitOpen, endpoint_of, get_breaker, retry_step
+from scrape_flow import load_flow, run_flow
+from seen_index import STOP_AFTER_KNOWN, get_seen_index
+from tracing import Tracer, span, traced_run, wrap_driver
+from waits import StepWaiter
+
+APPIUM_ENDPOINT = os.getenv(
+    "APPIUM_ENDPOINT",
+    "https://devicefarm-interactive-global.us-west-2.api.aws/remote-endpoint/WC1BbXotRGF0ZT0yMDI2MDExN1QxNTE3NDdaJlgtQW16LUNyZWRlbnRpYWw9QVNJQVFJSlJTRTc0QkhKNzVRVFklMkYyMDI2MDExNyUyRnVzLXdlc3QtMiUyRmRldmljZWZhcm0lMkZhd3M0X3JlcXVlc3QmWC1BbXotQWxnb3JpdGhtPUFXUzQtSE1BQy1TSEEyNTYmYXJuPWFybiUzQWF3cyUzQWRldmljZWZhcm0lM0F1cy13ZXN0LTIlM0EwMTc4MjA2OTA0MjQlM0FzZXNzaW9uJTNBNTU3ZWJlMjgtOWIzMS00ZGMyLTlmZWEtY2VkYjc2OTBmZmFlJTJGNTcwOWQ3NjUtMjQ5MC00MTllLTlhN2UtOWViZTU2NDQ2MDRlJTJGMDAwMDAmWC1BbXotU2lnbmVkSGVhZGVycz1ob3N0JlgtQW16LVNpZ25hdHVyZT1lNjdhZGY1YzIxNDE0NDM4MjE2ODI4NjQ4ZWJhZDNhM2NlYTgyZWJkYzEzN2MyNjZjMDMxMjljMzI1ZWM2ZTViJlgtQW16LVNlY3VyaXR5LVRva2VuPUZ3b0daWEl2WVhkekVMSCUyRiUyRiUyRiUyRiUyRiUyRiUyRiUyRiUyRiUyRndFYURLVjJOanVSTm5qYWlIZU9WQ0xUQXJCMWZta29ZTVZSUFJDcWRrdVRjUlN6Tk1PQkx5WGs3MDFtQlZiSTZ2Q2gyNkdHZ2Yycm8zeDA5JTJGUSUyRlRTNyUyQkY5cGJ1bDBQYng2QkwzJTJCQXYxOTBkemZ6WTBUckZJNzJwdXpLRHV3Ylk2M3FuZjN6Qkd6RXBMWTRYUkclMkZ1WlNnbHdjSXlBelF4JTJGdzhkcmtsQllGbjczZklKQkIxRXZEZ2JOZ1NEJTJGZCUyRmxYcG4xNTN5UGlUZVZXRUUlMkIzVmtlV0daOGxsM0pHSVVraEQ4QWJHa2hKeTJYaHhJYkV0WWhGY0RFcXklMkJiYTR3QmxYZEhkNUJPZUk4Wmh4RUJFOVNacUQ1Z3N4Y3dJdWlFY25kczRTeGE2JTJCcjhUbXBWalJMU2VLd2NCTUJCMFVieGVrYTk3d2F4Y1JRUlREcUVmdURmYW1DTVZ2RzVnR1hkbUQ1Mm83dHY2ZVNKQXJkV2hYNVlZa1VUSlJvYWdpVXE0UTRLdDJzJTJCN2RXU3BaU2dKZXRFNkZGWGcwdU02NVBUZyUyRjVJUWhyZ3NZZVNDSmZWZExuelpMbWZZZ1VEalZFdlBHNTZPcjhEZkRwM2N6Y0lvTTJFWEs5JTJCRXRPWVNpR3lhM0xCaktnQVNLdHlXc05UbjhiaDgwbDBEekNkamRiZmtvN1BtZFdnYVNLUHZsUWpNbXJTajlRM1Q2WnhQN0M4MHN4SzJFMUQ5b21RJTJGeXZEa050cEVGR1h3N1BtcSUyRjJvR2hRdk5Od1JJSmJMaURKWHglMkJuRzIlMkZNSldkTVlqQXp1OFVJRWRJdm53eUlNN3VBZTZvUnRyWkpJWHRDempwSGlIWWZkcDI3azZjWmRRJTJGVEZ4YiUyRnY3VjhxTnpMT0lSTEs3aUNIdGQ5T2xJaURuMHVxcnM0SkRPRmpuTkZDZFklM0QlN0NPVEF1TVRFMUxqRXlNeTQyT0ElM0QlM0Q",
+)
 
 APP_PACKAGE = "com.seloger.android"
 
+SEARCH_FLOW = load_flow("search")
+PRICE_XPATH = SEARCH_FLOW.xpath("price")
+DETAILS_XPATH = SEARCH_FLOW.xpath("details")
+CALL_BUTTON_XPATH = SEARCH_FLOW.xpath("call_button")
+
+# How the results screen is reached: "auto", "deeplink" or "ui" (see navigate_to_results).
+# The deep link template of flows/search.json is not verified against the app,
+# which may open the results while ignoring its location and price; until it
+# is, the form is the default.
+NAVIGATION = os.getenv("SEARCH_NAVIGATION", "ui")
+# Seconds "auto" navigation keeps to the search form after a deep link failed.
+DEEP_LINK_RETRY_AFTER = float(os.getenv("DEEP_LINK_RETRY_AFTER", "3600"))
+_deep_link_failed_at = None
+
+# Seconds Appium keeps an idle session alive; pooled sessions sit idle between searches.
+NEW_COMMAND_TIMEOUT = 300
+
+# Back presses tried to return to the results list before the search is re-run.
+RECOVERY_BACK_PRESSES = 3
+
+# Sessions already known to have the app installed (pooled drivers are reused).
+_verified_drivers = weakref.WeakSet()
+
+
+def create_driver(endpoint=None):
+    options = UiAutomator2Options()
+    options.platform_name = "Android"
+    options.automation_name = "UiAutomator2"
+    options.new_command_timeout = NEW_COMMAND_TIMEOUT
+
+    return webdriver.Remote(
+        command_executor=endpoint or APPIUM_ENDPOINT,
+        options=options
+    )
+
+
+# Typed fields that identify a listing once its labels are parsed.
+SIGNATURE_FIELDS = ("amount", "rooms", "bedrooms", "surface", "floor", "phone_e164")
+
+
+def listing_signature(listing):
+    # Parsed fields ignore spacing and formatting differences between labels;
+    # listings without a parsed surface (or scraped before parsing) use the raw texts.
+    if listing.get("surface") is not None:
+        return "|".join(str(listing.get(field)) for field in SIGNATURE_FIELDS)
+    return f"{listing['price']}|{listing['details']}|{listing['phone']}"
+
+
+def price_in_range(card_texts, min_price, max_price):
+    """Whether a results-list card can match, judged from the price shown on it."""
+    for text in card_texts:
+        amount = parse_amount(text)
+        if amount is not None:
+            return min_price <= amount <= max_price
+    return True
+
+
+def wait_for_results(waiter, step):
+    """Wait until the results list shows its first card or the app says nothing matched.
+
+    Returns whether the list has cards; an empty list is a normal outcome,
+    not a timeout.
+    """
+    first_card = f"{SEARCH_FLOW.xpath('cards_container')}/*[1]"
+    no_results = SEARCH_FLOW.locator("no_results")
+    root = waiter.page(
+        step, lambda root: find_node(root, first_card) is not None or find_node_by(root, *no_results) is not None
+    )
+    if find_node(root, first_card) is None:
+        print("No listings match the search.")
+        return False
+    return True
+
+
+def deep_link_url(location, min_price, max_price):
+    template = os.getenv("SEARCH_DEEP_LINK", SEARCH_FLOW.deep_link)
+    return template.format(location=quote(str(location)), min_price=min_price, max_price=max_price)
 
-def search_listings(location, min_price, max_price, max_listings):
+
+def open_results_by_deep_link(driver, waiter, location, min_price, max_price):
+    """Launch the app on the results screen; return False if it did not get there."""
+    global _deep_link_failed_at
+    url = deep_link_url(location, min_price, max_price)
+    print(f"Opening results via deep link: {url}")
+    try:
+        with span("deep_link", "step"):
+            driver.execute_script("mobile: deepLink", {"url": url, "package": APP_PACKAGE})
+            wait_for_results(waiter, "deeplink")
+        return True
+    except Exception as e:
+        print(f"✗ Deep link did not reach the results: {str(e).strip()}")
+        _deep_link_failed_at = time.monotonic()
+        try:
+            driver.terminate_app(APP_PACKAGE)
+        except Exception:
+            pass
+        return False
+
+
+def navigate_to_results(driver, waiter, location, min_price, max_price, filters=None, navigation=NAVIGATION):
+    """Start the app fresh and bring it to the first results card.
+
+    ``navigation`` is "deeplink" (open the results straight from a deep
+    link), "ui" (fill in the search form step by step) or "auto": the deep
+    link first, falling back to the form if it fails. Optional filters are
+    only reachable through the form, and "auto" stops trying deep links for
+    ``DEEP_LINK_RETRY_AFTER`` seconds after one failed. A deep link is
+    accepted as soon as the results list shows, without checking that its
+    location and price were applied, so "deeplink" and "auto" are opt-in
+    (``SEARCH_NAVIGATION``). Returns the path that was used.
+    """
+    # Close any existing instance of the app
+    print("Closing any existing app instances...")
+    try:
+        driver.terminate_app(APP_PACKAGE)
+        print("Closed existing app instance")
+    except Exception as e:
+        print(f"No existing instance to close or error: {str(e)}")
+
+    deep_link_cooling = (
+        _deep_link_failed_at is not None and time.monotonic() - _deep_link_failed_at < DEEP_LINK_RETRY_AFTER
+    )
+    if navigation == "deeplink" or (navigation == "auto" and not filters and not deep_link_cooling):
+        if open_results_by_deep_link(driver, waiter, location, min_price, max_price):
+            return "deeplink"
+        if navigation == "deeplink":
+            raise RuntimeError("Deep link did not open the results screen")
+
+    print(f"Launching fresh instance of {APP_PACKAGE}...")
+    driver.activate_app(APP_PACKAGE)
+    print("App launched successfully!")
+
+    # Fill in the search form; optional filter steps only run when given.
+    run_flow(driver, waiter, SEARCH_FLOW, {
+        **(filters or {}),
+        "location": location,
+        "min_price": min_price,
+        "max_price": max_price,
+    })
+
+    # Wait for the first card (or ad) to be rendered in the results list, or the empty-state message
+    wait_for_results(waiter, "results")
+    return "ui"
+
+
+def recover_results(driver, waiter, first_card_xpath, renavigate):
+    """Bring the app back to the results list after a failed step; return the list's page tree.
+
+    A card or contact sheet left open is closed with back presses; only if
+    the list does not show up after ``RECOVERY_BACK_PRESSES`` of them is the
+    search run again with ``renavigate``.
+    """
+    on_results = lambda root: find_node(root, first_card_xpath) is not None
+    with span("recover", "step"):
+        for _ in range(RECOVERY_BACK_PRESSES):
+            root = parse(driver.page_source)
+            if on_results(root):
+                return root
+            driver.back()
+            try:
+                return waiter.page("recover", on_results)
+            except TimeoutException:
+                continue
+        print("✗ Results list lost; running the search again.")
+        renavigate()
+        return waiter.page("results", on_results)
+
+
+def scraped_card(card_texts, listings):
+    """Whether a results-list card shows one of ``listings``."""
+    shown = set(card_texts)
+    return any(listing["price"] in shown and listing["details"] in shown for listing in listings)
+
+
+def extract_with_elements(driver, waiter):
+    """Read price, details and phone with one remote lookup per element."""
+    price = "N/A"
+    details = "N/A"
+    phone_number = "N/A"
+
+    # Price (its presence also tells us the listing page is ready)
+    try:
+        price = waiter.present("card", (AppiumBy.XPATH, PRICE_XPATH)).text
+        print(f"✓ Price: {price}")
+    except Exception:
+        print("✗ Could not find price element.")
+
+    # Details string (rooms, bedrooms, area, floor)
+    try:
+        details = driver.find_element(AppiumBy.XPATH, DETAILS_XPATH).text
+        print(f"✓ Details: {details}")
+    except Exception:
+        print("✗ Could not find details element.")
+
+    # Contact phone number
+    try:
+        call_button = driver.find_element(AppiumBy.XPATH, CALL_BUTTON_XPATH)
+        call_button.click()
+        # The contact sheet animates in; read it once it stops changing.
+        waiter.settle("call")
+        try:
+            phone_elements = driver.find_elements(AppiumBy.XPATH, '//*[@text!=""]')
+            best_match = best_phone([element.text for element in phone_elements])
+            if best_match:
+                phone_number = best_match
+                print(f"✓ Phone: {phone_number}")
+            else:
+                print("✗ Could not find phone element with a number.")
+        except Exception as e:
+            print(f"✗ Could not find phone element: {str(e)}")
+        try:
+            driver.find_element(AppiumBy.XPATH, CALL_BUTTON_XPATH)
+        except Exception:
+            driver.back()
+            waiter.present("back", (AppiumBy.XPATH, CALL_BUTTON_XPATH))
+    except Exception as e:
+        print(f"✗ Could not click Call button: {str(e)}")
+
+    return price, details, phone_number
+
+
+def extract_from_page_source(driver, waiter):
+    """Read price, details and phone from page sources parsed locally.
+
+    Costs one page-source fetch for the listing screen and one (plus the
+    stability check) for the contact sheet, whatever the number of fields.
+    """
+    price = "N/A"
+    details = "N/A"
+    phone_number = "N/A"
+
+    try:
+        page = waiter.page("card", lambda root: find_node(root, PRICE_XPATH) is not None)
+    except Exception:
+        print("✗ Could not find price element.")
+        return price, details, phone_number
+
+    price = text_at(page, PRICE_XPATH) or "N/A"
+    details = text_at(page, DETAILS_XPATH) or "N/A"
+    print(f"✓ Price: {price}")
+    print(f"✓ Details: {details}" if details != "N/A" else "✗ Could not find details element.")
+
+    if find_node(page, CALL_BUTTON_XPATH) is None:
+        print("✗ Could not find Call button.")
+        return price, details, phone_number
+
+    try:
+        driver.find_element(AppiumBy.XPATH, CALL_BUTTON_XPATH).click()
+        sheet = parse(waiter.settle("call"))
+        best_match = best_phone(texts(sheet))
+        if best_match:
+            phone_number = best_match
+            print(f"✓ Phone: {phone_number}")
+        else:
+            print("✗ Could not find phone element with a number.")
+        if find_node(sheet, CALL_BUTTON_XPATH) is None:
+            driver.back()
+            waiter.present("back", (AppiumBy.XPATH, CALL_BUTTON_XPATH))
+    except Exception as e:
+        print(f"✗ Could not click Call button: {str(e)}")
+
+    return price, details, phone_number
+
+
+@traced_run("search_listings")
+def search_listings(
+    location,
+    min_price,
+    max_price,
+    max_listings,
+    budgets=None,
+    extraction="page_source",
+    pool=None,
+    on_listing=None,
+    cancel=None,
+    known=None,
+    stop_after_known=STOP_AFTER_KNOWN,
+    filters=None,
+    navigation=NAVIGATION,
+    run_id=None,
+):
+    """Run one SeLoger search and scrape up to ``max_listings`` listings.
+
+    With ``pool``, the driver is checked out of a ``DevicePool`` and handed
+    back warm afterwards instead of creating and quitting a session.
+    ``on_listing`` is called with each listing as soon as it is scraped, and
+    setting the ``cancel`` event stops the run before the next card.
+    With ``known``, a callable taking a card's texts, cards it recognises
+    are skipped without being opened, and the run stops after
+    ``stop_after_known`` of them in a row. ``filters`` turns on the optional
+    steps of ``flows/search.json`` (rooms, bedrooms, areas, project type).
+    ``navigation`` picks how the results screen is reached, see
+    ``navigate_to_results``. ``trace`` takes a ``tracing.Tracer`` to record
+    the run into. ``exhausted`` is set when the run read the results list
+    to its end, every card on it, so the listings are all that match.
+
+    Steps that fail on the device are retried with backoff, against the
+    circuit breaker of the session's endpoint (see ``resilience``). After a
+    failed card the app is brought back to the results list, with back
+    presses or, failing those, by running the search again, and the run goes
+    on. A run that still fails returns the listings it had scraped, with its
+    ``error``, ``circuit_open`` when the breaker is what stopped it, and
+    ``transient`` when a device or network error did, one a later attempt
+    may get past.
+    With ``run_id``, each listing is checkpointed under that run (see
+    ``checkpoints``), and a later call with the same ``run_id`` and search,
+    a retry of a failed attempt, starts from the listings it had, reported
+    as ``resumed``.
+    """
+    session = None
     driver = None
     listings_data = []
     result = {
@@ -22,408 +345,164 @@ def search_listings(location, min_price, max_price, max_listings):
         "requested": max_listings,
         "listings": listings_data,
     }
+    if cancel is not None and cancel.is_set():
+        result["cancelled"] = True
+        result["scraped"] = 0
+        return result
+    checkpoints = get_checkpoints() if run_id is not None else None
+    key = checkpoint_key(run_id, location, min_price, max_price, filters) if checkpoints is not None else None
+    resumed = checkpoints.load(key)[:max_listings] if checkpoints is not None else []
+    if resumed:
+        result["resumed"] = len(resumed)
+        print(f"Resuming after {len(resumed)} listings scraped before the last attempt failed.")
     try:
-        options = UiAutomator2Options()
-        options.platform_name = "Android"
-        options.automation_name = "UiAutomator2"
-
-        driver = webdriver.Remote(
-            command_executor=APPIUM_ENDPOINT,
-            options=options
-        )
-
-        wait = WebDriverWait(driver, 15)
+        if len(resumed) >= max_listings:
+            # Nothing left to scrape.
+            listings_data.extend(resumed)
+            if on_listing is not None:
+                for listing in resumed:
+                    on_listing(listing)
+            checkpoints.clear(key)
+            result["scraped"] = len(listings_data)
+            return result
+        session = pool.checkout() if pool is not None else create_driver()
+        # Every remote command is recorded when a trace is active.
+        driver = wrap_driver(session)
+        breaker = get_breaker(endpoint_of(session))
+
+        # Each step waits only until its screen is ready, within its budget.
+        waiter = StepWaiter(driver, budgets)
 
         # Check if app is installed
         print("Checking if app is installed...")
-        is_installed = driver.is_app_installed(APP_PACKAGE)
+        is_installed = session in _verified_drivers or retry_step(
+            "check_app", lambda: driver.is_app_installed(APP_PACKAGE), breaker
+        )
         print(f"App {APP_PACKAGE} installed: {is_installed}")
 
         if is_installed:
-            # Close any existing instance of the app
-            print("Closing any existing app instances...")
-            try:
-                driver.terminate_app(APP_PACKAGE)
-                print("Closed existing app instance")
-                time.sleep(2)
-            except Exception as e:
-                print(f"No existing instance to close or error: {str(e)}")
-
-            print(f"Launching fresh instance of {APP_PACKAGE}...")
-            driver.activate_app(APP_PACKAGE)
-            print("App launched successfully!")
-
-            # Wait for app to load
-            time.sleep(5)
+            _verified_drivers.add(session)
 
             try:
-                # # Step 1: Click to go to search
-                print("Step 1: Clicking search tab...")
-                search_tab = wait.until(
-                    EC.element_to_be_clickable((AppiumBy.XPATH, '/hierarchy/android.widget.FrameLayout/android.widget.LinearLayout/android.widget.FrameLayout/android.widget.LinearLayout/android.widget.FrameLayout/e1.r0/android.view.View/android.view.View/android.view.View/android.view.View[2]/android.view.View/android.view.View/android.view.View[2]'))
-                )
-                search_tab.click()
-                time.sleep(2)
-
-                # Step 2: Click dropdown
-                print("Step 2: Clicking dropdown...")
-                dropdown = wait.until(
-                    EC.element_to_be_clickable((AppiumBy.XPATH, '/hierarchy/android.widget.FrameLayout/android.widget.LinearLayout/android.widget.FrameLayout/android.widget.LinearLayout/android.widget.FrameLayout/e1.r0/android.view.View/android.view.View/android.view.View/android.view.View[1]/android.view.View/android.view.View[1]/android.view.View[2]/android.widget.Button'))
-                )
-                dropdown.click()
-                time.sleep(2)
-
-                # Step 3: Start a new search
-                print("Step 3: Clicking 'Start a new search'...")
-                new_search = wait.until(
-                    EC.element_to_be_clickable((AppiumBy.XPATH, '//android.widget.TextView[@content-desc="Start a new search"]'))
-                )
-                new_search.click()
-                time.sleep(2)
-
-                # Step 4: Select location
-                print("Step 4: Clicking 'Select location'...")
-                select_location = wait.until(
-                    EC.element_to_be_clickable((AppiumBy.XPATH, '//android.widget.TextView[@content-desc="Select location"]'))
-                )
-                select_location.click()
-                time.sleep(2)
-
-                # Step 5: Click the mandatory button
-                print("Step 5: Clicking mandatory location button...")
-                mandatory_button = wait.until(
-                    EC.element_to_be_clickable((AppiumBy.XPATH, '//android.widget.Button[@content-desc="Mandatory. label is Location. text is Enter location or zip code. . ."]'))
-                )
-                mandatory_button.click()
-                time.sleep(2)
-
-                # Step 6: Enter location in the text field
-                print(f"Step 6: Entering location '{location}'...")
-                text_field = wait.until(
-                    EC.element_to_be_clickable((AppiumBy.XPATH, '/hierarchy/android.widget.FrameLayout/android.widget.LinearLayout/android.widget.FrameLayout/android.widget.LinearLayout/android.widget.FrameLayout/e1.r0/android.view.View/android.view.View/android.view.View/android.view.View/android.view.View/android.view.View[1]/android.widget.EditText'))
-                )
-                text_field.send_keys(str(location))
-                time.sleep(3)
-
-                # Step 7: Select first result
-                print("Step 7: Selecting first location result...")
-                results_container = wait.until(
-                    EC.presence_of_element_located((AppiumBy.XPATH, '/hierarchy/android.widget.FrameLayout/android.widget.LinearLayout/android.widget.FrameLayout/android.widget.LinearLayout/android.widget.FrameLayout/e1.r0/android.view.View/android.view.View/android.view.View/android.view.View/android.view.View/android.view.View[2]'))
-                )
-                first_result = results_container.find_element(AppiumBy.XPATH, './*[1]')
-                first_result.click()
-                time.sleep(2)
-
-                # Step 8: Click "Show Results" after location selection
-                print("Step 8: Clicking 'Show Results'...")
-                show_results_1 = wait.until(
-                    EC.element_to_be_clickable((AppiumBy.XPATH, '//android.widget.TextView[@content-desc="Show Results"]'))
-                )
-                show_results_1.click()
-                time.sleep(3)
-
-                # Step 9: Enter min price
-                print("Step 9: Entering min price...")
-                min_price_field = wait.until(
-                    EC.element_to_be_clickable((AppiumBy.XPATH, '/hierarchy/android.widget.FrameLayout/android.widget.LinearLayout/android.widget.FrameLayout/android.widget.LinearLayout/android.widget.FrameLayout/e1.r0/android.view.View/android.view.View/android.view.View/android.view.View/android.view.View/android.view.View[2]/android.widget.ScrollView/android.view.View/android.widget.EditText[1]'))
-                )
-                min_price_field.click()
-                min_price_field.send_keys(str(min_price))
-                driver.hide_keyboard()
-                time.sleep(2)
-
-                # Step 10: Enter max price
-                print("Step 10: Entering max price...")
-                max_price_field = wait.until(
-                    EC.element_to_be_clickable((AppiumBy.XPATH, '/hierarchy/android.widget.FrameLayout/android.widget.LinearLayout/android.widget.FrameLayout/android.widget.LinearLayout/android.widget.FrameLayout/e1.r0/android.view.View/android.view.View/android.view.View/android.view.View/android.view.View/android.view.View[2]/android.widget.ScrollView/android.view.View/android.widget.EditText[2]'))
-                )
-                max_price_field.click()
-                max_price_field.send_keys(str(max_price))
-                driver.hide_keyboard()
-                time.sleep(2)
-                # ---------------------------------------------------------------------------
-                # # Step 11: Min rooms dropdown - COMMENTED OUT FOR NOW
-                # print("Step 11: Selecting min rooms...")
-                # min_rooms_spinner = wait.until(
-                #     EC.element_to_be_clickable((AppiumBy.XPATH, '/hierarchy/android.widget.FrameLayout/android.widget.LinearLayout/android.widget.FrameLayout/android.widget.LinearLayout/android.widget.FrameLayout/e1.r0/android.view.View/android.view.View/android.view.View/android.view.View/android.view.View/android.view.View[2]/android.widget.ScrollView/android.view.View/android.widget.EditText[3]/android.widget.Spinner'))
-                # )
-                # min_rooms_spinner.click()
-                # time.sleep(1)
-                # # Select second child (1 room)
-                # rooms_dropdown = wait.until(
-                #     EC.presence_of_element_located((AppiumBy.XPATH, '/hierarchy/android.view.ViewGroup/android.view.View/android.view.View/android.view.View/android.widget.ScrollView'))
-                # )
-                # min_rooms_option = rooms_dropdown.find_element(AppiumBy.XPATH, './*[2]')
-                # min_rooms_option.click()
-                # time.sleep(1)
-                # # Close dropdown with back button
-                # driver.back()
-                # time.sleep(2)
-
-                # # Step 12: Max rooms dropdown - COMMENTED OUT FOR NOW
-                # print("Step 12: Selecting max rooms...")
-                # max_rooms_spinner = wait.until(
-                #     EC.element_to_be_clickable((AppiumBy.XPATH, '/hierarchy/android.widget.FrameLayout/android.widget.LinearLayout/android.widget.FrameLayout/android.widget.LinearLayout/android.widget.FrameLayout/e1.r0/android.view.View/android.view.View/android.view.View/android.view.View/android.view.View/android.view.View[2]/android.widget.ScrollView/android.view.View/android.widget.EditText[4]/android.widget.Spinner'))
-                # )
-                # max_rooms_spinner.click()
-                # time.sleep(1)
-                # # Select fourth child (3 rooms)
-                # max_rooms_dropdown = wait.until(
-                #     EC.presence_of_element_located((AppiumBy.XPATH, '/hierarchy/android.view.ViewGroup/android.view.View/android.view.View/android.view.View/android.widget.ScrollView'))
-                # )
-                # max_rooms_option = max_rooms_dropdown.find_element(AppiumBy.XPATH, './*[4]')
-                # max_rooms_option.click()
-                # time.sleep(1)
-                # # Close dropdown with back button
-                # driver.back()
-                # time.sleep(2)
-
-                # # Step 13: Min bedrooms dropdown - COMMENTED OUT FOR NOW
-                # print("Step 13: Selecting min bedrooms...")
-                # min_bedrooms_spinner = wait.until(
-                #     EC.element_to_be_clickable((AppiumBy.XPATH, '/hierarchy/android.widget.FrameLayout/android.widget.LinearLayout/android.widget.FrameLayout/android.widget.LinearLayout/android.widget.FrameLayout/e1.r0/android.view.View/android.view.View/android.view.View/android.view.View/android.view.View/android.view.View[2]/android.widget.ScrollView/android.view.View/android.widget.EditText[3]/android.widget.Spinner'))
-                # )
-                # min_bedrooms_spinner.click()
-                # time.sleep(1)
-                # # Select second child (1 bedroom)
-                # bedrooms_dropdown = wait.until(
-                #     EC.presence_of_element_located((AppiumBy.XPATH, '/hierarchy/android.view.ViewGroup/android.view.View/android.view.View/android.view.View/android.widget.ScrollView'))
-                # )
-                # min_bedrooms_option = bedrooms_dropdown.find_element(AppiumBy.XPATH, './*[2]')
-                # min_bedrooms_option.click()
-                # time.sleep(1)
-                # # Close dropdown with back button
-                # driver.back()
-                # time.sleep(2)
-
-                # # Step 14: Max bedrooms dropdown - COMMENTED OUT FOR NOW
-                # print("Step 14: Selecting max bedrooms...")
-                # max_bedrooms_spinner = wait.until(
-                #     EC.element_to_be_clickable((AppiumBy.XPATH, '/hierarchy/android.widget.FrameLayout/android.widget.LinearLayout/android.widget.FrameLayout/android.widget.LinearLayout/android.widget.FrameLayout/e1.r0/android.view.View/android.view.View/android.view.View/android.view.View/android.view.View/android.view.View[2]/android.widget.ScrollView/android.view.View/android.widget.EditText[4]/android.widget.Spinner'))
-                # )
-                # max_bedrooms_spinner.click()
-                # time.sleep(1)
-                # # Select third child (2 bedrooms)
-                # max_bedrooms_dropdown = wait.until(
-                #     EC.presence_of_element_located((AppiumBy.XPATH, '/hierarchy/android.view.ViewGroup/android.view.View/android.view.View/android.view.View/android.widget.ScrollView'))
-                # )
-                # max_bedrooms_option = max_bedrooms_dropdown.find_element(AppiumBy.XPATH, './*[3]')
-                # max_bedrooms_option.click()
-                # time.sleep(1)
-                # # Close dropdown with back button
-                # driver.back()
-                # time.sleep(2)
-
-                # # Step 15: Enter min plot area
-                # print("Step 15: Entering min plot area...")
-                # min_plot_field = wait.until(
-                #     EC.element_to_be_clickable((AppiumBy.XPATH, '/hierarchy/android.widget.FrameLayout/android.widget.LinearLayout/android.widget.FrameLayout/android.widget.LinearLayout/android.widget.FrameLayout/e1.r0/android.view.View/android.view.View/android.view.View/android.view.View/android.view.View/android.view.View[2]/android.widget.ScrollView/android.view.View/android.widget.EditText[3]'))
-                # )
-                # min_plot_field.click()
-                # min_plot_field.send_keys("50")
-                # driver.hide_keyboard()
-                # time.sleep(2)
-                #
-                # # Step 16: Enter max plot area
-                # print("Step 16: Entering max plot area...")
-                # max_plot_field = wait.until(
-                #     EC.element_to_be_clickable((AppiumBy.XPATH, '/hierarchy/android.widget.FrameLayout/android.widget.LinearLayout/android.widget.FrameLayout/android.widget.LinearLayout/android.widget.FrameLayout/e1.r0/android.view.View/android.view.View/android.view.View/android.view.View/android.view.View/android.view.View[2]/android.widget.ScrollView/android.view.View/android.widget.EditText[4]'))
-                # )
-                # max_plot_field.click()
-                # max_plot_field.send_keys("200")
-                # driver.hide_keyboard()
-                # time.sleep(2)
-                #
-                # # Step 17: Enter min area
-                # print("Step 17: Entering min area...")
-                # min_area_field = wait.until(
-                #     EC.element_to_be_clickable((AppiumBy.XPATH, '/hierarchy/android.widget.FrameLayout/android.widget.LinearLayout/android.widget.FrameLayout/android.widget.LinearLayout/android.widget.FrameLayout/e1.r0/android.view.View/android.view.View/android.view.View/android.view.View/android.view.View/android.view.View[2]/android.widget.ScrollView/android.view.View/android.widget.EditText[5]'))
-                # )
-                # min_area_field.click()
-                # min_area_field.send_keys("30")
-                # driver.hide_keyboard()
-                # time.sleep(2)
-                #
-                # # Step 18: Enter max area
-                # print("Step 18: Entering max area...")
-                # max_area_field = wait.until(
-                #     EC.element_to_be_clickable((AppiumBy.XPATH, '/hierarchy/android.widget.FrameLayout/android.widget.LinearLayout/android.widget.FrameLayout/android.widget.LinearLayout/android.widget.FrameLayout/e1.r0/android.view.View/android.view.View/android.view.View/android.view.View/android.view.View/android.view.View[2]/android.widget.ScrollView/android.view.View/android.widget.EditText[6]'))
-                # )
-                # max_area_field.click()
-                # max_area_field.send_keys("100")
-                # driver.hide_keyboard()
-                # time.sleep(2)
-                #
-                # # Step 19: Select project type - Resale
-                # print("Step 19: Selecting 'Resale' project type...")
-                # resale = wait.until(
-                #     EC.element_to_be_clickable((AppiumBy.XPATH, '//android.view.View[@content-desc="Resale"]'))
-                # )
-                # resale.click()
-                # time.sleep(2)
-
-                # Step 20: Click "Show Results"
-                # ---------------------------------------------------------------------------
-
-                print("Step 20: Clicking 'Show Results'...")
-                show_results = wait.until(
-                    EC.element_to_be_clickable((AppiumBy.XPATH, '//android.widget.TextView[@content-desc="Show Results"]'))
-                )
-                show_results.click()
-                time.sleep(5)
+                def renavigate():
+                    return navigate_to_results(driver, waiter, location, min_price, max_price, filters, navigation)
+
+                with span("navigate", "navigation"):
+                    result["navigation"] = retry_step("navigate", renavigate, breaker)
 
                 # print("\n✓ Search completed! Now scraping listings...")
 
                 # Step 21: Scrape listings
                 listings_data.clear()
-                seen_signatures = set()
-                attempts = 0
-                max_attempts = max_listings * 6
-                cards_container_xpath = '/hierarchy/android.widget.FrameLayout/android.widget.LinearLayout/android.widget.FrameLayout/android.widget.LinearLayout/android.widget.FrameLayout/e1.r0/android.view.View/android.view.View/android.view.View/android.view.View[1]/android.view.View/android.view.View[2]/android.view.View/android.view.View[1]'
-
-                # Get total number of elements (cards + ads)
-                cards_container = wait.until(
-                    EC.presence_of_element_located((AppiumBy.XPATH, cards_container_xpath))
-                )
-
-                child_index = 1
-                scraped_count = 0
-
-                while scraped_count < max_listings and attempts < max_attempts:
+                listings_data.extend(resumed)
+                seen_signatures = {listing_signature(listing) for listing in resumed}
+                if on_listing is not None:
+                    for listing in resumed:
+                        on_listing(listing)
+                cards_container_xpath = SEARCH_FLOW.xpath("cards_container")
+                first_card_xpath = f"{cards_container_xpath}/*[1]"
+                scroller = ResultsScroller(driver, waiter, cards_container_xpath)
+
+                scraped_count = len(resumed)
+                # Whether every card reached was read, so that the end of the list means no match was missed.
+                every_card_read = True
+                known_streak = 0
+                if known is not None:
+                    result["known_skipped"] = 0
+
+                # Each card of the results list comes up once, read from the page source.
+                for row in scroller:
+                    if cancel is not None and cancel.is_set():
+                        print("Scrape cancelled.")
+                        result["cancelled"] = True
+                        break
+                    summary = row.texts
+                    print(f"\n--- Checking card at position {row.position}: {summary} ---")
                     try:
-                        # Get the child element
-                        child_xpath = f"{cards_container_xpath}/*[{child_index}]"
-
-                        try:
-                            child_element = driver.find_element(AppiumBy.XPATH, child_xpath)
-                        except:
-                            print(f"No more elements found at index {child_index}. Stopping.")
-                            break
-
-                        # Check if it's a real card by checking the class attribute
-                        element_class = child_element.get_attribute("class")
-                        print(f"\n--- Checking element {child_index}, class: {element_class} ---")
-
-                        # Skip ads - only process if class is "android.view.View"
-                        if element_class != "android.view.View":
-                            print(f"Skipping ad element (class: {element_class})")
+                        if not price_in_range(summary, min_price, max_price):
+                            print(f"Skipping card outside the price range: {summary}")
+                        elif resumed and scraped_card(summary, resumed):
+                            print("Skipping listing scraped before the last attempt failed.")
+                        elif known is not None and known(summary):
+                            known_streak += 1
+                            result["known_skipped"] += 1
+                            print("Skipping listing already seen in a previous run.")
+                            if known_streak >= stop_after_known:
+                                print(f"Stopping after {known_streak} known listings in a row.")
+                                break
                         else:
-                            # It's a real card, click it
+                            known_streak = 0
+                            # It's a new card within the filters, click it
                             print(f"Found card #{scraped_count + 1}, clicking...")
-                            child_element.click()
-                            time.sleep(3)
-                            attempts += 1
-
-                            # Scrape data from listing page
-                            price = "N/A"
-                            details = "N/A"
-                            phone_number = "N/A"
-                            missing_fields = False
-
-                            try:
-                                # Price
-                                try:
-                                    price_element = driver.find_element(AppiumBy.XPATH,
-                                        '/hierarchy/android.widget.FrameLayout/android.widget.LinearLayout/android.widget.FrameLayout/android.widget.LinearLayout/android.widget.FrameLayout/e1.r0/android.view.View/android.view.View/android.view.View/android.view.View/android.view.View/android.view.View/android.view.View[1]/android.view.View[4]/android.view.View[1]/android.widget.TextView[1]')
-                                    price = price_element.text
-                                    print(f"✓ Price: {price}")
-                                except Exception:
-                                    missing_fields = True
-                                    print("✗ Could not find price element.")
-
-                                # Details string (rooms, bedrooms, area, floor)
+                            with span("card", "card", slot=row.position) as card_span:
+                                # Active for the whole card, so its commands are recorded under it.
+                                card_span.outcome = "error"
+                                retry_step(
+                                    "open_card", lambda: driver.find_element(AppiumBy.XPATH, row.xpath).click(), breaker
+                                )
+
+                                # Scrape data from listing page
                                 try:
-                                    details_element = driver.find_element(AppiumBy.XPATH,
-                                        '/hierarchy/android.widget.FrameLayout/android.widget.LinearLayout/android.widget.FrameLayout/android.widget.LinearLayout/android.widget.FrameLayout/e1.r0/android.view.View/android.view.View/android.view.View/android.view.View/android.view.View/android.view.View/android.view.View[1]/android.view.View[4]/android.widget.TextView[2]')
-                                    details = details_element.text
-                                    print(f"✓ Details: {details}")
-                                except Exception:
-                                    missing_fields = True
-                                    print("✗ Could not find details element.")
-
-                                # Contact phone number
-                                try:
-                                    call_button = driver.find_element(
-                                        AppiumBy.XPATH,
-                                        '//android.widget.TextView[@content-desc="Call"]'
-                                    )
-                                    call_button.click()
-                                    time.sleep(2)
-                                    try:
-                                        phone_elements = driver.find_elements(
-                                            AppiumBy.XPATH,
-                                            '//*[@text!=""]'
-                                        )
-                                        best_match = None
-                                        best_digits = 0
-                                        for element in phone_elements:
-                                            text = element.text.strip()
-                                            if not text or any(ch.isalpha() for ch in text):
-                                                continue
-                                            digits_only = re.sub(r"\D", "", text)
-                                            if len(digits_only) >= 6 and len(digits_only) > best_digits:
-                                                best_match = text
-                                                best_digits = len(digits_only)
-                                        if best_match:
-                                            phone_number = best_match
-                                        if phone_number != "N/A":
-                                            print(f"✓ Phone: {phone_number}")
-                                        else:
-                                            print("✗ Could not find phone element with a number.")
-                                    except Exception as e:
-                                        print(f"✗ Could not find phone element: {str(e)}")
-                                    try:
-                                        driver.find_element(
-                                            AppiumBy.XPATH,
-                                            '//android.widget.TextView[@content-desc="Call"]'
-                                        )
-                                    except Exception:
-                                        driver.back()
-                                        time.sleep(1)
-                                except Exception as e:
-                                    print(f"✗ Could not click Call button: {str(e)}")
-
-                                if missing_fields or price == "N/A" or details == "N/A":
-                                    print("Skipping listing due to missing price/details.")
-                                else:
-                                    signature = f"{price}|{details}|{phone_number}"
-                                    if signature in seen_signatures:
-                                        print("Skipping duplicate listing (price/details match).")
+                                    if extraction == "elements":
+                                        price, details, phone_number = extract_with_elements(driver, waiter)
+                                    else:
+                                        price, details, phone_number = extract_from_page_source(driver, waiter)
+
+                                    if price == "N/A" or details == "N/A":
+                                        card_span.outcome = "incomplete"
+                                        every_card_read = False
+                                        print("Skipping listing due to missing price/details.")
                                     else:
-                                        seen_signatures.add(signature)
                                         listing_data = {
                                             'index': scraped_count + 1,
                                             'price': price,
                                             'details': details,
-                                            'phone': phone_number
+                                            'phone': phone_number,
+                                            # Typed once here so nothing downstream re-parses the labels.
+                                            **parse_listing(price, details, phone_number)._asdict(),
                                         }
-                                        listings_data.append(listing_data)
-                                        scraped_count += 1
-
-                            except Exception as scrape_error:
-                                print(f"✗ General error scraping listing: {str(scrape_error)}")
-
-                            # Go back to listings
-                            driver.back()
-                            time.sleep(2)
-
-                        # Move to next child
-                        child_index += 1
-
-                        # Listings are virtualized; only the two visible slots exist in the DOM.
-                        if child_index > 2:
-                            print("Scrolling to see more listings...")
-                            driver.swipe(500, 1500, 500, 800, 500)  # Scroll down
-                            time.sleep(2)
-                            child_index = 1
-
+                                        signature = listing_signature(listing_data)
+                                        if signature in seen_signatures:
+                                            card_span.outcome = "duplicate"
+                                            print("Skipping duplicate listing (price/details match).")
+                                        else:
+                                            card_span.outcome = "scraped"
+                                            seen_signatures.add(signature)
+                                            listings_data.append(listing_data)
+                                            scraped_count += 1
+                                            if checkpoints is not None:
+                                                checkpoints.append(key, listing_data)
+                                            if on_listing is not None:
+                                                on_listing(listing_data)
+                                except Exception as scrape_error:
+                                    every_card_read = False
+                                    print(f"✗ General error scraping listing: {str(scrape_error)}")
+
+                                # Go back to listings; the list as shown there feeds the next card.
+                                driver.back()
+                                scroller.refresh(
+                                    waiter.page("back", lambda root: find_node(root, first_card_xpath) is not None)
+                                )
+
+                    except CircuitOpen:
+                        raise
                     except Exception as e:
-                        print(f"Error processing element {child_index}: {str(e)}")
-                        print("Moving to next element...")
-                        child_index += 1
-                        continue
-                if attempts >= max_attempts:
-                    print("Stopping scrape after too many attempts without enough new listings.")
+                        every_card_read = False
+                        print(f"Error processing card at position {row.position}: {str(e)}")
+                        print("Returning to the results list...")
+                        scroller.refresh(
+                            retry_step(
+                                "recover",
+                                lambda: recover_results(driver, waiter, first_card_xpath, renavigate),
+                                breaker,
+                            )
+                        )
+                    if scraped_count >= max_listings:
+                        break
+                else:
+                    print(f"Reached the end of the results list after {scroller.swipes} swipes.")
+                    if every_card_read:
+                        result["exhausted"] = True
 
                 # Print summary
                 print(f"\n\n{'='*50}")
@@ -435,19 +514,20 @@ def search_listings(location, min_price, max_price, max_listings):
                     print(f"  Details: {listing['details']}")
                     print(f"  Phone: {listing['phone']}")
 
-                print("\nWaiting 10 seconds before closing...")
-                time.sleep(10)
-
             except Exception as e:
                 result["error"] = str(e)
+                if isinstance(e, CircuitOpen):
+                    result["circuit_open"] = True
+                elif isinstance(e, TRANSIENT_ERRORS):
+                    result["transient"] = True
                 print(f"\n✗ Error during automation: {str(e)}")
-                if driver is not None:
-                    print(f"Current activity: {driver.current_activity}")
-                # Take screenshot if possible
+                # Take screenshot if possible; one file per session, as runs may be concurrent.
                 try:
-                    driver.save_screenshot("/tmp/error_screenshot.png")
-                    print("Screenshot saved to /tmp/error_screenshot.png")
-                except:
+                    print(f"Current activity: {driver.current_activity}")
+                    screenshot = os.path.join(tempfile.gettempdir(), f"error_screenshot_{session.session_id}.png")
+                    driver.save_screenshot(screenshot)
+                    print(f"Screenshot saved to {screenshot}")
+                except Exception:
                     pass
         else:
             print(f"ERROR: App {APP_PACKAGE} is NOT installed on the device!")
@@ -456,9 +536,22 @@ def search_listings(location, min_price, max_price, max_listings):
 
     except Exception as e:
         result["error"] = str(e)
+        if isinstance(e, CircuitOpen):
+            result["circuit_open"] = True
+        elif isinstance(e, TRANSIENT_ERRORS):
+            result["transient"] = True
     finally:
-        if driver is not None:
-            driver.quit()
+        if session is not None:
+            if pool is not None:
+                # A session that failed goes back to the pool only if it still answers.
+                pool.checkin(session, "error" not in result or pool.health_check(session))
+            else:
+                try:
+                    driver.quit()
+                except Exception as e:
+                    print(f"✗ Could not end the session: {str(e)}")
+    if checkpoints is not None and "error" not in result:
+        checkpoints.clear(key)
     result["scraped"] = len(listings_data)
     return result
 
@@ -470,7 +563,57 @@ if __name__ == "__main__":
     parser.add_argument("min_price", type=int, help="Minimum price")
     parser.add_argument("max_price", type=int, help="Maximum price")
     parser.add_argument("max_listings", type=int, help="Number of listings to scrape")
+    parser.add_argument(
+        "--only-new",
+        action="store_true",
+        help="Skip listings already scraped for this location in earlier runs",
+    )
+    parser.add_argument(
+        "--filter",
+        action="append",
+        default=[],
+        metavar="NAME=VALUE",
+        help="Optional search filter, e.g. min_rooms=2 or project_type=Resale (repeatable)",
+    )
+    parser.add_argument(
+        "--navigation",
+        choices=["auto", "deeplink", "ui"],
+        default=NAVIGATION,
+        help="Open the results via deep link, the search form, or the deep link with form fallback",
+    )
+    parser.add_argument(
+        "--trace",
+        metavar="PATH",
+        help="Write a span for every step, command, card and swipe to PATH "
+        "(JSON lines, or OTLP/JSON when PATH ends in .json) and print a timing summary",
+    )
+    parser.add_argument(
+        "--extraction",
+        choices=["page_source", "elements"],
+        default="page_source",
+        help="Read listing fields from one parsed page source or element by element",
+    )
     args = parser.parse_args()
 
-    data = search_listings(args.location, args.min_price, args.max_price, args.max_listings)
+    seen = get_seen_index()
+    filters = dict(item.split("=", 1) for item in args.filter)
+    tracer = Tracer() if args.trace else None
+    data = search_listings(
+        args.location,
+        args.min_price,
+        args.max_price,
+        args.max_listings,
+        extraction=args.extraction,
+        known=seen.matcher(args.location, args.min_price, args.max_price, filters) if args.only_new else None,
+        filters=filters,
+        navigation=args.navigation,
+        trace=tracer,
+    )
+    seen.record(args.location, args.min_price, args.max_price, data["listings"], filters)
+    if tracer is not None:
+        if args.trace.endswith(".json"):
+            tracer.write_otlp(args.trace)
+        else:
+            tracer.write_jsonl(args.trace)
+        tracer.print_summary()
     print(json.dumps(data, ensure_ascii=False, indent=2))
@@ -0,0 +1,60 @@
+import pytest
+
+from listing_parser import parse_details, parse_number, parse_price
+
+
+@pytest.mark.parametrize(
+    "text, amount",
+    [
+        ("€350,000", 350000),
+        ("€ 350,000", 350000),
+        ("350 000 €", 350000),
+        ("350\u202f000\u00a0€", 350000),
+        ("350.000 €", 350000),
+        ("€1,250,000", 1250000),
+        ("1 250 000 €", 1250000),
+        ("EUR 99,000", 99000),
+        ("99 euros", 99),
+        ("Price on request", None),
+        (None, None),
+    ],
+)
+def test_parse_price(text, amount):
+    assert parse_price(text) == amount
+
+
+@pytest.mark.parametrize(
+    "text, surface",
+    [
+        ("3 rooms · 2 bedrooms · 1,250 m² · 2nd floor", 1250),
+        ("3 pièces · 2 chambres · 45,5 m² · 2e étage", 45.5),
+        ("2 rooms · 65.5 m²", 65.5),
+        ("T4 · 1 250 m²", 1250),
+        ("T4 · 1.250 m²", 1250),
+    ],
+)
+def test_parse_details_surface(text, surface):
+    assert parse_details(text)[2] == surface
+
+
+@pytest.mark.parametrize(
+    "text, value",
+    [
+        ("1,250", 1250),
+        ("1.250", 1250),
+        ("1 250", 1250),
+        ("45,5", 45.5),
+        ("82.5", 82.5),
+        ("0,125", 0.125),
+        ("1,250.75", 1250.75),
+        ("1.250,75", 1250.75),
+        ("1.250.000", 1250000),
+    ],
+)
+def test_parse_number_tells_separators_apart_by_digit_groups(text, value):
+    assert parse_number(text) == value
+
+
+def test_parse_details_english_and_french():
+    assert parse_details("3 rooms · 2 bedrooms · 1,250 m² · ground floor") == (3, 2, 1250, None, 0)
+    assert parse_details("3 pièces · 2 chambres · 45,5 m² · terrain de 1 200 m² · 1er étage") == (3, 2, 45.5, 1200, 1)
@@ -0,0 +1,37 @@
+from itertools import count
+from types import SimpleNamespace
+
+import seen_index
+from seen_index import SeenIndex
+
+LISTING = {"price": "350 000 €", "details": "3 pièces · 65 m²", "phone": None}
+CARD = ["350 000 €", "3 pièces · 65 m²"]
+
+
+def test_known_only_to_the_same_search():
+    index = SeenIndex(":memory:")
+    index.record("Paris", 200000, 400000, [LISTING])
+
+    assert index.matcher(" paris ", 200000, 400000)(CARD)
+    assert not index.matcher("Paris", 300000, 500000)(CARD)
+    assert not index.matcher("Paris", 200000, 400000, {"rooms": "3"})(CARD)
+    assert not index.matcher("Lyon", 200000, 400000)(CARD)
+
+
+def test_prunes_the_least_recently_seen(monkeypatch):
+    clock = count(1000)
+    monkeypatch.setattr(seen_index, "time", SimpleNamespace(time=lambda: next(clock)))
+    index = SeenIndex(":memory:", max_entries=2)
+    for n in range(3):
+        index.record("Paris", 0, 10**6, [{**LISTING, "details": f"listing {n}"}])
+
+    assert index.stats["listings"] == 2
+    assert not index.matcher("Paris", 0, 10**6)(["350 000 €", "listing 0"])
+    assert index.matcher("Paris", 0, 10**6)(["350 000 €", "listing 2"])
+
+
+def test_prunes_listings_not_seen_for_max_age():
+    index = SeenIndex(":memory:", max_age=-1)
+    index.record("Paris", 0, 10**6, [LISTING])
+
+    assert index.stats["listings"] == 0
@@ -0,0 +1,20 @@
+from types import SimpleNamespace
+
+import session_store
+from session_store import SessionStore
+
+
+def test_expire_after_reads(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(session_store, "time", SimpleNamespace(time=lambda: now[0]))
+    store = SessionStore(ttl=60, path=None)
+    store.put("old", store.get("old"))
+    now[0] += 30
+    store.put("recent", store.get("recent"))
+    # Reading "old" must not make it look recently used to expire().
+    store.get("old")
+    now[0] += 45
+    store.put("new", store.get("new"))
+
+    assert store.stats["sessions"] == 2
+    assert store.stats["expired"] == 1
@@ -0,0 +1,285 @@
+"""Spans for scrape runs: flow steps, remote commands, cards and swipes.
+
+A ``Tracer`` collects spans with their duration, outcome and attributes.
+While one is active, ``search_listings`` wraps its driver so that every
+WebDriver command, on the driver or on an element it returned, is recorded
+as a ``command`` span under whatever step, card or swipe is running. Spans
+can be written as JSON lines or as OTLP/JSON for OpenTelemetry tools, and
+``summary`` gives count, p50, p95 and total per span name. Nothing is
+recorded, and the driver is not wrapped, unless a tracer is passed with
+``trace=`` or ``SCRAPE_TRACE_DIR`` is set.
+"""
+import json
+import os
+import statistics
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from functools import wraps
+from uuid import uuid4
+
+# When set, every run without an explicit tracer writes <trace_id>.jsonl here.
+TRACE_DIR = os.getenv("SCRAPE_TRACE_DIR")
+
+_active_tracer = ContextVar("active_tracer", default=None)
+_active_span = ContextVar("active_span", default=None)
+
+
+class Span:
+    def __init__(self, tracer: "Tracer", name: str, kind: str, parent_id: str | None, attributes: dict) -> None:
+        self.tracer = tracer
+        self.name = name
+        self.kind = kind
+        self.span_id = uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.attributes = attributes
+        self.outcome = None
+        self.start = time.time()
+        self.duration = None
+        self._started = time.perf_counter()
+
+    def end(self, outcome: str | None = None, **attributes) -> None:
+        if self.duration is not None:
+            return
+        self.duration = time.perf_counter() - self._started
+        self.outcome = outcome or self.outcome or "ok"
+        self.attributes.update(attributes)
+        self.tracer._record(self)
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.tracer.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "kind": self.kind,
+            "start": self.start,
+            "duration": self.duration,
+            "outcome": self.outcome,
+            "attributes": self.attributes,
+        }
+
+
+class _NullSpan:
+    """Stands in for a span when no tracer is active; what is set on it is dropped."""
+
+    def __init__(self) -> None:
+        self.outcome = None
+        self.attributes = {}
+
+    def end(self, outcome: str | None = None, **attributes) -> None:
+        pass
+
+
+def _percentile(values: list[float], percent: int) -> float:
+    if len(values) < 2:
+        return values[0]
+    return statistics.quantiles(values, n=100, method="inclusive")[percent - 1]
+
+
+class Tracer:
+    def __init__(self, trace_id: str | None = None) -> None:
+        self.trace_id = trace_id or uuid4().hex
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def _record(self, span: Span) -> None:
+        with self._lock:
+            self.spans.append(span)
+
+    def start(self, name: str, kind: str = "step", **attributes) -> Span:
+        """Start a span under the current one; the caller must ``end`` it."""
+        parent = _active_span.get()
+        parent_id = parent.span_id if parent is not None and parent.tracer is self else None
+        return Span(self, name, kind, parent_id, attributes)
+
+    @contextmanager
+    def span(self, name: str, kind: str = "step", **attributes):
+        span = self.start(name, kind, **attributes)
+        token = _active_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.end("error", error=f"{type(e).__name__}: {str(e).strip()}"[:300])
+            raise
+        else:
+            span.end()
+        finally:
+            _active_span.reset(token)
+
+    @contextmanager
+    def activate(self):
+        token = _active_tracer.set(self)
+        try:
+            yield self
+        finally:
+            _active_tracer.reset(token)
+
+    def summary(self) -> dict:
+        """Count, p50, p95 and total seconds per ``kind:name``, slowest total first."""
+        groups = {}
+        with self._lock:
+            spans = list(self.spans)
+        for span in spans:
+            group = groups.setdefault(f"{span.kind}:{span.name}", {"durations": [], "errors": 0})
+            group["durations"].append(span.duration)
+            group["errors"] += span.outcome == "error"
+        rows = {
+            key: {
+                "count": len(group["durations"]),
+                "errors": group["errors"],
+                "p50": round(_percentile(group["durations"], 50), 3),
+                "p95": round(_percentile(group["durations"], 95), 3),
+                "total": round(sum(group["durations"]), 3),
+            }
+            for key, group in groups.items()
+        }
+        return dict(sorted(rows.items(), key=lambda item: item[1]["total"], reverse=True))
+
+    def print_summary(self) -> None:
+        print(f"\nTrace {self.trace_id}")
+        print(f"{'span':<40} {'count':>6} {'errors':>6} {'p50':>8} {'p95':>8} {'total':>9}")
+        for key, row in self.summary().items():
+            print(f"{key:<40} {row['count']:>6} {row['errors']:>6} {row['p50']:>8.3f} {row['p95']:>8.3f} {row['total']:>9.3f}")
+
+    def write_jsonl(self, path: str) -> None:
+        with self._lock:
+            spans = sorted(self.spans, key=lambda span: span.start)
+        with open(path, "w", encoding="utf-8") as f:
+            for span in spans:
+                f.write(json.dumps(span.to_dict(), ensure_ascii=False, default=str) + "\n")
+
+    def write_otlp(self, path: str, service_name: str = "mandate-scout") -> None:
+        """Write the spans as an OTLP/JSON ``ExportTraceServiceRequest``."""
+        with self._lock:
+            spans = sorted(self.spans, key=lambda span: span.start)
+
+        def attribute(key, value) -> dict:
+            if isinstance(value, bool):
+                return {"key": key, "value": {"boolValue": value}}
+            if isinstance(value, int):
+                return {"key": key, "value": {"intValue": str(value)}}
+            if isinstance(value, float):
+                return {"key": key, "value": {"doubleValue": value}}
+            return {"key": key, "value": {"stringValue": str(value)}}
+
+        otlp_spans = []
+        for span in spans:
+            start = int(span.start * 1e9)
+            otlp_span = {
+                "traceId": self.trace_id,
+                "spanId": span.span_id,
+                "name": span.name,
+                "kind": 1,
+                "startTimeUnixNano": str(start),
+                "endTimeUnixNano": str(start + int(span.duration * 1e9)),
+                "attributes": [attribute("scrape.kind", span.kind)]
+                + [attribute(key, value) for key, value in span.attributes.items()],
+                "status": {"code": 2 if span.outcome == "error" else 1, "message": span.outcome},
+            }
+            if span.parent_id:
+                otlp_span["parentSpanId"] = span.parent_id
+            otlp_spans.append(otlp_span)
+        payload = {
+            "resourceSpans": [
+                {
+                    "resource": {"attributes": [attribute("service.name", service_name)]},
+                    "scopeSpans": [{"scope": {"name": "mandate-scout.scraper"}, "spans": otlp_spans}],
+                }
+            ]
+        }
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(payload, f, ensure_ascii=False)
+
+
+def active_tracer() -> Tracer | None:
+    return _active_tracer.get()
+
+
+def span(name: str, kind: str = "step", **attributes):
+    """Context manager for a span under the active tracer; a no-op when none is active."""
+    tracer = _active_tracer.get()
+    if tracer is None:
+        return nullcontext(_NullSpan())
+    return tracer.span(name, kind, **attributes)
+
+
+def _is_element(value) -> bool:
+    return hasattr(value, "click") and hasattr(value, "find_element")
+
+
+class _Traced:
+    """Proxy recording each method call and property read on the target as a command span."""
+
+    def __init__(self, target, tracer: Tracer) -> None:
+        object.__setattr__(self, "_target", target)
+        object.__setattr__(self, "_tracer", tracer)
+
+    def _wrap(self, value):
+        if _is_element(value):
+            return _Traced(value, self._tracer)
+        if isinstance(value, list) and value and _is_element(value[0]):
+            return [_Traced(item, self._tracer) for item in value]
+        return value
+
+    def __getattr__(self, name: str):
+        target = self._target
+        if name.startswith("_"):
+            return getattr(target, name)
+        if isinstance(getattr(type(target), name, None), property):
+            # Properties such as page_source and text are remote reads.
+            with self._tracer.span(name, "command"):
+                return self._wrap(getattr(target, name))
+        value = getattr(target, name)
+        if not callable(value):
+            return value
+
+        @wraps(value)
+        def call(*args, **kwargs):
+            attributes = {"arg": args[-1][:160]} if args and isinstance(args[-1], str) else {}
+            with self._tracer.span(name, "command", **attributes):
+                return self._wrap(value(*args, **kwargs))
+
+        return call
+
+    def __setattr__(self, name: str, value) -> None:
+        setattr(self._target, name, value)
+
+
+def wrap_driver(driver):
+    """Return ``driver`` traced by the active tracer, or unchanged when none is active."""
+    tracer = _active_tracer.get()
+    return driver if tracer is None else _Traced(driver, tracer)
+
+
+def traced_run(name: str):
+    """Let the decorated scrape take ``trace=``, a ``Tracer`` to record the run into.
+
+    Without one, a tracer is created when ``SCRAPE_TRACE_DIR`` is set; its
+    spans are written there and summarised once the run ends.
+    """
+
+    def decorate(func):
+        @wraps(func)
+        def wrapper(*args, trace: Tracer | None = None, **kwargs):
+            tracer = trace
+            if tracer is None and TRACE_DIR:
+                tracer = Tracer()
+            if tracer is None:
+                return func(*args, **kwargs)
+            with tracer.activate(), tracer.span(name, "run") as run_span:
+                result = func(*args, **kwargs)
+                run_span.attributes["scraped"] = result.get("scraped", 0)
+                if result.get("error"):
+                    run_span.outcome = "error"
+            result["trace_id"] = tracer.trace_id
+            if trace is None:
+                os.makedirs(TRACE_DIR, exist_ok=True)
+                tracer.write_jsonl(os.path.join(TRACE_DIR, f"{tracer.trace_id}.jsonl"))
+                tracer.print_summary()
+            return result
+
+        return wrapper
+
+    return decorate
@@ -0,0 +1,105 @@
+import time
+
+from selenium.common.exceptions import NoSuchElementException, TimeoutException
+from selenium.webdriver.support import expected_conditions as EC
+
+from page_parser import parse
+
+# Upper bound, in seconds, that each kind of step may spend waiting for the
+# next screen. Waits return as soon as their condition holds, so these only
+# matter when the device is slow or the UI is stuck.
+STEP_BUDGETS = {
+    "launch": 30,
+    "deeplink": 20,
+    "navigate": 10,
+    "results": 20,
+    "card": 10,
+    "call": 5,
+    "back": 10,
+    "recover": 5,
+    "scroll": 5,
+}
+DEFAULT_BUDGET = 15
+# Polls start at POLL_INTERVAL and back off by POLL_BACKOFF up to MAX_POLL_INTERVAL:
+# a quick screen is still seen within 0.1 s, while a slow one costs about three
+# commands a second instead of ten. Every poll is a billed remote command.
+POLL_INTERVAL = 0.1
+POLL_BACKOFF = 1.5
+MAX_POLL_INTERVAL = 0.3
+
+
+class StepWaiter:
+    """Condition-driven waits with a per-step timeout budget and backed-off polling."""
+
+    def __init__(
+        self, driver, budgets: dict | None = None, poll: float = POLL_INTERVAL, max_poll: float = MAX_POLL_INTERVAL
+    ) -> None:
+        self.driver = driver
+        self.budgets = {**STEP_BUDGETS, **(budgets or {})}
+        self.poll = poll
+        self.max_poll = max_poll
+
+    def budget(self, step: str) -> float:
+        return self.budgets.get(step, DEFAULT_BUDGET)
+
+    def until(self, step: str, condition):
+        """Return the first truthy ``condition(driver)``; raise TimeoutException once the budget is spent.
+
+        Like WebDriverWait, a missing element counts as "not yet", but the
+        interval between polls grows from ``poll`` to ``max_poll``.
+        """
+        timeout = self.budget(step)
+        deadline = time.monotonic() + timeout
+        delay = self.poll
+        while True:
+            try:
+                value = condition(self.driver)
+                if value:
+                    return value
+            except NoSuchElementException:
+                pass
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutException(f"Step '{step}' not ready after {timeout}s")
+            time.sleep(min(delay, remaining))
+            delay = min(delay * POLL_BACKOFF, self.max_poll)
+
+    def clickable(self, step: str, locator: tuple[str, str]):
+        return self.until(step, EC.element_to_be_clickable(locator))
+
+    def present(self, step: str, locator: tuple[str, str]):
+        return self.until(step, EC.presence_of_element_located(locator))
+
+    def settle(self, step: str) -> str | None:
+        """Wait until two consecutive page sources match and return the last one.
+
+        Stability is best effort: if the screen is still changing when the
+        budget runs out, the latest source is returned instead of raising.
+        """
+        last = {"source": None}
+
+        def stable(driver):
+            source = driver.page_source
+            if source == last["source"]:
+                return source
+            last["source"] = source
+            return False
+
+        try:
+            return self.until(step, stable)
+        except TimeoutException:
+            return last["source"]
+
+    def page(self, step: str, predicate=None):
+        """Poll the page source until ``predicate`` holds on its parsed tree; return the tree."""
+        last = {"root": None}
+
+        def ready(driver):
+            root = parse(driver.page_source)
+            if predicate is not None and not predicate(root):
+                return False
+            last["root"] = root
+            return True
+
+        self.until(step, ready)
+        return last["root"]
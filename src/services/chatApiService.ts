@@ -1,12 +1,8 @@
 // API service for chat backend integration
 
-const API_BASE = "https://e35b7a7d86fb.ngrok-free.app";
+import type { ApiListing, Listing, QueryFilters, ScoredListing } from "@/types/listing";
 
-export interface ApiListing {
-  price: string;
-  details: string;
-  phone: string;
-}
+const API_BASE = "https://e35b7a7d86fb.ngrok-free.app";
 
 export interface ChatResponse {
   conversation_id: string;
@@ -36,3 +32,146 @@ export async function sendMessage(
   
   return res.json();
 }
+
+// Background scrape jobs: submit, then poll for listings as they are scraped
+
+export type JobStatus = "queued" | "running" | "done" | "failed" | "cancelled";
+
+export interface JobParams {
+  location: string;
+  min_price: number;
+  max_price: number;
+  max_listings: number;
+}
+
+export interface JobResponse {
+  job_id: string;
+  status: JobStatus;
+  params: JobParams;
+  scraped: number;
+  listings: ApiListing[];
+  error?: string | null;
+  created_at: number;
+  finished_at?: number | null;
+}
+
+async function jobRequest(path: string, init?: RequestInit): Promise<JobResponse> {
+  const res = await fetch(`${API_BASE}${path}`, {
+    ...init,
+    headers: {
+      "Content-Type": "application/json",
+      "ngrok-skip-browser-warning": "true",
+    },
+  });
+
+  if (!res.ok) {
+    throw new Error(`API error ${res.status}`);
+  }
+
+  return res.json();
+}
+
+export function submitJob(params: JobParams): Promise<JobResponse> {
+  return jobRequest("/jobs", { method: "POST", body: JSON.stringify(params) });
+}
+
+// `since` is the number of listings already received; only newer ones are returned.
+export function getJob(jobId: string, since = 0): Promise<JobResponse> {
+  return jobRequest(`/jobs/${jobId}?since=${since}`);
+}
+
+export function cancelJob(jobId: string): Promise<JobResponse> {
+  return jobRequest(`/jobs/${jobId}`, { method: "DELETE" });
+}
+
+// Listing queries answered by the backend store's indexes
+
+export interface ListingsQueryResponse {
+  total: number;
+  // Listings in the store in all; 0 until something has been stored.
+  stored: number;
+  listings: ScoredListing[];
+}
+
+export async function queryStoredListings(filters: QueryFilters): Promise<ListingsQueryResponse> {
+  const res = await fetch(`${API_BASE}/listings/query`, {
+    method: "POST",
+    headers: {
+      "Content-Type": "application/json",
+      "ngrok-skip-browser-warning": "true",
+    },
+    body: JSON.stringify(filters),
+  });
+
+  if (!res.ok) {
+    throw new Error(`API error ${res.status}`);
+  }
+
+  return res.json();
+}
+
+// Streaming chat: reply text and listings arrive as Server-Sent Events
+
+// Sent once per listing platform, when its search is over.
+export interface SourceStatus {
+  platform: Listing["platform"];
+  scraped: number;
+  seconds?: number;
+  cached?: boolean;
+  // How old the cached result is, e.g. one the background crawler pre-warmed.
+  age_seconds?: number;
+  error?: string;
+}
+
+export interface StreamHandlers {
+  onStart?: (conversationId: string) => void;
+  onDelta?: (text: string) => void;
+  onListing?: (listing: ApiListing) => void;
+  onSource?: (source: SourceStatus) => void;
+}
+
+export async function streamMessage(
+  message: string,
+  handlers: StreamHandlers,
+  conversationId?: string,
+  signal?: AbortSignal
+): Promise<ChatResponse> {
+  const res = await fetch(`${API_BASE}/chat/stream`, {
+    method: "POST",
+    headers: {
+      "Content-Type": "application/json",
+      "ngrok-skip-browser-warning": "true",
+    },
+    body: JSON.stringify({
+      message,
+      conversation_id: conversationId ?? null,
+    }),
+    signal,
+  });
+
+  if (!res.ok || !res.body) {
+    throw new Error(`API error ${res.status}`);
+  }
+
+  const reader = res.body.pipeThrough(new TextDecoderStream()).getReader();
+  let buffer = "";
+  for (;;) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += value;
+    let end: number;
+    while ((end = buffer.indexOf("\n\n")) !== -1) {
+      const block = buffer.slice(0, end);
+      buffer = buffer.slice(end + 2);
+      const event = block.match(/^event: (.*)$/m)?.[1];
+      const data = JSON.parse(block.match(/^data: (.*)$/m)?.[1] ?? "null");
+      if (event === "start") handlers.onStart?.(data.conversation_id);
+      else if (event === "delta") handlers.onDelta?.(data.text);
+      else if (event === "listing") handlers.onListing?.(data);
+      else if (event === "source") handlers.onSource?.(data);
+      else if (event === "done") return data;
+      else if (event === "error") throw new Error(data.error);
+    }
+  }
+  throw new Error("Stream ended before the reply was complete");
+}
@@ -1,12 +1,23 @@
 import { mockListings } from '@/data/mockListings';
 import { Listing, ScoredListing, QueryFilters, ParsedQuery, Intent } from '@/types/listing';
 import { scoreAndSortListings, scoreListing } from './scoringService';
+import { queryStoredListings } from './chatApiService';
 
-// Simulates database query - will be replaced with real API calls in Phase 2
+// Filtered, scored and sorted by the backend listing store (POST /listings/query)
 export async function queryListings(filters: QueryFilters): Promise<ScoredListing[]> {
-  // Simulate network delay
-  await new Promise(resolve => setTimeout(resolve, 300));
+  try {
+    const { listings, stored } = await queryStoredListings(filters);
+    if (stored > 0) {
+      return listings;
+    }
+  } catch {
+    // Backend unreachable: handled like an empty store below
+  }
+  // Nothing stored yet: fall back to the mock listings, filtered and scored here
+  return queryMockListings(filters);
+}
 
+function queryMockListings(filters: QueryFilters): ScoredListing[] {
   let results = [...mockListings];
 
   // Apply filters
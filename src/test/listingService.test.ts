@@ -0,0 +1,47 @@
+import { afterEach, describe, expect, it, vi } from "vitest";
+import { mockListings } from "@/data/mockListings";
+import { queryListings } from "@/services/listingService";
+
+function respondWith(body: object) {
+  const fetchMock = vi.fn().mockResolvedValue({ ok: true, json: async () => body });
+  vi.stubGlobal("fetch", fetchMock);
+  return fetchMock;
+}
+
+describe("queryListings", () => {
+  afterEach(() => {
+    vi.unstubAllGlobals();
+  });
+
+  it("shows the mock listings on a fresh backend with an empty store", async () => {
+    const fetchMock = respondWith({ total: 0, stored: 0, listings: [] });
+
+    const listings = await queryListings({});
+
+    expect(fetchMock).toHaveBeenCalledOnce();
+    expect(fetchMock.mock.calls[0][0]).toMatch(/\/listings\/query$/);
+    expect(listings).toHaveLength(mockListings.length);
+    expect(listings.map(l => l.score)).toEqual([...listings.map(l => l.score)].sort((a, b) => b - a));
+  });
+
+  it("shows the mock listings when the backend is unreachable", async () => {
+    vi.stubGlobal("fetch", vi.fn().mockRejectedValue(new TypeError("Failed to fetch")));
+
+    const listings = await queryListings({ limit: 3 });
+
+    expect(listings).toHaveLength(3);
+  });
+
+  it("shows the stored listings once the store has some", async () => {
+    const stored = { ...mockListings[0], id: "stored-1", score: 80, priority: "High", signals: [], explanation: "" };
+    respondWith({ total: 1, stored: 5, listings: [stored] });
+
+    expect(await queryListings({ city: "Lyon" })).toEqual([stored]);
+  });
+
+  it("shows no listings when a stocked store matches nothing", async () => {
+    respondWith({ total: 0, stored: 5, listings: [] });
+
+    expect(await queryListings({ city: "Nowhere" })).toEqual([]);
+  });
+});
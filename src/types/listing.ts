@@ -51,6 +51,21 @@ export interface ApiListing {
   price: string;
   details: string;
   phone: string;
+  // Parsed from the labels above by the scraper; null when a label lacks the field.
+  amount?: number | null;
+  rooms?: number | null;
+  bedrooms?: number | null;
+  surface?: number | null;
+  land_surface?: number | null;
+  floor?: number | null;
+  phone_e164?: string | null;
+  platform?: Listing['platform'];
+  // From the backend's price history, once the listing has been scraped before.
+  publicationDate?: string;
+  daysOnline?: number;
+  priceHistory?: Listing['priceHistory'];
+  // Every listing this property was found as, itself included, when it was found more than once.
+  sources?: { platform?: Listing['platform']; id?: string; url?: string; price?: string; phone?: string }[];
 }
 
 // Chat types